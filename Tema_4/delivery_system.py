@@ -1,7 +1,12 @@
 """
 Sistema de Pedidos de Restaurante con Delivery
+
+Los precios se calculan en motor_precios.py; aquí solo está el menú de
+consola.
 """
 
+from motor_precios import Catalogo, ErrorPrecio, calcular_precio
+
 # ===== BASE DE DATOS DEL RESTAURANTE =====
 
 # Menú del restaurante organizado por categorías
@@ -59,6 +64,9 @@ combos_del_dia = {
     }
 }
 
+# Menú y combos preparados para el motor de precios
+catalogo = Catalogo(menu, combos_del_dia)
+
 # ===== FUNCIONES DEL SISTEMA =====
 
 def mostrar_bienvenida():
@@ -160,19 +168,21 @@ def mostrar_ofertas():
     input("\nPresiona Enter para continuar...")
 
 
-def calcular_precio_con_puntos(total, puntos_disponibles):
+def pedir_puntos(puntos_disponibles):
     """
-    Pregunta si el cliente quiere usar sus puntos y calcula el descuento.
+    Pregunta si el cliente quiere usar sus puntos y cuántos.
+    
+    Solo comprueba que la respuesta sea un número: el motor de precios
+    valida el saldo y que el descuento no supere el total (ErrorPrecio).
     
     Args:
-        total (float): Total del pedido
         puntos_disponibles (int): Puntos disponibles del cliente
     
     Returns:
-        tuple: (nuevo_total, puntos_usados)
+        int: Puntos a usar (0 si no quiere usarlos)
     """
     if puntos_disponibles == 0:
-        return total, 0
+        return 0
     
     # Conversión: 100 puntos = $1
     descuento_maximo = puntos_disponibles / 100
@@ -187,7 +197,6 @@ def calcular_precio_con_puntos(total, puntos_disponibles):
             print("❌ Por favor, ingresa 's' o 'n'")
     
     if usar in ["s", "si"]:
-        puntos_a_usar = 0
         while True:
             entrada = input(f"¿Cuántos puntos quieres usar? (máx {puntos_disponibles}): ")
             
@@ -199,38 +208,10 @@ def calcular_precio_con_puntos(total, puntos_disponibles):
                     break
             
             if es_numero and entrada != "":
-                puntos_a_usar = int(entrada)
-                if 0 <= puntos_a_usar <= puntos_disponibles:
-                    descuento = puntos_a_usar / 100
-                    if descuento <= total:
-                        return total - descuento, puntos_a_usar
-                    else:
-                        print(f"❌ El descuento (${descuento:.2f}) es mayor que el total")
-                else:
-                    print(f"❌ Debes ingresar un número entre 0 y {puntos_disponibles}")
-            else:
-                print("❌ Por favor, ingresa un número válido")
+                return int(entrada)
+            print("❌ Por favor, ingresa un número válido")
     
-    return total, 0
-
-
-def verificar_combo(items_pedido):
-    """
-    Verifica si los items del pedido forman algún combo.
-    
-    Args:
-        items_pedido (list): Lista de nombres de productos en el pedido
-    
-    Returns:
-        tuple: (nombre_combo, descuento) o (None, 0) si no hay combo
-    """
-    for nombre_combo in combos_del_dia:
-        info_combo = combos_del_dia[nombre_combo]
-        # Verificar si todos los items del combo están en el pedido
-        if all(item in items_pedido for item in info_combo["items"]):
-            return nombre_combo, info_combo["descuento"]
-
-    return None, 0
+    return 0
 
 
 def realizar_pedido(nombre_cliente, puntos_disponibles):
@@ -400,62 +381,49 @@ def procesar_pedido(carrito, nombre_cliente, puntos_disponibles):
     Returns:
         tuple: (total_final, puntos_ganados, puntos_usados)
     """
-    # Calcular totales iniciales
-    subtotal = 0
-    tiempo_max = 0
-    puntos_ganados = 0
-    items_pedido = []
+    # El motor calcula el precio; aquí solo se muestra y se pregunta.
+    # Los puntos se piden antes para calcular el carrito una sola vez: si el
+    # motor los rechaza, se muestra su mensaje y se vuelven a pedir
+    lineas = [(nombre, cantidad) for nombre, cantidad, _, _, _ in carrito]
+    puntos_usados = pedir_puntos(puntos_disponibles)
+    while True:
+        try:
+            pedido = calcular_precio(catalogo, lineas, puntos_usados, puntos_disponibles)
+            break
+        except ErrorPrecio as error:
+            if not puntos_usados:
+                raise
+            print(f"❌ {error}")
+            puntos_usados = pedir_puntos(puntos_disponibles)
     
     print("\n" + "=" * 60)
     print("         📋 RESUMEN DEL PEDIDO")
     print("=" * 60)
     
-    for item in carrito:
-        nombre, cantidad, precio, tiempo, puntos = item
-        subtotal_item = cantidad * precio
-        subtotal += subtotal_item
-        puntos_ganados += puntos * cantidad
-        tiempo_max = max(tiempo_max, tiempo)
-        
-        # Agregar items al listado para verificar combos
-        for _ in range(cantidad):
-            items_pedido += [nombre]
-        
-        print(f"{cantidad}x {nombre}: ${subtotal_item:.2f}")
+    for nombre, cantidad, _, importe in pedido.lineas:
+        print(f"{cantidad}x {nombre}: ${importe:.2f}")
     
     print("-" * 60)
-    print(f"Subtotal: ${subtotal:.2f}")
-    
-    # Verificar si hay combo
-    combo_aplicado, descuento_combo = verificar_combo(items_pedido)
-    descuento_monto = 0
-    
-    if combo_aplicado:
-        descuento_monto = subtotal * (descuento_combo / 100)
-        print(f"\n🎉 ¡Combo {combo_aplicado} aplicado!")
-        print(f"   Descuento del {descuento_combo}%: -${descuento_monto:.2f}")
-    
-    total = subtotal - descuento_monto
-    
-    # Aplicar descuento por puntos si el cliente quiere
-    puntos_usados = 0
-    if puntos_disponibles > 0:
-        total, puntos_usados = calcular_precio_con_puntos(total, puntos_disponibles)
-        if puntos_usados > 0:
-            print(f"⭐ Puntos usados: {puntos_usados} (-${puntos_usados/100:.2f})")
-    
-    # Happy Hour: 10% descuento adicional (simulado con número de pedidos)
-    pedidos_del_dia = 47  # Número fijo para simular pedidos del día
-    if pedidos_del_dia % 10 == 7:  # Cada 10 pedidos, el séptimo tiene happy hour
-        descuento_happy = total * 0.10
-        print(f"\n🍻 ¡HAPPY HOUR! 10% descuento adicional: -${descuento_happy:.2f}")
-        total -= descuento_happy
-    
-    # Cliente sorpresa (cada pedido 50)
-    if pedidos_del_dia == 50:
+    print(f"Subtotal: ${pedido.subtotal:.2f}")
+    
+    if pedido.combo:
+        print(f"\n🎉 ¡Combo {pedido.combo} aplicado!")
+        print(f"   Descuento del {pedido.porcentaje_combo}%: -${pedido.descuento_combo:.2f}")
+    
+    if pedido.puntos_usados > 0:
+        print(f"⭐ Puntos usados: {pedido.puntos_usados} (-${pedido.descuento_puntos:.2f})")
+    
+    if pedido.happy_hour:
+        print(f"\n🍻 ¡HAPPY HOUR! 10% descuento adicional: -${pedido.descuento_happy_hour:.2f}")
+    
+    if pedido.gratis:
         print("\n🎊 ¡FELICIDADES! ¡Eres nuestro cliente #50 del día!")
         print("   ¡Tu pedido es GRATIS! 🎁")
-        total = 0
+    
+    total = pedido.total
+    tiempo_max = pedido.tiempo
+    puntos_ganados = pedido.puntos_ganados
+    puntos_usados = pedido.puntos_usados
     
     print("\n" + "=" * 60)
     print(f"TOTAL A PAGAR: ${total:.2f}")
@@ -639,5 +607,7 @@ def main():
 
 
 # ===== EJECUTAR EL PROGRAMA =====
-# Llamar a la función principal
-main()
\ No newline at end of file
+# Solo al ejecutar el script: importarlo (por ejemplo, desde
+# motor_precios.py) no abre el menú
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,430 @@
+"""
+Motor de precios de Python Eats
+
+Calcula el precio de un pedido sin pedir ni imprimir nada, para poder
+usarlo desde el menú de consola (delivery_system.py), desde una web o para
+calcular miles de carritos seguidos.
+
+Reglas (las mismas que aplicaba procesar_pedido):
+  1. Subtotal: cantidad x precio de cada línea.
+  2. Combo: el primer combo del día cuyos productos están todos en el
+     carrito descuenta su porcentaje del subtotal.
+  3. Puntos: 100 puntos = $1, sin pasar del total tras el combo.
+  4. Happy Hour: 10% adicional cuando pedidos_del_dia termina en 7.
+  5. El pedido número 50 del día es gratis.
+Los puntos ganados son los puntos de cada producto por su cantidad y el
+tiempo de entrega es el del plato más lento.
+
+calcular_lote calcula lotes grandes con numpy (se importa solo al usarlo).
+
+Uso como benchmark:
+    python motor_precios.py --carritos 200000
+"""
+
+import argparse
+import numbers
+import random
+import time
+
+
+PUNTOS_POR_DOLAR = 100          # 100 puntos = $1 de descuento
+DESCUENTO_HAPPY_HOUR = 10       # Porcentaje
+PEDIDO_GRATIS = 50              # Número de pedido del día que sale gratis
+PEDIDOS_DEL_DIA = 47            # Número fijo para simular pedidos del día
+
+
+class ErrorPrecio(ValueError):
+    """El carrito o los puntos no son válidos."""
+
+
+class Catalogo:
+    """Menú y combos preparados para calcular precios rápido."""
+
+    def __init__(self, menu, combos):
+        """
+        Args:
+            menu (dict): Categoría -> producto -> {precio, tiempo, puntos}
+            combos (dict): Nombre -> {items, descuento}
+        """
+        # Producto -> (precio, tiempo, puntos), sin categorías
+        self.productos = {}
+        for productos in menu.values():
+            for nombre, info in productos.items():
+                self.productos[nombre] = (info["precio"], info["tiempo"], info["puntos"])
+        # En el orden del diccionario: se aplica el primero que encaje
+        self.combos = [(nombre, frozenset(info["items"]), info["descuento"])
+                       for nombre, info in combos.items()]
+        # Orden de las columnas de la matriz de cantidades (calcular_lote)
+        self.nombres = list(self.productos)
+        self.indices = {nombre: indice for indice, nombre in enumerate(self.nombres)}
+        self._arrays = None
+
+    def arrays(self):
+        """
+        Columnas del catálogo para calcular_lote (se preparan una vez).
+
+        Returns:
+            tuple: (precios, tiempos, puntos, columnas de cada combo,
+                porcentajes de los combos terminados en 0)
+        """
+        if self._arrays is None:
+            import numpy as np
+
+            valores = [self.productos[nombre] for nombre in self.nombres]
+            self._arrays = (
+                np.array([precio for precio, _, _ in valores], dtype=np.float64),
+                np.array([tiempo for _, tiempo, _ in valores], dtype=np.int64),
+                np.array([puntos for _, _, puntos in valores], dtype=np.int64),
+                [np.array([self.indices[item] for item in items], dtype=np.int64)
+                 for _, items, _ in self.combos],
+                np.array([descuento for _, _, descuento in self.combos] + [0]),
+            )
+        return self._arrays
+
+
+class Desglose:
+    """Precio de un pedido, paso a paso."""
+
+    __slots__ = ("lineas", "subtotal", "combo", "porcentaje_combo", "descuento_combo",
+                 "puntos_usados", "descuento_puntos", "happy_hour", "descuento_happy_hour",
+                 "gratis", "total", "tiempo", "puntos_ganados")
+
+    def __init__(self, lineas, subtotal, combo, porcentaje_combo, descuento_combo,
+                 puntos_usados, descuento_puntos, happy_hour, descuento_happy_hour,
+                 gratis, total, tiempo, puntos_ganados):
+        self.lineas = lineas
+        self.subtotal = subtotal
+        self.combo = combo
+        self.porcentaje_combo = porcentaje_combo
+        self.descuento_combo = descuento_combo
+        self.puntos_usados = puntos_usados
+        self.descuento_puntos = descuento_puntos
+        self.happy_hour = happy_hour
+        self.descuento_happy_hour = descuento_happy_hour
+        self.gratis = gratis
+        self.total = total
+        self.tiempo = tiempo
+        self.puntos_ganados = puntos_ganados
+
+    @property
+    def total_tras_combo(self):
+        """Total sobre el que se pueden usar puntos."""
+        return self.subtotal - self.descuento_combo
+
+    def a_dict(self):
+        """Desglose como diccionario (para JSON)."""
+        datos = {campo: getattr(self, campo) for campo in self.__slots__}
+        datos["lineas"] = [
+            {"producto": nombre, "cantidad": cantidad, "precio": precio, "importe": importe}
+            for nombre, cantidad, precio, importe in self.lineas
+        ]
+        return datos
+
+
+def es_happy_hour(pedidos_del_dia):
+    """Cada 10 pedidos, el séptimo tiene happy hour."""
+    return pedidos_del_dia % 10 == 7
+
+
+def es_pedido_gratis(pedidos_del_dia):
+    return pedidos_del_dia == PEDIDO_GRATIS
+
+
+def _es_entero(valor):
+    """True para enteros de Python o de numpy (no para bool ni 2.0)."""
+    return isinstance(valor, numbers.Integral) and not isinstance(valor, bool)
+
+
+def _lineas(carrito):
+    """Pares (producto, cantidad) de un diccionario o de una lista de pares."""
+    return carrito.items() if isinstance(carrito, dict) else carrito
+
+
+def _precio(productos, combos, carrito, puntos_a_usar, puntos_disponibles,
+            happy_hour, gratis):
+    """Núcleo del cálculo, con el catálogo ya preparado."""
+    lineas = []
+    cantidades = {}
+    subtotal = 0
+    puntos_ganados = 0
+    tiempo = 0
+    for nombre, cantidad in _lineas(carrito):
+        info = productos.get(nombre)
+        if info is None:
+            raise ErrorPrecio(f"Producto desconocido: {nombre}")
+        # type() primero: isinstance contra la ABC es varias veces más lento
+        if (type(cantidad) is not int and not _es_entero(cantidad)) or cantidad <= 0:
+            raise ErrorPrecio(f"Cantidad no válida para {nombre}: {cantidad}")
+        precio, tiempo_producto, puntos = info
+        importe = cantidad * precio
+        subtotal += importe
+        puntos_ganados += puntos * cantidad
+        if tiempo_producto > tiempo:
+            tiempo = tiempo_producto
+        cantidades[nombre] = cantidades.get(nombre, 0) + cantidad
+        lineas.append((nombre, cantidad, precio, importe))
+    if not lineas:
+        raise ErrorPrecio("El carrito está vacío")
+
+    combo, porcentaje_combo, descuento_combo = None, 0, 0
+    for nombre_combo, items, descuento in combos:
+        if items <= cantidades.keys():
+            combo, porcentaje_combo = nombre_combo, descuento
+            descuento_combo = subtotal * (descuento / 100)
+            break
+    total = subtotal - descuento_combo
+
+    descuento_puntos = 0
+    if puntos_a_usar:
+        if not _es_entero(puntos_a_usar) or puntos_a_usar < 0:
+            raise ErrorPrecio(f"Puntos no válidos: {puntos_a_usar}")
+        if puntos_disponibles is not None and puntos_a_usar > puntos_disponibles:
+            raise ErrorPrecio(f"Debes usar entre 0 y {puntos_disponibles} puntos")
+        descuento_puntos = puntos_a_usar / PUNTOS_POR_DOLAR
+        if descuento_puntos > total:
+            raise ErrorPrecio(f"El descuento (${descuento_puntos:.2f}) es mayor que el total")
+        total -= descuento_puntos
+
+    descuento_happy_hour = 0
+    if happy_hour:
+        descuento_happy_hour = total * (DESCUENTO_HAPPY_HOUR / 100)
+        total -= descuento_happy_hour
+    if gratis:
+        total = 0
+
+    return Desglose(lineas, subtotal, combo, porcentaje_combo, descuento_combo,
+                    puntos_a_usar or 0, descuento_puntos, happy_hour, descuento_happy_hour,
+                    gratis, total, tiempo, puntos_ganados)
+
+
+def calcular_precio(catalogo, carrito, puntos_a_usar=0, puntos_disponibles=None,
+                    pedidos_del_dia=PEDIDOS_DEL_DIA):
+    """
+    Calcula el precio de un pedido.
+
+    Args:
+        catalogo (Catalogo): Menú y combos
+        carrito: {producto: cantidad} o lista de pares (producto, cantidad),
+            con cantidades enteras positivas
+        puntos_a_usar (int): Puntos que el cliente quiere canjear
+        puntos_disponibles (int): Saldo de puntos del cliente (None = sin
+            comprobar el saldo)
+        pedidos_del_dia (int): Número del pedido en el día
+
+    Returns:
+        Desglose: Precio paso a paso
+
+    Raises:
+        ErrorPrecio: Si el carrito o los puntos no son válidos
+    """
+    return _precio(catalogo.productos, catalogo.combos, carrito, puntos_a_usar,
+                   puntos_disponibles, es_happy_hour(pedidos_del_dia),
+                   es_pedido_gratis(pedidos_del_dia))
+
+
+class Lote:
+    """
+    Precios de un lote de carritos, por columnas (un array por concepto).
+
+    Cada array tiene un elemento por carrito; combo es el índice del combo
+    aplicado en catalogo.combos (-1 si ninguno).
+    """
+
+    def __init__(self, catalogo, subtotal, combo, porcentaje_combo, descuento_combo,
+                 puntos_usados, descuento_puntos, happy_hour, descuento_happy_hour,
+                 gratis, total, tiempo, puntos_ganados):
+        self.catalogo = catalogo
+        self.subtotal = subtotal
+        self.combo = combo
+        self.porcentaje_combo = porcentaje_combo
+        self.descuento_combo = descuento_combo
+        self.puntos_usados = puntos_usados
+        self.descuento_puntos = descuento_puntos
+        self.happy_hour = happy_hour
+        self.descuento_happy_hour = descuento_happy_hour
+        self.gratis = gratis
+        self.total = total
+        self.tiempo = tiempo
+        self.puntos_ganados = puntos_ganados
+
+    def __len__(self):
+        return len(self.total)
+
+    def nombre_combo(self, indice):
+        """Nombre del combo aplicado al carrito indice (o None)."""
+        combo = int(self.combo[indice])
+        return self.catalogo.combos[combo][0] if combo >= 0 else None
+
+
+def matriz_cantidades(catalogo, carritos):
+    """
+    Carritos como matriz de cantidades (carrito x producto, en el orden de
+    catalogo.nombres). Es la entrada más rápida de calcular_lote.
+
+    Raises:
+        ErrorPrecio: Si algún carrito no es válido (indica cuál)
+    """
+    import numpy as np
+
+    indices = catalogo.indices
+    cantidades = np.zeros((len(carritos), len(indices)), dtype=np.int64)
+    for fila, carrito in enumerate(carritos):
+        for nombre, cantidad in _lineas(carrito):
+            columna = indices.get(nombre)
+            if columna is None:
+                raise ErrorPrecio(f"Carrito {fila}: Producto desconocido: {nombre}")
+            if (type(cantidad) is not int and not _es_entero(cantidad)) or cantidad <= 0:
+                raise ErrorPrecio(f"Carrito {fila}: Cantidad no válida para {nombre}: {cantidad}")
+            cantidades[fila, columna] += cantidad
+    return cantidades
+
+
+def _primer_error(mascara, mensaje):
+    """Lanza ErrorPrecio con el primer carrito marcado en mascara."""
+    if mascara.any():
+        raise ErrorPrecio(f"Carrito {int(mascara.argmax())}: {mensaje}")
+
+
+def calcular_lote(catalogo, carritos, puntos_a_usar=None, puntos_disponibles=None,
+                  pedidos_del_dia=PEDIDOS_DEL_DIA):
+    """
+    Calcula el precio de muchos carritos de una vez, con numpy.
+
+    Cada regla se aplica a todo el lote con operaciones sobre arrays: el
+    subtotal, los puntos ganados y el combo salen de la matriz de
+    cantidades, sin recorrer los carritos uno a uno en Python. Los
+    resultados coinciden con calcular_precio (salvo redondeos del orden de
+    1e-12 al sumar).
+
+    Args:
+        catalogo (Catalogo): Menú y combos
+        carritos: Lista de carritos (ver calcular_precio) o matriz de
+            cantidades (ver matriz_cantidades)
+        puntos_a_usar: Puntos a canjear en cada carrito (None = ninguno)
+        puntos_disponibles: Saldo de cada cliente (None = sin comprobar)
+        pedidos_del_dia (int): Número del pedido en el día, igual para todo el lote
+
+    Returns:
+        Lote: Precios por columnas
+
+    Raises:
+        ErrorPrecio: Si algún carrito no es válido (indica el primero)
+    """
+    import numpy as np
+
+    if isinstance(carritos, np.ndarray):
+        cantidades = carritos
+        if cantidades.ndim != 2 or cantidades.shape[1] != len(catalogo.nombres):
+            raise ErrorPrecio(f"Se espera una matriz de N x {len(catalogo.nombres)} cantidades")
+        if not np.issubdtype(cantidades.dtype, np.integer):
+            raise ErrorPrecio(f"Las cantidades deben ser enteras (dtype {cantidades.dtype})")
+        _primer_error((cantidades < 0).any(axis=1), "Cantidad negativa")
+    else:
+        cantidades = matriz_cantidades(catalogo, carritos)
+    precios, tiempos, puntos, columnas_combos, porcentajes = catalogo.arrays()
+
+    pedidos = cantidades > 0
+    _primer_error(~pedidos.any(axis=1), "El carrito está vacío")
+    subtotal = cantidades @ precios
+    puntos_ganados = cantidades @ puntos
+    tiempo = np.where(pedidos, tiempos, 0).max(axis=1)
+
+    # Se recorren los combos al revés para que gane el primero que encaje
+    combo = np.full(len(cantidades), -1)
+    for indice in range(len(columnas_combos) - 1, -1, -1):
+        combo[pedidos[:, columnas_combos[indice]].all(axis=1)] = indice
+    # porcentajes acaba en 0: el índice -1 (sin combo) no descuenta nada
+    porcentaje_combo = porcentajes[combo]
+    descuento_combo = subtotal * (porcentaje_combo / 100)
+    total = subtotal - descuento_combo
+
+    if puntos_a_usar is None:
+        puntos_usados = np.zeros(len(cantidades), dtype=np.int64)
+    else:
+        puntos_usados = np.asarray(puntos_a_usar)
+        if puntos_usados.size and not np.issubdtype(puntos_usados.dtype, np.integer):
+            raise ErrorPrecio(f"Los puntos deben ser enteros (dtype {puntos_usados.dtype})")
+        puntos_usados = puntos_usados.astype(np.int64)
+        if puntos_usados.shape != (len(cantidades),):
+            raise ErrorPrecio("Los carritos y los puntos deben tener la misma longitud")
+    _primer_error(puntos_usados < 0, "Puntos no válidos")
+    if puntos_disponibles is not None:
+        _primer_error(puntos_usados > np.asarray(puntos_disponibles),
+                      "Puntos por encima del saldo")
+    descuento_puntos = puntos_usados / PUNTOS_POR_DOLAR
+    _primer_error(descuento_puntos > total, "El descuento es mayor que el total")
+    total = total - descuento_puntos
+
+    happy_hour = es_happy_hour(pedidos_del_dia)
+    gratis = es_pedido_gratis(pedidos_del_dia)
+    descuento_happy_hour = total * (DESCUENTO_HAPPY_HOUR / 100 if happy_hour else 0)
+    total = total - descuento_happy_hour
+    if gratis:
+        total = np.zeros_like(total)
+
+    return Lote(catalogo, subtotal, combo, porcentaje_combo, descuento_combo, puntos_usados,
+                descuento_puntos, happy_hour, descuento_happy_hour, gratis, total, tiempo,
+                puntos_ganados)
+
+
+def carritos_aleatorios(catalogo, cantidad, semilla=0):
+    """Carritos de prueba de 1 a 6 líneas (para el benchmark)."""
+    generador = random.Random(semilla)
+    nombres = list(catalogo.productos)
+    return [
+        {nombre: generador.randint(1, 3)
+         for nombre in generador.sample(nombres, generador.randint(1, 6))}
+        for _ in range(cantidad)
+    ]
+
+
+def benchmark(catalogo, cantidad=100_000, semilla=0):
+    """
+    Mide cuántos carritos por segundo se calculan: uno a uno, en lote desde
+    la lista de carritos y en lote desde la matriz de cantidades.
+
+    Returns:
+        dict: carritos/s de cada camino
+    """
+    carritos = carritos_aleatorios(catalogo, cantidad, semilla)
+
+    inicio = time.perf_counter()
+    for carrito in carritos:
+        calcular_precio(catalogo, carrito)
+    uno_a_uno = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    calcular_lote(catalogo, carritos)
+    lote = time.perf_counter() - inicio
+
+    cantidades = matriz_cantidades(catalogo, carritos)
+    inicio = time.perf_counter()
+    calcular_lote(catalogo, cantidades)
+    matriz = time.perf_counter() - inicio
+
+    return {
+        "carritos": cantidad,
+        "uno_a_uno_por_s": round(cantidad / uno_a_uno),
+        "lote_por_s": round(cantidad / lote),
+        "matriz_por_s": round(cantidad / matriz),
+    }
+
+
+def main():
+    """Benchmark del motor con el menú de delivery_system."""
+    parser = argparse.ArgumentParser(description="Benchmark del motor de precios")
+    parser.add_argument("--carritos", type=int, default=100_000, help="Carritos a calcular")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de los carritos")
+    args = parser.parse_args()
+
+    from delivery_system import combos_del_dia, menu
+
+    resultado = benchmark(Catalogo(menu, combos_del_dia), args.carritos, args.semilla)
+    print(f"Carritos: {resultado['carritos']}")
+    print(f"  Uno a uno: {resultado['uno_a_uno_por_s']:,} carritos/s")
+    print(f"  En lote:   {resultado['lote_por_s']:,} carritos/s")
+    print(f"  Matriz:    {resultado['matriz_por_s']:,} carritos/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""Configuración común de las pruebas del Tema 4."""
+
+import os
+import sys
+
+# Los módulos se importan como en los scripts: import motor_precios
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+"""Motor de precios (motor_precios.py) y su uso desde el menú de consola."""
+
+import numpy as np
+import pytest
+
+import delivery_system
+from delivery_system import catalogo
+from motor_precios import (ErrorPrecio, calcular_lote, calcular_precio, carritos_aleatorios,
+                           matriz_cantidades)
+
+
+def test_combo_points_and_happy_hour():
+    carrito = {"Pizza Margherita": 2, "Refresco": 1, "Helado": 1}
+    pedido = calcular_precio(catalogo, carrito, puntos_a_usar=300, pedidos_del_dia=47)
+    assert pedido.subtotal == 38.0
+    assert pedido.combo == "Combo Italiano" and pedido.porcentaje_combo == 15
+    assert pedido.descuento_combo == pytest.approx(5.7)
+    assert pedido.descuento_puntos == 3.0
+    assert pedido.descuento_happy_hour == pytest.approx((38.0 - 5.7 - 3.0) * 0.10)
+    assert pedido.total == pytest.approx((38.0 - 5.7 - 3.0) * 0.90)
+    assert pedido.tiempo == 20 and pedido.puntos_ganados == 2 * 100 + 15 + 30
+
+
+def test_first_matching_combo_wins_and_order_fifty_is_free():
+    carrito = [("Hamburguesa Clásica", 1), ("Nachos", 1), ("Refresco", 1),
+               ("Pizza Margherita", 1)]
+    pedido = calcular_precio(catalogo, carrito, pedidos_del_dia=50)
+    assert pedido.combo == "Combo Italiano"
+    assert not pedido.happy_hour and pedido.gratis and pedido.total == 0
+
+
+@pytest.mark.parametrize('pedidos_del_dia', [47, 50, 12])
+def test_batch_matches_per_cart(pedidos_del_dia):
+    carritos = carritos_aleatorios(catalogo, 500, semilla=1)
+    puntos = [(i * 37) % 400 for i in range(len(carritos))]
+    lote = calcular_lote(catalogo, carritos, puntos, pedidos_del_dia=pedidos_del_dia)
+    matriz = calcular_lote(catalogo, matriz_cantidades(catalogo, carritos), puntos,
+                           pedidos_del_dia=pedidos_del_dia)
+    for indice, carrito in enumerate(carritos):
+        pedido = calcular_precio(catalogo, carrito, puntos[indice],
+                                 pedidos_del_dia=pedidos_del_dia)
+        for resultado in (lote, matriz):
+            assert resultado.total[indice] == pytest.approx(pedido.total, abs=1e-9)
+            assert resultado.subtotal[indice] == pytest.approx(pedido.subtotal, abs=1e-9)
+            assert resultado.tiempo[indice] == pedido.tiempo
+            assert resultado.puntos_ganados[indice] == pedido.puntos_ganados
+            assert resultado.nombre_combo(indice) == pedido.combo
+
+
+@pytest.mark.parametrize('cantidad', [2.5, 2.0, True, 0, -1, "2"])
+def test_quantities_must_be_positive_integers(cantidad):
+    carrito = {"Nachos": cantidad}
+    with pytest.raises(ErrorPrecio):
+        calcular_precio(catalogo, carrito)
+    with pytest.raises(ErrorPrecio, match="Carrito 1"):
+        calcular_lote(catalogo, [{"Agua": 1}, carrito])
+
+
+def test_numpy_integer_quantities_are_accepted():
+    assert calcular_precio(catalogo, {"Agua": np.int64(3)}).subtotal == 6.0
+
+
+def test_matrix_must_be_integer():
+    cantidades = matriz_cantidades(catalogo, [{"Agua": 1}]).astype(np.float64)
+    with pytest.raises(ErrorPrecio, match="enteras"):
+        calcular_lote(catalogo, cantidades)
+
+
+def test_points_are_validated():
+    carrito = {"Agua": 1}
+    with pytest.raises(ErrorPrecio, match="entre 0 y 100"):
+        calcular_precio(catalogo, carrito, 150, puntos_disponibles=100)
+    with pytest.raises(ErrorPrecio, match="mayor que el total"):
+        calcular_precio(catalogo, carrito, 500)
+    with pytest.raises(ErrorPrecio):
+        calcular_precio(catalogo, carrito, 50.5)
+    with pytest.raises(ErrorPrecio, match="enteros"):
+        calcular_lote(catalogo, [carrito], [50.5])
+    with pytest.raises(ErrorPrecio, match="Carrito 0"):
+        calcular_lote(catalogo, [carrito], [500])
+
+
+def test_cli_reasks_points_with_the_engine_message(monkeypatch, capsys):
+    carrito = [("Agua", 1, 2.00, 1, 10)]
+    respuestas = iter(["s", "300", "s", "100", "s", ""])
+    monkeypatch.setattr('builtins.input', lambda mensaje="": next(respuestas))
+    llamadas = []
+    original = delivery_system.calcular_precio
+
+    def calcular(*args, **kwargs):
+        llamadas.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(delivery_system, 'calcular_precio', calcular)
+    monkeypatch.setitem(delivery_system.clientes_vip, "test", {"puntos": 0, "pedidos": 0})
+    total, _, puntos_usados = delivery_system.procesar_pedido(carrito, "test", 500)
+    assert "mayor que el total" in capsys.readouterr().out
+    assert puntos_usados == 100 and total == pytest.approx((2.0 - 1.0) * 0.9)
+    # Una vez con los puntos rechazados y otra con los buenos
+    assert len(llamadas) == 2
@@ -1,20 +1,238 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from urllib.parse import urlparse
+
 import streamlit as st
 
-from config import PAGE_CONFIG
-from src.models import ImageEnhancer
+from config import CONFIG, PAGE_CONFIG
+from src import scratches, startup
+from src.client import EnhanceClient, ServiceRequestError, ServiceUnavailableError
+from src.downloads import DownloadEncoder
+from src.ingest import IngestError, decode_bgr
+from src.jobs import DONE, FAILED, QueueFullError
+from src.metrics import HistogramRegistry, JsonLinesSink, MetricsRecorder
+from src.results import ResultStore
+from src.service import build_service, create_server, serve_in_background
 from src.ui import (
     render_header,
     render_file_uploader,
     render_interactive_slider,
     render_download_button,
+    render_job_status,
+    render_progressive_preview,
+    render_model_memory,
+    render_result_store,
+    render_startup_report,
+    render_trace,
+    render_damage_mask,
+    render_video_result,
     render_instructions
 )
-from src.utils import pil_to_bgr, bgr_to_pil, load_image
+from src.utils import load_image
 
 
 st.set_page_config(**PAGE_CONFIG)
 
 
+@st.cache_resource
+def get_metrics():
+    """Métricas por etapa: histogramas en memoria y, opcionalmente, log."""
+    recorder = MetricsRecorder([HistogramRegistry()])
+    if CONFIG['metrics_log']:
+        recorder.add_sink(JsonLinesSink(CONFIG['metrics_log']))
+    return recorder
+
+
+@st.cache_resource
+def get_download_encoder():
+    """Codificador de descargas compartido (bytes cacheados por resultado)."""
+    return DownloadEncoder()
+
+
+@st.cache_resource
+def get_result_store():
+    """Resultados de todas las sesiones, codificados y con techo de memoria."""
+    return ResultStore()
+
+
+def get_session_id():
+    """Identificador de la sesión de Streamlit actual."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+
+@st.cache_resource
+def get_service_client():
+    """
+    Cliente del servicio de mejora (ver src/service.py y server.py).
+
+    Si no hay ningún servicio en CONFIG['service_url'] y service_autostart
+    está activo, se arranca uno dentro de este proceso (con su cola de
+    trabajos, caché de resultados y precalentamiento de modelos).
+    """
+    client = EnhanceClient()
+    if client.is_alive() or not CONFIG['service_autostart']:
+        return client
+    startup.prepare()
+    service = build_service(metrics=get_metrics())
+    if CONFIG['warmup']:
+        startup.start_background_warmup(service.enhancer.registry)
+    url = urlparse(CONFIG['service_url'])
+    serve_in_background(create_server(service, url.hostname, url.port))
+    return client
+
+
+def get_damage_preview(uploaded_file):
+    """
+    Vista previa de la máscara de daños de la imagen subida, una vez por
+    fichero.
+
+    La máscara se calcula con la caché compartida de src.scratches sobre
+    la misma decodificación que hace el servicio, así que si este corre en
+    el mismo proceso la reutiliza. La sesión solo guarda la vista previa a
+    resolución de pantalla, no la imagen ni la máscara completas.
+
+    Returns:
+        tuple: (vista previa BGR, fracción dañada)
+    """
+    cached = st.session_state.get('damage_preview')
+    if cached is None or cached[0] != uploaded_file.file_id:
+        image_bgr = decode_bgr(uploaded_file)[0]
+        preview = scratches.damage_preview(image_bgr, scratches.mask_cache.get(image_bgr),
+                                           CONFIG['preview_display_width'])
+        cached = (uploaded_file.file_id, *preview)
+        st.session_state['damage_preview'] = cached
+    return cached[1], cached[2]
+
+
+def poll_job(client):
+    """
+    Consulta el trabajo en curso de la sesión.
+
+    Mientras no termina, muestra su estado y vuelve a ejecutar el script
+    tras un breve intervalo. Al terminar descarga el resultado a la sesión.
+    """
+    job_id = st.session_state.get('job_id')
+    if job_id is None:
+        return
+    try:
+        job = client.status(job_id)
+    except ServiceRequestError as e:
+        st.session_state.pop('job_id')
+        st.error(f"Error al consultar el trabajo: {e}")
+        return
+
+    if not job.finished:
+        if job.preview_ready:
+            # La vista previa se descarga una sola vez por trabajo
+            if st.session_state.get('preview', (None,))[0] != job_id:
+                try:
+                    st.session_state['preview'] = (job_id, client.preview(job_id))
+                except ServiceRequestError:
+                    pass
+            if st.session_state.get('preview', (None,))[0] == job_id:
+                render_progressive_preview(st.session_state['preview'][1])
+        if render_job_status(job, job.position):
+            client.cancel(job_id)
+        time.sleep(CONFIG['job_poll_interval'])
+        st.rerun()
+
+    st.session_state.pop('job_id')
+    st.session_state.pop('preview', None)
+    try:
+        if job.status == DONE and 'pending_video' in st.session_state:
+            client.result_to(job_id, st.session_state['pending_video'])
+            st.session_state['video_output'] = st.session_state.pop('pending_video')
+            st.session_state['video_report'] = job.report
+            st.success("✅ ¡Vídeo mejorado!")
+        elif job.status == DONE:
+            original_bytes = st.session_state.pop('pending_upload', None)
+            if original_bytes is None:
+                # Sin la subida no hay comparador: se pide repetir la mejora
+                st.warning("La imagen original ya no está en la sesión: vuelve a mejorarla")
+            else:
+                # El resultado llega ya codificado (el servicio lo codifica en
+                # segundo plano al terminar) y se guarda así, sin decodificarlo
+                fmt = CONFIG['result_store_format']
+                get_result_store().put(
+                    get_session_id(),
+                    job_id,
+                    original_bytes,
+                    client.result(job_id, fmt),
+                    fmt
+                )
+                st.session_state['trace'] = client.trace(job_id)
+                st.session_state['result_id'] = job_id
+                st.success("✅ ¡Imagen mejorada!")
+        elif job.status == FAILED:
+            st.error(f"Error al procesar: {job.error}")
+        else:
+            st.warning("Procesamiento cancelado")
+    finally:
+        # Con el resultado ya en la sesión, el servicio puede olvidar el
+        # trabajo (y su array a resolución completa) en vez de retenerlo
+        try:
+            client.release(job_id)
+        except ServiceRequestError:
+            pass
+    discard_video_output('pending_video')
+    st.session_state.pop('pending_upload', None)
+
+
+def discard_video_output(*keys):
+    """
+    Borra los vídeos de la sesión (y sus directorios temporales).
+
+    Args:
+        *keys: Claves de la sesión con rutas de vídeo (por defecto, el
+            resultado y el que está en curso)
+    """
+    for key in keys or ('video_output', 'pending_video'):
+        path = st.session_state.pop(key, None)
+        if path:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    if not keys or 'video_output' in keys:
+        st.session_state.pop('video_report', None)
+
+
+def render_video_section(client, uploaded_file):
+    """
+    Mejora de un vídeo subido: el servicio lo procesa fotograma a
+    fotograma (ver src/video.py) y el resultado se descarga a disco.
+    """
+    enhance_background = st.checkbox(
+        "✨ Mejorar calidad fondo",
+        value=False,
+        help="Usa RealESRGAN para mejorar el fondo (mucho más lento en vídeo)"
+    )
+
+    busy = 'job_id' in st.session_state
+    if st.button("🎞️ Mejorar Vídeo", type="primary", width='stretch', disabled=busy):
+        try:
+            job = client.submit_video(
+                uploaded_file.getvalue(),
+                uploaded_file.name,
+                enhance_background=enhance_background
+            )
+            # El vídeo nuevo sustituye al anterior: se borra del disco
+            discard_video_output()
+            output = os.path.join(tempfile.mkdtemp(prefix="video_"), "video_mejorado.mp4")
+            st.session_state['job_id'] = job['id']
+            st.session_state['pending_video'] = output
+            st.rerun()
+        except (QueueFullError, ServiceUnavailableError) as e:
+            st.warning(f"⏳ Servidor ocupado: {e}")
+
+    poll_job(client)
+
+    if 'video_output' in st.session_state:
+        render_video_result(st.session_state['video_output'], st.session_state['video_report'])
+
+
 def main():
     """Función principal de la aplicación."""
     
@@ -22,7 +240,8 @@ def main():
     
     # Inicializar el modelo
     try:
-        enhancer = ImageEnhancer()
+        client = get_service_client()
+        client.health()
         st.success("✅ Modelos listos")
     except Exception as e:
         st.error(f"Error al inicializar: {e}")
@@ -31,10 +250,19 @@ def main():
     # Subir archivo
     uploaded_file = render_file_uploader()
     
-    if uploaded_file is not None:
-        # Cargar imagen
-        original_image = load_image(uploaded_file)
-        img_bgr = pil_to_bgr(original_image)
+    is_video = uploaded_file is not None and \
+        uploaded_file.name.rsplit('.', 1)[-1].lower() in CONFIG['video_formats']
+
+    if is_video:
+        render_video_section(client, uploaded_file)
+    elif uploaded_file is not None:
+        # Cargar imagen (a resolución de pantalla: la completa solo la
+        # decodifica el servicio)
+        try:
+            original_image = load_image(uploaded_file, CONFIG['preview_max_width'])
+        except IngestError as e:
+            st.error(str(e))
+            st.stop()
         
         # Mostrar imagen original
         col1, col2 = st.columns(2)
@@ -56,54 +284,82 @@ def main():
                 help="Elimina rayas y arañazos de la foto"
             )
         
+            if repair_scratches:
+                render_damage_mask(*get_damage_preview(uploaded_file))
+        
         with col_opt2:
             enhance_background = st.checkbox(
                 "✨ Mejorar calidad fondo",
                 value=False,
                 help="Usa RealESRGAN para mejorar el fondo (más lento)"
             )
+
+            # Fotos de grupo: solo las caras que importan
+            selection = None
+            if st.checkbox(
+                "🎯 Solo las caras principales",
+                value=False,
+                help="Mejora solo las caras más grandes (y el fondo a su alrededor); "
+                     "el resto se escala sin IA. Mucho más rápido en fotos de grupo"
+            ):
+                selection = {'largest': st.number_input("Número de caras", 1, 20, 1)}
         
         st.markdown("---")
         
         # Botón de procesamiento
-        if st.button("✨ Mejorar Calidad", type="primary", width='stretch'):
-            with st.spinner("Procesando con IA... ⏳"):
-                try:
-                    # Mejorar imagen con opciones seleccionadas
-                    restored_bgr = enhancer.enhance(
-                        img_bgr,
-                        repair_scratches=repair_scratches,
-                        enhance_background=enhance_background
-                    )
-                    restored_image = bgr_to_pil(restored_bgr)
-                    
-                    # Guardar en session state
-                    st.session_state['restored_image'] = restored_image
-                    st.session_state['original_image'] = original_image
-                    
-                    st.success("✅ ¡Imagen mejorada!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error al procesar: {e}")
+        busy = 'job_id' in st.session_state
+        if st.button("✨ Mejorar Calidad", type="primary", width='stretch', disabled=busy):
+            try:
+                # Se envía el fichero tal cual; el servicio lo decodifica
+                # directamente en BGR (src/ingest.py)
+                job = client.submit_image(
+                    uploaded_file.getvalue(),
+                    repair_scratches=repair_scratches,
+                    enhance_background=enhance_background,
+                    progressive=CONFIG['progressive_mode'],
+                    selection=selection
+                )
+                discard_video_output()
+                st.session_state['job_id'] = job['id']
+                st.session_state['pending_upload'] = uploaded_file.getvalue()
+                st.rerun()
+            except (QueueFullError, ServiceUnavailableError) as e:
+                st.warning(f"⏳ Servidor ocupado: {e}")
+
+        poll_job(client)
         
-        # Mostrar resultado si existe
-        if 'restored_image' in st.session_state:
+        # Mostrar resultado si existe (y no se ha expulsado del almacén)
+        store = get_result_store()
+        result_id = st.session_state.get('result_id')
+        preview = store.preview(result_id) if result_id else None
+        if result_id and preview is None:
+            st.session_state.pop('result_id')
+            st.info("El resultado anterior ha caducado; vuelve a mejorar la imagen")
+        if preview is not None:
             with col2:
                 st.subheader("✨ Mejorada")
-                st.image(st.session_state['restored_image'], width='stretch')
+                st.image(preview.level(CONFIG['preview_display_width'])[1], width='stretch')
             
             # Comparador interactivo
-            render_interactive_slider(
-                st.session_state['original_image'],
-                st.session_state['restored_image']
-            )
+            render_interactive_slider(preview)
             
             # Botón de descarga
-            render_download_button(st.session_state['restored_image'])
+            render_download_button(store, result_id, get_download_encoder())
+
+            if CONFIG['show_trace'] and 'trace' in st.session_state:
+                render_trace(st.session_state['trace'])
     else:
         render_instructions()
 
+    render_result_store(get_result_store().stats())
+    startup.report.mark_ready()
+    try:
+        health = client.health()
+    except ServiceRequestError:
+        return
+    render_model_memory(health['models'])
+    render_startup_report(health['startup'])
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
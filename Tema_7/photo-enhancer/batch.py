@@ -0,0 +1,81 @@
+"""
+Mejora por lotes sin interfaz gráfica.
+
+Ejemplos:
+    python batch.py --input-dir escaneos/ --output-dir mejoradas/ --workers 4
+    python batch.py --manifest lista.txt --output-dir mejoradas/ --background
+"""
+
+import argparse
+import json
+import sys
+
+from src.batch import find_images, read_manifest, run_batch
+
+
+def parse_args(argv=None):
+    """Define y parsea los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Mejora de fotos por lotes con GFPGAN")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="Directorio con imágenes (se recorre recursivamente)")
+    source.add_argument("--manifest", help="Fichero con una ruta de imagen por línea")
+    parser.add_argument("--output-dir", required=True, help="Directorio de salida")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos en paralelo (por defecto, núcleos disponibles)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Hilos de torch por proceso (por defecto, núcleos / procesos)")
+    parser.add_argument("--scratches", action="store_true", help="Reparar grietas")
+    parser.add_argument("--background", action="store_true",
+                        help="Mejorar el fondo con RealESRGAN")
+    parser.add_argument("--max-peak-mb", type=int, default=None,
+                        help="Techo de memoria por franja para imágenes grandes")
+    parser.add_argument("--metrics-log", default=None,
+                        help="Fichero JSON-lines con los tiempos por etapa")
+    parser.add_argument("--images-per-task", type=int, default=1,
+                        help="Imágenes por tarea; sus caras se restauran en lotes compartidos")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocesar aunque exista progreso previo")
+    return parser.parse_args(argv)
+
+
+def print_result(result):
+    """Muestra una línea por imagen procesada."""
+    if result['ok']:
+        print(f"✅ {result['input']} ({result['latency']:.2f} s)")
+    else:
+        print(f"❌ {result['input']}: {result['error']}")
+
+
+def main(argv=None):
+    """Punto de entrada del procesamiento por lotes."""
+    args = parse_args(argv)
+
+    if args.input_dir:
+        inputs = find_images(args.input_dir)
+        base_dir = args.input_dir
+    else:
+        inputs = read_manifest(args.manifest)
+        base_dir = None
+
+    summary = run_batch(
+        inputs,
+        args.output_dir,
+        base_dir=base_dir,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        repair_scratches=args.scratches,
+        enhance_background=args.background,
+        resume=not args.no_resume,
+        on_result=print_result,
+        max_peak_mb=args.max_peak_mb,
+        metrics_log=args.metrics_log,
+        images_per_task=args.images_per_task
+    )
+
+    print("\n📊 Resumen")
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
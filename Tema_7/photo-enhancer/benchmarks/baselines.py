@@ -0,0 +1,45 @@
+"""
+Implementaciones anteriores que se conservan solo como referencia en los
+benchmarks (la app ya no las usa).
+"""
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def compose_split(original_image, restored_image, slider_value):
+    """
+    Vista dividida original/restaurada a resolución completa, como la
+    componía el comparador antes de src/preview.py.
+
+    Args:
+        original_image: Imagen original (PIL Image)
+        restored_image: Imagen restaurada (PIL Image)
+        slider_value: Posición de la división (0 a 100)
+
+    Returns:
+        numpy array RGB con la composición
+    """
+    # Asegurar mismo tamaño
+    if original_image.size != restored_image.size:
+        restored_image = restored_image.resize(original_image.size, Image.LANCZOS)
+
+    # Crear imagen dividida
+    width = original_image.width
+    split_pos = int(width * slider_value / 100)
+
+    combined = Image.new('RGB', original_image.size)
+    combined.paste(original_image.crop((0, 0, split_pos, original_image.height)), (0, 0))
+    combined.paste(restored_image.crop((split_pos, 0, width, original_image.height)), (split_pos, 0))
+
+    # Añadir línea divisoria
+    combined_array = np.array(combined)
+    cv2.line(
+        combined_array,               # imagen
+        (split_pos, 0),               # punto inicial (x1, y1)
+        (split_pos, combined.height), # punto final (x2, y2)
+        (255, 255, 255),              # color (blanco)
+        3                             # grosor
+        )
+    return combined_array
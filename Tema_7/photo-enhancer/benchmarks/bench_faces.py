@@ -0,0 +1,80 @@
+"""
+Benchmark de restauración de caras por lotes frente a cara a cara.
+
+Compara, en una foto de grupo y en un lote de retratos pequeños:
+  - per_face: una pasada de GFPGAN por cara (face_batch_size=1)
+  - batched: caras de cada imagen en micro-lotes (enhance)
+  - many: caras de todas las imágenes en micro-lotes (enhance_many)
+
+Uso (desde la carpeta photo-enhancer):
+    python -m benchmarks.bench_faces --models stub --batch-size 8
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.corpus import synthetic_portrait
+from benchmarks.run_benchmarks import build_enhancer
+from config import CONFIG
+
+
+def workloads(group_faces, bulk_images):
+    """Foto de grupo (una imagen, muchas caras) y lote de retratos."""
+    group = [synthetic_portrait(1920, 1080, group_faces, seed=7)[0]]
+    bulk = [synthetic_portrait(640, 480, 2, seed=seed)[0] for seed in range(bulk_images)]
+    return {'group': group, 'bulk': bulk}
+
+
+def run_mode(enhancer, images, mode, batch_size):
+    """Procesa todas las imágenes en un modo y devuelve los segundos."""
+    CONFIG['face_batch_size'] = 1 if mode == 'per_face' else batch_size
+    start = time.perf_counter()
+    if mode == 'many':
+        enhancer.enhance_many(images)
+    else:
+        for image in images:
+            enhancer.enhance(image)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    """Mide cada modo en cada carga de trabajo."""
+    parser = argparse.ArgumentParser(description="Benchmark de caras por lotes")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--group-faces", type=int, default=12)
+    parser.add_argument("--bulk-images", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    enhancer = build_enhancer(args.models)
+    original_batch_size = CONFIG['face_batch_size']
+    rows = []
+    try:
+        for name, images in workloads(args.group_faces, args.bulk_images).items():
+            # Primera pasada fuera de la medida (carga de modelos)
+            run_mode(enhancer, images[:1], 'per_face', args.batch_size)
+            baseline = None
+            for mode in ('per_face', 'batched', 'many'):
+                best = min(run_mode(enhancer, images, mode, args.batch_size)
+                           for _ in range(args.repeat))
+                baseline = baseline or best
+                row = {
+                    'workload': name,
+                    'mode': mode,
+                    'images': len(images),
+                    'batch_size': 1 if mode == 'per_face' else args.batch_size,
+                    'seconds': round(best, 4),
+                    'images_per_s': round(len(images) / best, 3),
+                    'speedup': round(baseline / best, 2),
+                }
+                rows.append(row)
+                print(json.dumps(row))
+    finally:
+        CONFIG['face_batch_size'] = original_batch_size
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Calidad frente a velocidad del modo rápido de CPU (src/optimize.py).
+
+Procesa un conjunto de referencia con las redes fp32 y con las
+optimizadas, y compara cada salida optimizada con la fp32 (PSNR y SSIM
+sobre la luminancia) junto con la latencia de cada una. La semilla de
+torch se fija antes de cada inferencia para que el ruido de StyleGAN sea
+el mismo en ambas.
+
+Uso (desde la carpeta photo-enhancer):
+    python -m benchmarks.bench_quality --models real --background
+    python -m benchmarks.bench_quality --no-quantize-linear --bf16
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.corpus import build_corpus
+from config import CONFIG
+
+
+def psnr(reference, image):
+    """PSNR en dB entre dos imágenes uint8 del mismo tamaño."""
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float('inf')
+    return 10 * np.log10(255.0 ** 2 / mse)
+
+
+def ssim(reference, image):
+    """SSIM medio (ventana gaussiana 11x11, sigma 1.5) sobre la luminancia."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    x = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    y = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float64)
+
+    def blur(a):
+        return cv2.GaussianBlur(a, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    var_x = blur(x * x) - mu_x ** 2
+    var_y = blur(y * y) - mu_y ** 2
+    cov = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / \
+               ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+
+def build_enhancers(models):
+    """ImageEnhancer fp32 y optimizado, cada uno con su registro."""
+    from src.models import ImageEnhancer, default_loaders
+    from src.optimize import fast_loaders
+    from src.registry import ModelRegistry
+
+    if models == 'stub':
+        from src.stubs import stub_loaders
+        loaders = stub_loaders()
+    else:
+        # La referencia tiene que ser fp32 aunque el modo rápido esté activo
+        CONFIG['cpu_fast_mode'] = False
+        loaders = default_loaders()
+    reference = ImageEnhancer(headless=True, registry=ModelRegistry(loaders))
+    fast = ImageEnhancer(headless=True, registry=ModelRegistry(fast_loaders(loaders)))
+    return reference, fast
+
+
+def timed(enhancer, image, options, repeat):
+    """Mejor latencia de repeat ejecuciones y la salida de la última."""
+    import torch
+
+    best, output = None, None
+    for _ in range(repeat):
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        output = enhancer.enhance(image, **options)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main(argv=None):
+    """Genera el informe de calidad y velocidad."""
+    parser = argparse.ArgumentParser(description="Calidad del modo rápido de CPU")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--background", action="store_true", help="Incluir RealESRGAN")
+    parser.add_argument("--no-quantize-linear", action="store_true")
+    parser.add_argument("--no-channels-last", action="store_true")
+    parser.add_argument("--bf16", action="store_true")
+    parser.add_argument("--intra-op-threads", type=int, default=None)
+    parser.add_argument("--inter-op-threads", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--extra", nargs="*", default=[], help="Imágenes de referencia adicionales")
+    parser.add_argument("--output", help="Fichero JSON donde guardar el informe")
+    args = parser.parse_args(argv)
+
+    from src.optimize import configure_threads
+
+    CONFIG['cpu_quantize_linear'] = not args.no_quantize_linear
+    CONFIG['cpu_channels_last'] = not args.no_channels_last
+    CONFIG['cpu_bf16'] = args.bf16
+    threads = configure_threads(args.intra_op_threads, args.inter_op_threads)
+
+    corpus = build_corpus(((640, 480), (1280, 960)), (1, 4), extra=args.extra)
+    reference, fast = build_enhancers(args.models)
+    options = {'enhance_background': args.background}
+
+    rows = []
+    for name, image in corpus:
+        # Primera pasada fuera de la medida (carga de modelos)
+        reference.enhance(image, **options)
+        fast.enhance(image, **options)
+        ref_s, ref_out = timed(reference, image, options, args.repeat)
+        fast_s, fast_out = timed(fast, image, options, args.repeat)
+        row = {
+            'image': name,
+            'fp32_s': round(ref_s, 4),
+            'fast_s': round(fast_s, 4),
+            'speedup': round(ref_s / fast_s, 2),
+            'psnr_db': round(psnr(ref_out, fast_out), 2),
+            'ssim': round(ssim(ref_out, fast_out), 4),
+        }
+        rows.append(row)
+        print(json.dumps(row))
+
+    report = {
+        'settings': {
+            'models': args.models,
+            'quantize_linear': CONFIG['cpu_quantize_linear'],
+            'channels_last': CONFIG['cpu_channels_last'],
+            'bf16': CONFIG['cpu_bf16'],
+            'background': args.background,
+            **threads,
+        },
+        'images': rows,
+        'mean_speedup': round(sum(r['speedup'] for r in rows) / len(rows), 2),
+        'min_psnr_db': min(r['psnr_db'] for r in rows),
+        'min_ssim': min(r['ssim'] for r in rows),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de arranque: coste de importación y tiempo hasta el primer
+resultado, con importaciones diferidas ('lazy') o inmediatas ('eager').
+
+Cada modo se mide en un proceso nuevo para partir de cero.
+
+Uso (desde la carpeta photo-enhancer):
+    python -m benchmarks.bench_startup --models stub
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+def measure(mode, models, warmup):
+    """Se ejecuta en el proceso hijo: devuelve los tiempos de arranque."""
+    start = time.perf_counter()
+    from config import CONFIG
+    CONFIG['startup_mode'] = mode
+
+    from src import startup
+    from src.models import ImageEnhancer, get_default_registry
+    from src.registry import ModelRegistry
+    app_imports_s = time.perf_counter() - start
+
+    startup.prepare()
+    ready_s = time.perf_counter() - start
+
+    if models == 'stub':
+        from src.stubs import stub_loaders
+        registry = ModelRegistry(stub_loaders())
+    else:
+        registry = get_default_registry()
+
+    if warmup:
+        startup.warm_up(registry)
+    warm_s = time.perf_counter() - start
+
+    import numpy as np
+    enhancer = ImageEnhancer(headless=True, registry=registry)
+    request_start = time.perf_counter()
+    enhancer.enhance(np.full((512, 512, 3), 127, dtype=np.uint8))
+    first_request_s = time.perf_counter() - request_start
+
+    return {
+        'mode': mode,
+        'warmup': warmup,
+        'app_imports_s': round(app_imports_s, 3),
+        'ready_s': round(ready_s, 3),
+        'after_warmup_s': round(warm_s, 3),
+        'first_request_latency_s': round(first_request_s, 3),
+        'time_to_first_result_s': round(time.perf_counter() - start, 3),
+        'ml_imports_s': startup.report.imports,
+    }
+
+
+def main(argv=None):
+    """Lanza un proceso por combinación de modo y precalentamiento."""
+    parser = argparse.ArgumentParser(description="Benchmark de arranque")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "WARMUP"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        mode, warmup = args.child
+        print(json.dumps(measure(mode, args.models, warmup == "1")))
+        return None
+
+    results = []
+    for mode in ("lazy", "eager"):
+        for warmup in ("0", "1"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_startup",
+                 "--models", args.models, "--child", mode, warmup],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    main()
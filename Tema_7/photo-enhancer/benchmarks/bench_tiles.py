@@ -0,0 +1,73 @@
+"""
+Benchmark del upsampler de fondo: RealESRGANer secuencial frente a
+ParallelTileUpsampler con distinto número de núcleos.
+
+Uso (desde la carpeta photo-enhancer):
+    python -m benchmarks.bench_tiles --size 4000x3000 --cores 1 4 8
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.corpus import synthetic_image
+
+
+def time_call(fn, repeat):
+    """Mejor tiempo de pared de `repeat` ejecuciones y el último resultado."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    """Ejecuta el benchmark y devuelve una fila de resultados por núcleos."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="4000x3000", help="Tamaño ANCHOxALTO")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--tile", type=int, default=None, help="Tamaño de tesela")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    import torch
+    from src.models import build_bg_upsampler
+    from src.tiling import ParallelTileUpsampler
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    image = synthetic_image(width, height)
+    sequential = build_bg_upsampler(parallel=False)
+    if args.tile:
+        sequential.tile_size = args.tile
+
+    report = []
+    for cores in args.cores:
+        torch.set_num_threads(cores)
+        seq_time, seq_out = time_call(lambda: sequential.enhance(image, outscale=2)[0], args.repeat)
+
+        # Un hilo de torch por tesela: los hilos de torch son de todo el proceso
+        torch.set_num_threads(1)
+        parallel = ParallelTileUpsampler(sequential, tile=args.tile, workers=cores)
+        par_time, par_out = time_call(lambda: parallel.enhance(image, outscale=2)[0], args.repeat)
+        parallel.close()
+
+        diff = np.abs(seq_out.astype(np.int16) - par_out.astype(np.int16))
+        report.append({
+            'cores': cores,
+            'sequential_s': round(seq_time, 3),
+            'parallel_s': round(par_time, 3),
+            'speedup': round(seq_time / par_time, 2),
+            'max_abs_diff': int(diff.max()),
+            'mean_abs_diff': round(float(diff.mean()), 4),
+        })
+        print(json.dumps(report[-1]))
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
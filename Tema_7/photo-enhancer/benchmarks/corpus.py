@@ -0,0 +1,93 @@
+"""
+Corpus fijo de imágenes para los benchmarks.
+
+Las imágenes sintéticas son deterministas (semilla fija) y las caras se
+pintan con FACE_COLOR para que el detector sustituto de src/stubs.py las
+encuentre. Con los modelos reales las caras sintéticas no se detectan:
+para medir la restoración real conviene añadir fotos con --extra.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from src.stubs import FACE_COLOR
+
+
+BUNDLED_IMAGE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "imagen1.jpg")
+
+DEFAULT_RESOLUTIONS = ((640, 480), (1920, 1080), (4000, 3000))
+DEFAULT_FACE_COUNTS = (0, 1, 5)
+
+
+def synthetic_image(width, height, seed=0):
+    """Imagen BGR sintética con gradientes, bordes y ruido."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin(xx / 37.0),
+        127 + 100 * np.cos(yy / 23.0),
+        127 + 100 * np.sin((xx + yy) / 51.0),
+    ], axis=-1)
+    base += rng.normal(0, 12, base.shape)
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+
+def synthetic_portrait(width, height, faces, seed=0):
+    """
+    Imagen sintética con `faces` caras repartidas en una rejilla.
+
+    Returns:
+        tuple: (imagen BGR, lista de cajas (x0, y0, x1, y1) de las caras)
+    """
+    image = synthetic_image(width, height, seed)
+    boxes = []
+    if faces == 0:
+        return image, boxes
+
+    cols = int(np.ceil(np.sqrt(faces)))
+    rows = int(np.ceil(faces / cols))
+    cell_w, cell_h = width // cols, height // rows
+    face_w = int(min(cell_w, cell_h) * 0.5)
+    face_h = int(face_w * 1.25)
+    for index in range(faces):
+        cx = (index % cols) * cell_w + cell_w // 2
+        cy = (index // cols) * cell_h + cell_h // 2
+        cv2.ellipse(image, (cx, cy), (face_w // 2, face_h // 2), 0, 0, 360, FACE_COLOR, -1)
+        eye_dy, eye_dx = face_h // 10, face_w // 5
+        for ex in (cx - eye_dx, cx + eye_dx):
+            cv2.circle(image, (ex, cy - eye_dy), max(2, face_w // 16), (40, 40, 40), -1)
+        cv2.ellipse(image, (cx, cy + face_h // 5), (face_w // 6, max(2, face_h // 20)),
+                    0, 0, 180, (60, 60, 150), -1)
+        boxes.append((cx - face_w // 2, cy - face_h // 2, cx + face_w // 2, cy + face_h // 2))
+    return image, boxes
+
+
+def build_corpus(resolutions=DEFAULT_RESOLUTIONS, face_counts=DEFAULT_FACE_COUNTS,
+                 include_bundled=True, extra=()):
+    """
+    Construye el corpus del benchmark.
+
+    Args:
+        resolutions: Tamaños (ancho, alto) de las imágenes sintéticas
+        face_counts: Número de caras por imagen sintética
+        include_bundled: Añadir imagen1.jpg
+        extra: Rutas de imágenes adicionales
+
+    Returns:
+        Lista de (nombre, imagen BGR)
+    """
+    corpus = []
+    for seed, (width, height) in enumerate(resolutions):
+        for faces in face_counts:
+            image, _ = synthetic_portrait(width, height, faces, seed=seed)
+            corpus.append((f"synthetic_{width}x{height}_{faces}f", image))
+
+    paths = ([BUNDLED_IMAGE] if include_bundled else []) + list(extra)
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileNotFoundError(path)
+        corpus.append((os.path.basename(path), image))
+    return corpus
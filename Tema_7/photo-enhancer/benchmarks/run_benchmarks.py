@@ -0,0 +1,176 @@
+"""
+Suite de benchmarks reproducible del Photo Enhancer.
+
+Ejecuta el pipeline completo sobre un corpus fijo (imágenes sintéticas a
+varias resoluciones y número de caras, más imagen1.jpg) con todas las
+combinaciones de repair_scratches y enhance_background, y mide latencia
+(p50/p90/p99), throughput y memoria. Incluye microbenchmarks de
+src/utils.py y de la composición del comparador (src/preview.py frente a
+la composición a resolución completa de benchmarks/baselines.py).
+
+Con --models stub (por defecto) se usan los sustitutos de src/stubs.py y
+no se descarga ningún peso, así que sirve en CI sin conexión.
+
+Uso (desde la carpeta photo-enhancer):
+    python -m benchmarks.run_benchmarks --repeat 5 --output resultados.json
+    python -m benchmarks.run_benchmarks --models real --resolutions 1920x1080
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import time
+
+from benchmarks.corpus import DEFAULT_FACE_COUNTS, DEFAULT_RESOLUTIONS, build_corpus
+from src.metrics import current_rss_bytes, peak_rss_bytes, percentile
+
+
+OPTION_COMBOS = list(itertools.product((False, True), repeat=2))
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def latency_summary(latencies, pixels):
+    """Percentiles de latencia y throughput de una lista de tiempos."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        'runs': len(ordered),
+        'p50_s': round(percentile(ordered, 50), 4),
+        'p90_s': round(percentile(ordered, 90), 4),
+        'p99_s': round(percentile(ordered, 99), 4),
+        'mean_s': round(total / len(ordered), 4),
+        'images_per_s': round(len(ordered) / total, 3) if total else None,
+        'megapixels_per_s': round(len(ordered) * pixels / 1e6 / total, 3) if total else None,
+    }
+
+
+def stage_means(traces):
+    """Tiempo medio de pared por etapa a partir de las trazas."""
+    totals = {}
+    for trace in traces:
+        for record in trace.stages:
+            totals.setdefault(record['stage'], []).append(record['wall_s'])
+    return {stage: round(sum(v) / len(v), 4) for stage, v in totals.items()}
+
+
+def bench_pipeline(enhancer, corpus, repeat, warmup):
+    """Benchmark de ImageEnhancer.enhance sobre todo el corpus."""
+    from src.metrics import Trace
+
+    rows = []
+    for (name, image), (scratches, background) in itertools.product(corpus, OPTION_COMBOS):
+        options = {'repair_scratches': scratches, 'enhance_background': background}
+        for _ in range(warmup):
+            enhancer.enhance(image, **options)
+
+        latencies, traces, rss = [], [], []
+        for _ in range(repeat):
+            trace = Trace()
+            start = time.perf_counter()
+            enhancer.enhance(image, trace=trace, **options)
+            latencies.append(time.perf_counter() - start)
+            traces.append(trace)
+            rss.append(current_rss_bytes() or 0)
+
+        row = {
+            'image': name,
+            'width': image.shape[1],
+            'height': image.shape[0],
+            'faces': traces[-1].attributes.get('faces'),
+            **options,
+            **latency_summary(latencies, image.shape[0] * image.shape[1]),
+            'rss_max_mb': round(max(rss) / 2**20, 1),
+            'peak_rss_mb': round((peak_rss_bytes() or 0) / 2**20, 1),
+            'stages_s': stage_means(traces),
+        }
+        rows.append(row)
+        print(json.dumps({k: v for k, v in row.items() if k != 'stages_s'}))
+    return rows
+
+
+def bench_utils(corpus, repeat):
+    """Microbenchmarks de las conversiones de src/utils.py y del comparador."""
+    from benchmarks.baselines import compose_split
+    from src.preview import build_preview_pyramid, compose_preview
+    from src.utils import bgr_to_pil, pil_to_bgr
+
+    rows = []
+    for name, image in corpus:
+        pil = bgr_to_pil(image)
+        upscaled = pil.resize((pil.width * 2, pil.height * 2))
+        pyramid = build_preview_pyramid(pil, upscaled)
+        cases = {
+            'bgr_to_pil': lambda: bgr_to_pil(image),
+            'pil_to_bgr': lambda: pil_to_bgr(pil),
+            'compose_split': lambda: compose_split(pil, upscaled, 50),
+            'build_preview_pyramid': lambda: build_preview_pyramid(pil, upscaled),
+            'compose_preview': lambda: compose_preview(pyramid, 50),
+        }
+        for case, fn in cases.items():
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                latencies.append(time.perf_counter() - start)
+            rows.append({'image': name, 'case': case,
+                         **latency_summary(latencies, image.shape[0] * image.shape[1])})
+    return rows
+
+
+def build_enhancer(models):
+    """ImageEnhancer headless, sin caché, con modelos reales o sustitutos."""
+    from src.models import ImageEnhancer
+    from src.registry import ModelRegistry
+
+    if models == 'stub':
+        from src.stubs import stub_loaders
+        return ImageEnhancer(headless=True, registry=ModelRegistry(stub_loaders()))
+    return ImageEnhancer(headless=True)
+
+
+def main(argv=None):
+    """Ejecuta la suite y devuelve el informe completo."""
+    parser = argparse.ArgumentParser(description="Benchmarks del Photo Enhancer")
+    parser.add_argument("--models", choices=("stub", "real"), default="stub")
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution,
+                        default=list(DEFAULT_RESOLUTIONS))
+    parser.add_argument("--faces", nargs="+", type=int, default=list(DEFAULT_FACE_COUNTS))
+    parser.add_argument("--extra", nargs="*", default=[], help="Imágenes adicionales")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--skip-utils", action="store_true")
+    parser.add_argument("--output", help="Fichero JSON donde guardar el informe")
+    args = parser.parse_args(argv)
+
+    import torch
+
+    corpus = build_corpus(args.resolutions, args.faces, extra=args.extra)
+    enhancer = build_enhancer(args.models)
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'torch': torch.__version__,
+            'torch_threads': torch.get_num_threads(),
+            'models': args.models,
+        },
+        'pipeline': bench_pipeline(enhancer, corpus, args.repeat, args.warmup),
+    }
+    if not args.skip_utils:
+        report['utils'] = bench_utils(corpus, args.repeat)
+    report['models_memory'] = enhancer.registry.stats()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
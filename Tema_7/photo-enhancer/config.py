@@ -12,6 +12,204 @@ CONFIG = {
     "arch": "clean",
     "channel_multiplier": 2,
     "enhancement_weight": 0.5,
+    # Caras por pasada de GFPGAN (1 = cara a cara, como GFPGANer.enhance)
+    "face_batch_size": 8,
+
+    # Modo rápido para CPU (ver src/optimize.py): convoluciones
+    # channels_last, cuantización int8 solo de las capas Linear (el MLP de
+    # estilo de GFPGAN; RRDBNet no tiene) y, opcionalmente, bfloat16. Las
+    # convoluciones, que son casi todo el coste, siguen en fp32.
+    # Hilos de torch por proceso (None = valor por defecto de torch).
+    "cpu_fast_mode": False,
+    "cpu_quantize_linear": True,
+    "cpu_channels_last": True,
+    "cpu_bf16": False,
+    "torch_intra_op_threads": None,
+    "torch_inter_op_threads": None,
+
+    # Resolución adaptativa (ver src/adaptive.py): detección y fondo se
+    # hacen sobre una copia que cabe en el presupuesto de píxeles o de
+    # latencia (None = sin límite); la salida no pasa de output_long_side.
+    # seconds_per_mp/face son las estimaciones iniciales del coste, que se
+    # ajustan con cada petición.
+    "adaptive_mode": False,
+    "adaptive_pixel_budget": 4_000_000,
+    "adaptive_latency_budget_s": None,
+    "adaptive_output_long_side": None,
+    "adaptive_seconds_per_mp": 1.5,
+    "adaptive_seconds_per_face": 0.8,
+
+    # RealESRGAN por teselas en paralelo (workers: 0 = núcleos / hilos de
+    # torch del proceso, 1 = ruta secuencial original de RealESRGANer).
+    # Para repartir los núcleos entre teselas, bajar torch_intra_op_threads.
+    "bg_tile_size": 400,
+    "bg_tile_pad": 10,
+    "bg_tile_workers": 0,
+
+    # Imágenes grandes: se procesan por franjas a partir de este tamaño,
+    # con un techo de memoria por franja. large_bytes_per_pixel es la
+    # memoria estimada del pipeline por píxel de entrada (upscale x2) para
+    # la primera franja; después se usa la medida en cada franja.
+    "large_image_min_pixels": 20_000_000,
+    "large_max_peak_mb": 2048,
+    "large_strip_overlap": 64,
+    "large_bytes_per_pixel": 400,
+    # Costuras fuera de las caras: se detectan en una copia reducida (lado
+    # largo large_face_scan_side) y se amplían large_face_margin veces su
+    # alto por arriba y por abajo (GFPGAN recorta con contexto)
+    "large_face_seams": True,
+    "large_face_scan_side": 2048,
+    "large_face_margin": 0.5,
+
+    # Arranque: 'lazy' difiere la importación de torch/gfpgan/... hasta el
+    # primer modelo; 'eager' las importa al arrancar. warmup precarga los
+    # modelos de warmup_modes en segundo plano con una inferencia de prueba.
+    "startup_mode": "lazy",
+    "warmup": True,
+    "warmup_modes": [{"enhance_background": False}],
+
+    # Almacén local de pesos (safetensors mapeados en memoria, ver
+    # src/weights.py). Con weights_offline no se descarga nada: faltar un
+    # peso es un error. weights_checksums fija el sha256 esperado de cada
+    # .pth descargado (None = aceptar el que llegue y registrarlo).
+    "use_weight_store": True,
+    "weights_dir": "weights",
+    "weights_offline": False,
+    "weights_verify_on_load": False,
+    "weights_checksums": {
+        "gfpgan": None,
+        "realesrgan": None,
+        "retinaface": None,
+        "parsenet": None,
+    },
+
+    # Memoria máxima para modelos residentes (se expulsa el menos usado)
+    "model_memory_budget_mb": 3072,
+
+    # Cola de trabajos de la app (hilos, máximo en espera, terminados
+    # que se conservan y segundos entre sondeos de la UI)
+    "job_workers": 1,
+    "job_max_pending": 8,
+    "job_max_finished": 32,
+    "job_poll_interval": 0.5,
+
+    # Modo progresivo: con "Mejorar fondo", vista previa rápida (caras
+    # restauradas sobre el original reducido, lado largo en píxeles)
+    # mientras termina la etapa lenta del fondo
+    "progressive_mode": True,
+    "progressive_preview_side": 1024,
+
+    # Métricas por etapa: fichero JSON-lines (None = desactivado) y
+    # desglose de tiempos en la UI
+    "metrics_log": None,
+    "show_trace": True,
+
+    # Comparador: anchura máxima de las previsualizaciones (se calculan una
+    # vez por resultado), número de niveles de la pirámide y anchura a la
+    # que se muestran
+    "preview_max_width": 1600,
+    "preview_levels": 3,
+    "preview_display_width": 800,
+
+    # Descargas: formatos ofrecidos, nivel de compresión PNG (0-9, más
+    # alto = más pequeño y más lento), calidad JPEG, formatos que se
+    # codifican en segundo plano nada más terminar y codificaciones que se
+    # conservan en memoria
+    "download_formats": ["png", "webp", "jpeg"],
+    "download_png_compression": 3,
+    "download_jpeg_quality": 95,
+    "download_prefetch_formats": ["png"],
+    "download_encoder_workers": 1,
+    "download_cache_entries": 16,
+
+    # Reparación de grietas (ver src/scratches.py): 'full' repara la imagen
+    # entera; 'masked' solo pasa por EraseScratches las teselas con daño
+    # según una máscara morfológica. Si las zonas dañadas superan
+    # scratch_full_ratio de la imagen se repara entera igualmente. Las
+    # máscaras calculadas se guardan en memoria (entradas y MB máximos).
+    "scratch_mode": "full",
+    "scratch_mask_max_side": 2048,
+    "scratch_kernel": 15,
+    "scratch_threshold": 40,
+    "scratch_min_length": 12,
+    "scratch_tile": 256,
+    "scratch_tile_min_pixels": 20,
+    "scratch_pad": 32,
+    "scratch_feather": 2.0,
+    "scratch_full_ratio": 0.5,
+    "scratch_mask_cache_entries": 16,
+    "scratch_mask_cache_mb": 128,
+
+    # Vídeo (ver src/video.py): hilos de restauración, fotogramas
+    # decodificados en espera, fotogramas entre detecciones forzadas, error
+    # máximo del seguimiento (px), umbral de cambio de plano (diferencia
+    # media de gris, 0-255) y códec de salida
+    "video_workers": 2,
+    "video_queue_size": 8,
+    "video_keyframe_interval": 30,
+    "video_max_track_error": 2.0,
+    "video_scene_cut": 40.0,
+    "video_fourcc": "mp4v",
+    "video_formats": ['mp4', 'avi', 'mov', 'mkv'],
+
+    # Resultados de las sesiones (ver src/results.py): techo de memoria
+    # compartido por todas las sesiones, segundos sin consultar un
+    # resultado tras los que se expulsa y formato en que se guarda
+    "result_store_max_mb": 1024,
+    "result_store_idle_s": 1800,
+    "result_store_format": "png",
+
+    # Lectura de las subidas (ver src/ingest.py): máximo de píxeles que se
+    # aceptan (protección contra bombas de descompresión) y lado largo al
+    # que se decodifica la entrada (None = resolución completa; si se fija,
+    # los JPEG se decodifican reducidos a 1/2, 1/4 o 1/8)
+    "ingest_max_pixels": 100_000_000,
+    "ingest_max_side": None,
+
+    # Servicio HTTP local (ver src/service.py y server.py). app.py es un
+    # cliente: si service_autostart es True y no hay servicio escuchando en
+    # service_url, lo arranca dentro del propio proceso de Streamlit.
+    # Límite de conexiones simultáneas, tamaño máximo de subida, espera
+    # máxima de /enhance, Retry-After de las respuestas 429/503 y trozos en
+    # que se envía el resultado
+    "service_url": "http://127.0.0.1:8765",
+    "service_host": "127.0.0.1",
+    "service_port": 8765,
+    "service_autostart": True,
+    "service_require_warm": False,
+    "service_max_connections": 32,
+    "service_max_body_mb": 200,
+    "service_request_timeout_s": 600,
+    "service_retry_after_s": 2,
+    "service_poll_interval": 0.05,
+    "service_chunk_bytes": 256 * 1024,
+    "service_client_timeout_s": 30,
+    "service_log_requests": False,
+
+    # Caché de resultados en disco
+    "cache_dir": ".cache/resultados",
+    "cache_max_mb": 1024,
+
+    # Mejora selectiva (ver src/selection.py): margen alrededor de cada
+    # zona de interés (fracción de su tamaño) y píxeles de contexto con los
+    # que se mejora cada zona; en ellos se funde con la interpolación para
+    # evitar costuras
+    "selection_margin": 0.25,
+    "selection_context_px": 16,
+
+    # Fotos repetidas (ver src/dedup.py): índice de hashes perceptuales de
+    # las entradas ya cacheadas. Distancias máximas de Hamming (de 64 bits)
+    # de pHash y dHash, cambio de proporción admitido (fracción), pico
+    # mínimo de la correlación de fase y lado de la imagen al registrar.
+    # Desactivado por defecto: una foto distinta pero parecida recibiría el
+    # resultado de otra.
+    "dedup_enabled": False,
+    "dedup_index_path": ".cache/dedup.sqlite",
+    "dedup_phash_distance": 6,
+    "dedup_dhash_distance": 10,
+    "dedup_max_aspect_change": 0.01,
+    "dedup_min_response": 0.2,
+    "dedup_register_side": 256,
 
     # Formatos permitidos
     "allowed_formats": ['jpg', 'jpeg', 'png']
@@ -0,0 +1,69 @@
+"""
+Servicio HTTP local de mejora (ver src/service.py).
+
+Ejemplos:
+    python server.py
+    python server.py --port 9000 --workers 2 --max-pending 16
+    python server.py --stub --port 0     # modelos sustitutos, puerto libre
+
+    curl --data-binary @foto.jpg -o mejorada.png \\
+        "http://127.0.0.1:8765/enhance?enhance_background=1&format=png"
+"""
+
+import argparse
+import sys
+
+from config import CONFIG
+from src import startup
+from src.metrics import HistogramRegistry, JsonLinesSink, MetricsRecorder
+from src.service import build_service, create_server
+
+
+def parse_args(argv=None):
+    """Define y parsea los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Servicio HTTP de mejora con GFPGAN")
+    parser.add_argument("--host", default=None, help="Dirección (por defecto, solo local)")
+    parser.add_argument("--port", type=int, default=None, help="Puerto (0: uno libre)")
+    parser.add_argument("--workers", type=int, default=None, help="Hilos de inferencia")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="Trabajos en espera antes de responder 429")
+    parser.add_argument("--max-connections", type=int, default=None,
+                        help="Peticiones simultáneas antes de responder 503")
+    parser.add_argument("--stub", action="store_true",
+                        help="Modelos sustitutos sin pesos (pruebas en local)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Sin caché de resultados ni índice de fotos repetidas")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="No precargar los modelos al arrancar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Punto de entrada del servicio."""
+    args = parse_args(argv)
+    metrics = MetricsRecorder([HistogramRegistry()])
+    if CONFIG['metrics_log']:
+        metrics.add_sink(JsonLinesSink(CONFIG['metrics_log']))
+
+    startup.prepare()
+    service = build_service(stub=args.stub, workers=args.workers,
+                            max_pending=args.max_pending, use_cache=not args.no_cache,
+                            metrics=metrics)
+    if CONFIG['warmup'] and not args.no_warmup:
+        startup.start_background_warmup(service.enhancer.registry)
+
+    server = create_server(service, args.host, args.port, args.max_connections)
+    host, port = server.server_address[:2]
+    print(f"🚀 Servicio de mejora en http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Resolución adaptativa con presupuesto de píxeles o de latencia.
+
+El coste del pipeline tiene dos partes: la que crece con los megapíxeles
+(detección, fondo, pegado) y la que crece con el número de caras (cada
+cara se restaura siempre a 512x512). El modo adaptativo acota la primera:
+detección y fondo se hacen sobre una copia reducida que cabe en el
+presupuesto, mientras que las caras se recortan del original, a su
+resolución nativa. La salida se escala solo hasta lo que se ha pedido.
+
+Cada plan guarda sus decisiones para registrarlas en la traza.
+"""
+
+import math
+import threading
+
+import cv2
+
+from config import CONFIG
+
+
+class ResolutionPlan:
+    """Decisiones de resolución para una petición."""
+
+    def __init__(self, width, height, work_scale, upscale, reasons):
+        self.width = width
+        self.height = height
+        self.work_scale = work_scale
+        self.upscale = upscale
+        self.reasons = reasons
+
+    @property
+    def work_size(self):
+        """(ancho, alto) de la copia de trabajo."""
+        return (max(1, round(self.width * self.work_scale)),
+                max(1, round(self.height * self.work_scale)))
+
+    @property
+    def bg_outscale(self):
+        """Escala del upsampler de fondo, aplicada a la copia de trabajo."""
+        return self.upscale / self.work_scale
+
+    def work_image(self, image_bgr):
+        """Copia reducida de la imagen (la propia imagen si no se reduce)."""
+        if self.work_scale >= 1:
+            return image_bgr
+        return cv2.resize(image_bgr, self.work_size, interpolation=cv2.INTER_AREA)
+
+    def to_dict(self):
+        work_w, work_h = self.work_size
+        return {
+            'input_size': [self.width, self.height],
+            'work_size': [work_w, work_h],
+            'work_scale': round(self.work_scale, 4),
+            'upscale': round(self.upscale, 4),
+            'output_size': [int(self.width * self.upscale), int(self.height * self.upscale)],
+            'reasons': list(self.reasons),
+        }
+
+
+class LatencyModel:
+    """
+    Estimación en línea del coste por megapíxel y por cara.
+
+    Se actualiza con una media móvil exponencial a partir de las trazas de
+    las peticiones ya servidas.
+    """
+
+    PIXEL_STAGES = ('face_detection', 'background_upsampling', 'paste_back',
+                    'adaptive_downscale')
+    FACE_STAGES = ('face_alignment', 'face_restoration')
+
+    def __init__(self, seconds_per_mp=None, seconds_per_face=None, alpha=0.3):
+        """
+        Args:
+            seconds_per_mp: Estimación inicial (CONFIG['adaptive_seconds_per_mp'])
+            seconds_per_face: Estimación inicial (CONFIG['adaptive_seconds_per_face'])
+            alpha: Peso de cada observación nueva
+        """
+        self.seconds_per_mp = seconds_per_mp or CONFIG['adaptive_seconds_per_mp']
+        self.seconds_per_face = seconds_per_face or CONFIG['adaptive_seconds_per_face']
+        self.expected_faces = 1.0
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def _update(self, current, observed):
+        return (1 - self.alpha) * current + self.alpha * observed
+
+    def observe(self, trace):
+        """Actualiza las estimaciones con una traza que tenga plan adaptativo."""
+        plan = trace.attributes.get('adaptive')
+        reused = (trace.attributes.get('cache_hit')
+                  or (trace.attributes.get('dedup') or {}).get('accepted'))
+        if not plan or reused:
+            return
+        work_w, work_h = plan['work_size']
+        megapixels = work_w * work_h / 1e6
+        walls = {}
+        for record in trace.stages:
+            walls[record['stage']] = walls.get(record['stage'], 0.0) + record['wall_s']
+        pixel_s = sum(walls.get(stage, 0.0) for stage in self.PIXEL_STAGES)
+        face_s = sum(walls.get(stage, 0.0) for stage in self.FACE_STAGES)
+        faces = trace.attributes.get('faces') or 0
+        with self._lock:
+            if megapixels > 0 and pixel_s > 0:
+                self.seconds_per_mp = self._update(self.seconds_per_mp, pixel_s / megapixels)
+            if faces:
+                self.seconds_per_face = self._update(self.seconds_per_face, face_s / faces)
+            self.expected_faces = self._update(self.expected_faces, faces)
+
+    def pixel_budget(self, latency_s):
+        """Píxeles de trabajo que caben en latency_s tras reservar las caras."""
+        with self._lock:
+            reserve = self.expected_faces * self.seconds_per_face
+            available = max(latency_s - reserve, 0.1 * latency_s)
+            return int(available / self.seconds_per_mp * 1e6)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'seconds_per_mp': round(self.seconds_per_mp, 4),
+                'seconds_per_face': round(self.seconds_per_face, 4),
+                'expected_faces': round(self.expected_faces, 2),
+            }
+
+
+def plan_resolution(height, width, upscale=None, pixel_budget=None, latency_budget_s=None,
+                    output_long_side=None, latency_model=None):
+    """
+    Decide la resolución de trabajo y la escala de salida.
+
+    Args:
+        height, width: Tamaño de la entrada
+        upscale: Escala de salida máxima (CONFIG['upscale'])
+        pixel_budget: Máximo de píxeles de la copia de trabajo
+        latency_budget_s: Latencia objetivo; se traduce a píxeles con
+            latency_model (el presupuesto más estricto de los dos manda)
+        output_long_side: Lado largo deseado de la salida; no se escala
+            más allá de lo necesario para alcanzarlo
+        latency_model: LatencyModel para traducir la latencia
+
+    Returns:
+        ResolutionPlan
+    """
+    upscale = upscale or CONFIG['upscale']
+    reasons = []
+    pixels = width * height
+
+    budget = pixel_budget
+    if pixel_budget:
+        reasons.append(f"presupuesto de {pixel_budget / 1e6:.1f} MP")
+    if latency_budget_s and latency_model is not None:
+        latency_pixels = latency_model.pixel_budget(latency_budget_s)
+        reasons.append(
+            f"latencia objetivo {latency_budget_s:.1f} s ≈ {latency_pixels / 1e6:.1f} MP"
+        )
+        budget = min(budget, latency_pixels) if budget else latency_pixels
+
+    work_scale = 1.0
+    if budget and pixels > budget:
+        work_scale = math.sqrt(budget / pixels)
+        reasons.append(f"entrada de {pixels / 1e6:.1f} MP reducida a x{work_scale:.2f} "
+                       "para detección y fondo")
+    else:
+        reasons.append("entrada procesada a resolución nativa")
+
+    if output_long_side:
+        needed = output_long_side / max(width, height)
+        if needed < upscale:
+            upscale = needed
+            reasons.append(f"salida limitada a {output_long_side} px de lado largo (x{upscale:.2f})")
+    return ResolutionPlan(width, height, work_scale, upscale, reasons)
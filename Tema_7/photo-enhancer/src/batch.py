@@ -0,0 +1,343 @@
+"""
+Procesamiento por lotes (sin Streamlit) con un pool de procesos.
+
+Cada proceso del pool carga su propio ImageEnhancer en modo headless y
+las imágenes se reparten entre ellos. Los resultados se escriben en el
+directorio de salida a medida que terminan y se registran en un diario
+(`.progress.jsonl`) que permite reanudar un lote interrumpido.
+"""
+
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from config import CONFIG
+from src.metrics import percentile
+
+
+PROGRESS_FILE = ".progress.jsonl"
+
+# Estado por proceso del pool (se inicializa en _init_worker)
+_worker_enhancer = None
+
+
+def find_images(input_dir):
+    """
+    Recorre un directorio buscando imágenes con formato permitido.
+
+    Args:
+        input_dir: Directorio raíz a recorrer
+
+    Returns:
+        Lista ordenada de rutas relativas a input_dir
+    """
+    extensions = tuple(f".{ext}" for ext in CONFIG['allowed_formats'])
+    found = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(extensions):
+                full_path = os.path.join(root, name)
+                found.append(os.path.relpath(full_path, input_dir))
+    return sorted(found)
+
+
+def read_manifest(manifest_path):
+    """
+    Lee un manifiesto con una ruta de imagen por línea.
+
+    Las líneas vacías y las que empiezan por '#' se ignoran.
+
+    Args:
+        manifest_path: Ruta del fichero de manifiesto
+
+    Returns:
+        Lista de rutas tal como aparecen en el manifiesto
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def output_path_for(rel_path, output_dir, keep_extension=False):
+    """
+    Ruta de salida (siempre PNG) que conserva la estructura de carpetas.
+
+    Args:
+        rel_path: Ruta de entrada
+        output_dir: Directorio de salida
+        keep_extension: Conservar la extensión original delante de .png
+            (a.jpg -> a.jpg.png), para distinguir entradas con el mismo nombre
+    """
+    rel_path = rel_path.lstrip('/\\').replace(':', '')
+    base = rel_path if keep_extension else os.path.splitext(rel_path)[0]
+    return os.path.join(output_dir, base + ".png")
+
+
+def plan_outputs(inputs, output_dir):
+    """
+    Ruta de salida de cada entrada, sin que dos entradas compartan salida.
+
+    Las entradas que solo se distinguen por la extensión (a.jpg y a.png)
+    conservan su extensión en el nombre de salida. La asignación depende
+    solo de la lista de entradas, así que es la misma al reanudar un lote.
+
+    Returns:
+        dict ruta de entrada -> ruta de salida
+
+    Raises:
+        ValueError: Si aun así dos entradas acabarían en el mismo fichero
+    """
+    def key(path):
+        # Sin distinguir mayúsculas: algunos sistemas de ficheros no lo hacen
+        return os.path.normpath(path).lower()
+
+    groups = {}
+    for rel_path in inputs:
+        groups.setdefault(key(output_path_for(rel_path, output_dir)), []).append(rel_path)
+
+    outputs, owners = {}, {}
+    for rel_path in inputs:
+        shared = len(groups[key(output_path_for(rel_path, output_dir))]) > 1
+        path = output_path_for(rel_path, output_dir, keep_extension=shared)
+        other = owners.setdefault(key(path), rel_path)
+        if other != rel_path:
+            raise ValueError(f"{other} y {rel_path} se escribirían en el mismo fichero: {path}")
+        outputs[rel_path] = path
+    return outputs
+
+
+def load_progress(output_dir):
+    """
+    Lee el diario de progreso de un lote anterior.
+
+    Returns:
+        Conjunto de rutas de entrada ya procesadas con éxito
+    """
+    done = set()
+    path = os.path.join(output_dir, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea truncada por una interrupción: se reprocesa
+                continue
+            if entry.get('ok'):
+                done.add(entry['input'])
+    return done
+
+
+def default_threads_per_worker(workers):
+    """
+    Hilos de torch de cada proceso del pool: CONFIG['torch_intra_op_threads']
+    o los núcleos repartidos entre los procesos (sin esto, cada proceso
+    usaría un hilo por núcleo).
+    """
+    return CONFIG['torch_intra_op_threads'] or max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_worker(threads_per_worker, metrics_log=None):
+    """Inicializa un proceso del pool con su propio modelo."""
+    global _worker_enhancer
+    from src.optimize import configure_threads
+    configure_threads(intra_op=threads_per_worker)
+
+    from src.metrics import JsonLinesSink, MetricsRecorder
+    from src.models import ImageEnhancer
+    metrics = MetricsRecorder([JsonLinesSink(metrics_log)]) if metrics_log else None
+    _worker_enhancer = ImageEnhancer(headless=True, metrics=metrics)
+
+
+def _process_one(task):
+    """Mejora una imagen dentro de un proceso del pool."""
+    from PIL import Image
+    from src.large_image import LargeImageProcessor
+    from src.ingest import decode_bgr
+    from src.utils import bgr_to_pil
+
+    src_path, dst_path, key, options, max_peak_mb = task
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(dst_path) or '.', exist_ok=True)
+        # Escritura atómica: un fichero a medias nunca parece terminado
+        tmp_path = dst_path + ".tmp.png"
+
+        with Image.open(src_path) as probe:
+            width, height = probe.size
+        if width * height >= CONFIG['large_image_min_pixels']:
+            processor = LargeImageProcessor(_worker_enhancer, max_peak_mb=max_peak_mb)
+            processor.process(src_path, tmp_path, **options)
+        else:
+            image_bgr = decode_bgr(src_path)[0]
+            restored_bgr = _worker_enhancer.enhance(image_bgr, **options)
+            bgr_to_pil(restored_bgr).save(tmp_path, format='PNG')
+        os.replace(tmp_path, dst_path)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return {
+        'input': key,
+        'output': dst_path,
+        'ok': error is None,
+        'error': error,
+        'latency': time.perf_counter() - start,
+    }
+
+
+def _process_group(tasks):
+    """
+    Mejora un grupo de imágenes con una sola llamada a enhance_many, para
+    que sus caras se restauren en lotes compartidos. Las imágenes grandes
+    se procesan aparte, por franjas.
+    """
+    from PIL import Image
+    from src.ingest import decode_bgr
+    from src.utils import bgr_to_pil
+
+    results = []
+    small = []
+    for task in tasks:
+        try:
+            with Image.open(task[0]) as probe:
+                width, height = probe.size
+        except Exception:
+            # _process_one registra el error con el formato de siempre
+            width = height = None
+        if width is None or width * height >= CONFIG['large_image_min_pixels']:
+            results.append(_process_one(task))
+        else:
+            small.append(task)
+    if not small:
+        return results
+
+    start = time.perf_counter()
+    try:
+        images = [decode_bgr(task[0])[0] for task in small]
+        restored = _worker_enhancer.enhance_many(images, **small[0][3])
+        errors = []
+        for (_, dst_path, _, _, _), image in zip(small, restored):
+            try:
+                os.makedirs(os.path.dirname(dst_path) or '.', exist_ok=True)
+                tmp_path = dst_path + ".tmp.png"
+                bgr_to_pil(image).save(tmp_path, format='PNG')
+                os.replace(tmp_path, dst_path)
+                errors.append(None)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    except Exception as e:
+        errors = [f"{type(e).__name__}: {e}"] * len(small)
+
+    # Las imágenes de un grupo terminan juntas: comparten la latencia
+    latency = time.perf_counter() - start
+    for (_, dst_path, key, _, _), error in zip(small, errors):
+        results.append({
+            'input': key,
+            'output': dst_path,
+            'ok': error is None,
+            'error': error,
+            'latency': latency,
+        })
+    return results
+
+
+def summarize(results, elapsed):
+    """
+    Calcula las estadísticas de rendimiento de un lote.
+
+    Args:
+        results: Lista de resultados devueltos por los workers
+        elapsed: Tiempo total de pared en segundos
+
+    Returns:
+        dict con throughput y percentiles de latencia por imagen
+    """
+    latencies = sorted(r['latency'] for r in results if r['ok'])
+    processed = len(latencies)
+    return {
+        'processed': processed,
+        'failed': sum(1 for r in results if not r['ok']),
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        'latency_mean_s': round(sum(latencies) / processed, 3) if processed else 0.0,
+        'latency_p50_s': round(percentile(latencies, 50), 3),
+        'latency_p95_s': round(percentile(latencies, 95), 3),
+        'latency_max_s': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def run_batch(inputs, output_dir, base_dir=None, workers=None,
+              threads_per_worker=None, repair_scratches=False,
+              enhance_background=False, resume=True, on_result=None,
+              max_peak_mb=None, metrics_log=None, images_per_task=1):
+    """
+    Mejora un conjunto de imágenes con un pool de procesos.
+
+    Args:
+        inputs: Rutas de entrada (relativas a base_dir si se indica)
+        output_dir: Directorio donde se escriben los PNG resultantes
+        base_dir: Directorio base de las rutas de entrada
+        workers: Número de procesos (por defecto, núcleos disponibles)
+        threads_per_worker: Hilos de torch por proceso (por defecto,
+            CONFIG['torch_intra_op_threads'] o núcleos / workers)
+        repair_scratches: Reparar grietas antes de mejorar
+        enhance_background: Mejorar también el fondo con RealESRGAN
+        resume: Si True, salta las imágenes ya registradas en el diario
+        on_result: Callback opcional llamado con cada resultado
+        max_peak_mb: Techo de memoria por franja para imágenes grandes
+        metrics_log: Fichero JSON-lines donde registrar los tiempos por etapa
+        images_per_task: Imágenes que procesa cada worker de una vez; con
+            más de una, sus caras se restauran en lotes compartidos
+
+    Returns:
+        dict con el resumen del lote (ver summarize)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    done = load_progress(output_dir) if resume else set()
+    options = {
+        'repair_scratches': repair_scratches,
+        'enhance_background': enhance_background,
+    }
+
+    outputs = plan_outputs(inputs, output_dir)
+    tasks = []
+    for rel_path in inputs:
+        if rel_path in done:
+            continue
+        src_path = os.path.join(base_dir, rel_path) if base_dir else rel_path
+        tasks.append((src_path, outputs[rel_path], rel_path, options, max_peak_mb))
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks) or 1))
+    threads_per_worker = threads_per_worker or default_threads_per_worker(workers)
+
+    results = []
+    start = time.perf_counter()
+    # Sin trabajo pendiente (lote ya terminado) no se arranca ningún proceso
+    if tasks:
+        with open(os.path.join(output_dir, PROGRESS_FILE), 'a', encoding='utf-8') as journal:
+            with Pool(workers, initializer=_init_worker,
+                      initargs=(threads_per_worker, metrics_log)) as pool:
+                if images_per_task > 1:
+                    groups = [tasks[i:i + images_per_task]
+                              for i in range(0, len(tasks), images_per_task)]
+                    batches = pool.imap_unordered(_process_group, groups)
+                else:
+                    batches = ([result] for result in pool.imap_unordered(_process_one, tasks))
+                for batch in batches:
+                    for result in batch:
+                        journal.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        journal.flush()
+                        results.append(result)
+                        if on_result is not None:
+                            on_result(result)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed)
+    summary['skipped'] = len(inputs) - len(tasks)
+    summary['workers'] = workers
+    summary['threads_per_worker'] = threads_per_worker
+    return summary
@@ -0,0 +1,209 @@
+"""
+Caché persistente en disco para los resultados de ImageEnhancer.enhance.
+
+Cada resultado se guarda como un fichero .npy cuyo nombre es el hash del
+contenido de la imagen de entrada junto con las opciones y la
+configuración del modelo. Al superar el tamaño máximo se eliminan los
+resultados usados hace más tiempo (LRU).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import CONFIG
+
+
+# Claves de CONFIG que cambian el resultado de la mejora
+_CONFIG_KEYS = ('model_url', 'upscale', 'arch', 'channel_multiplier', 'enhancement_weight')
+
+# Claves que cambian la reparación de grietas (solo cuentan si se repara)
+_SCRATCH_KEYS = ('scratch_mode', 'scratch_mask_max_side', 'scratch_kernel',
+                 'scratch_threshold', 'scratch_min_length', 'scratch_tile',
+                 'scratch_tile_min_pixels', 'scratch_pad', 'scratch_feather',
+                 'scratch_full_ratio')
+
+
+def numerics_tag():
+    """
+    Aritmética de las redes: 'fp32' o la del modo rápido de CPU (ver
+    src/optimize.py), que da resultados algo distintos.
+    """
+    if not CONFIG['cpu_fast_mode']:
+        return 'fp32'
+    tag = 'cpu-fast'
+    if CONFIG['cpu_quantize_linear']:
+        tag += '-int8linear'
+    if CONFIG['cpu_bf16']:
+        tag += '-bf16'
+    return tag
+
+
+def result_key(image_bgr, repair_scratches=False, enhance_background=False, extra=None):
+    """
+    Calcula la clave de caché de una petición de mejora.
+
+    Args:
+        image_bgr: Imagen de entrada en formato BGR
+        repair_scratches: Opción de reparar grietas
+        enhance_background: Opción de mejorar el fondo
+        extra: dict opcional con otros parámetros que afecten al resultado
+
+    Returns:
+        Hash hexadecimal (sha256)
+    """
+    params = _options(repair_scratches, enhance_background, extra)
+    params.update(shape=image_bgr.shape, dtype=str(image_bgr.dtype))
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(np.ascontiguousarray(image_bgr).data)
+    return digest.hexdigest()
+
+
+def options_key(repair_scratches=False, enhance_background=False, extra=None):
+    """
+    Hash de las opciones y la configuración, sin la imagen.
+
+    Dos resultados con el mismo options_key son intercambiables si sus
+    entradas son la misma foto (ver src/dedup.py).
+    """
+    params = _options(repair_scratches, enhance_background, extra)
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _options(repair_scratches, enhance_background, extra):
+    options = {
+        'repair_scratches': bool(repair_scratches),
+        'enhance_background': bool(enhance_background),
+        'config': {key: CONFIG[key] for key in _CONFIG_KEYS},
+        'numerics': numerics_tag(),
+        'extra': extra or {},
+    }
+    if repair_scratches:
+        options['scratches'] = {key: CONFIG[key] for key in _SCRATCH_KEYS}
+    return options
+
+
+class ResultCache:
+    """Caché LRU de resultados en disco, limitada por tamaño."""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """
+        Args:
+            cache_dir: Directorio de la caché (por defecto CONFIG['cache_dir'])
+            max_bytes: Tamaño máximo en bytes (por defecto CONFIG['cache_max_mb'])
+        """
+        self.cache_dir = cache_dir or CONFIG['cache_dir']
+        if max_bytes is None:
+            max_bytes = CONFIG['cache_max_mb'] * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clave -> tamaño, del menos al más reciente
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def _scan(self):
+        """Reconstruye el índice LRU a partir de los ficheros existentes."""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def get(self, key):
+        """
+        Busca un resultado en la caché.
+
+        Returns:
+            numpy array en formato BGR o None si no está
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            result = np.load(path)
+            os.utime(path)  # Persistir la recencia entre ejecuciones
+        except (OSError, ValueError):
+            # Fichero borrado o corrupto desde fuera: se trata como fallo
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, image_bgr):
+        """Guarda un resultado y expulsa los más antiguos si hace falta."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, image_bgr)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Elimina todos los resultados de la caché."""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Devuelve contadores de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
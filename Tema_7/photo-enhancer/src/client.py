@@ -0,0 +1,183 @@
+"""
+Cliente del servicio HTTP de mejora (src/service.py).
+
+Solo usa la librería estándar. Las respuestas 429 se traducen a
+QueueFullError, igual que cuando la cola es local, y las 503 (o un
+servicio que no responde) a ServiceUnavailableError.
+"""
+
+import io
+import json
+import shutil
+import urllib.error
+import urllib.request
+from urllib.parse import quote, urlencode
+
+import numpy as np
+
+from config import CONFIG
+from src.jobs import FINISHED_STATES, QueueFullError
+from src.selection import selection_params
+
+
+class ServiceRequestError(Exception):
+    """Respuesta de error del servicio."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceUnavailableError(ServiceRequestError):
+    """El servicio no está disponible (503 o sin conexión)."""
+
+
+class JobStatus:
+    """Estado de un trabajo remoto (mismos campos que Job.to_dict)."""
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.status = data['status']
+        self.stage = data.get('stage')
+        self.progress = data.get('progress', 0.0)
+        self.error = data.get('error')
+        self.position = data.get('position')
+        self.kind = data.get('kind', 'image')
+        self.report = data.get('report')
+        self.preview_ready = data.get('preview_ready', False)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+
+class EnhanceClient:
+    """Cliente HTTP de un EnhanceService."""
+
+    def __init__(self, base_url=None, timeout=None):
+        """
+        Args:
+            base_url: URL del servicio (CONFIG['service_url'])
+            timeout: Segundos de espera por petición
+                (CONFIG['service_client_timeout_s'])
+        """
+        self.base_url = (base_url or CONFIG['service_url']).rstrip('/')
+        self.timeout = timeout or CONFIG['service_client_timeout_s']
+
+    def _open(self, method, path, params=None, data=None, timeout=None):
+        url = self.base_url + path
+        if params:
+            url += "?" + urlencode(params)
+        request = urllib.request.Request(url, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/octet-stream")
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            if e.code == 429:
+                raise QueueFullError(message)
+            if e.code == 503:
+                raise ServiceUnavailableError(e.code, message)
+            raise ServiceRequestError(e.code, message)
+        except OSError as e:
+            raise ServiceUnavailableError(None, f"Servicio no disponible en {self.base_url}: {e}")
+
+    def _json(self, method, path, params=None, data=None):
+        with self._open(method, path, params, data) as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def _flags(options):
+        return {name: int(bool(value)) for name, value in options.items()}
+
+    def is_alive(self):
+        """True si el servicio responde a /health."""
+        try:
+            self.health()
+            return True
+        except ServiceRequestError:
+            return False
+
+    def health(self):
+        return self._json('GET', '/health')
+
+    def submit_image(self, data, selection=None, **options):
+        """
+        Encola un fichero de imagen.
+
+        Args:
+            data: Bytes del fichero (PNG, JPEG...)
+            selection: Selección opcional de caras y zonas de interés
+                (ver src/selection.py)
+            **options: repair_scratches, enhance_background, progressive
+
+        Returns:
+            dict con id y coalesced
+        """
+        params = self._flags(options)
+        params.update(selection_params(selection))
+        return self._json('POST', '/jobs', params, data)
+
+    def submit_video(self, data, name="video.mp4", **options):
+        """Encola un fichero de vídeo (ver submit_image)."""
+        params = self._flags(options)
+        params['name'] = name
+        return self._json('POST', '/videos', params, data)
+
+    def status(self, job_id):
+        """JobStatus de un trabajo."""
+        return JobStatus(self._json('GET', f'/jobs/{quote(job_id)}'))
+
+    def result(self, job_id, fmt='png'):
+        """Bytes del resultado (fichero de imagen o vídeo)."""
+        with self._open('GET', f'/jobs/{quote(job_id)}/result', {'format': fmt}) as response:
+            return response.read()
+
+    def result_image(self, job_id):
+        """Resultado de una imagen como numpy array BGR (sin comprimir)."""
+        return np.load(io.BytesIO(self.result(job_id, 'npy')), allow_pickle=False)
+
+    def result_to(self, job_id, path, fmt='png'):
+        """Descarga el resultado a un fichero, por trozos."""
+        with self._open('GET', f'/jobs/{quote(job_id)}/result', {'format': fmt}) as response:
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(response, f, CONFIG['service_chunk_bytes'])
+        return path
+
+    def preview(self, job_id, fmt='jpeg'):
+        """Bytes de la vista previa de una imagen en curso (modo progresivo)."""
+        with self._open('GET', f'/jobs/{quote(job_id)}/preview', {'format': fmt}) as response:
+            return response.read()
+
+    def trace(self, job_id):
+        """Traza (dict de Trace.to_dict) de una imagen terminada."""
+        return self._json('GET', f'/jobs/{quote(job_id)}/trace')
+
+    def cancel(self, job_id):
+        """Deja de esperar un trabajo (se cancela si nadie más lo espera)."""
+        return self._json('DELETE', f'/jobs/{quote(job_id)}')['cancelled']
+
+    def release(self, job_id):
+        """
+        Libera un trabajo terminado cuyo resultado ya se ha descargado: el
+        servicio olvida el resultado y borra el vídeo si nadie más lo espera.
+        """
+        self.cancel(job_id)
+
+    def enhance(self, data, fmt='png', timeout=None, selection=None, **options):
+        """
+        Mejora un fichero de imagen de una sola vez (POST /enhance).
+
+        Returns:
+            Bytes del resultado en el formato pedido
+        """
+        params = self._flags(options)
+        params.update(selection_params(selection))
+        params['format'] = fmt
+        timeout = timeout or CONFIG['service_request_timeout_s']
+        with self._open('POST', '/enhance', params, data, timeout) as response:
+            return response.read()
@@ -0,0 +1,311 @@
+"""
+Detección de fotos repetidas con hashes perceptuales.
+
+La caché de resultados (src/cache.py) solo acierta si los bytes de la
+entrada son idénticos. Una foto redimensionada, guardada de nuevo en JPEG
+o capturada de pantalla tiene otros bytes, pero los mismos hashes
+perceptuales (o casi):
+  - pHash: signo de las 63 frecuencias bajas de la DCT frente a su mediana,
+  - dHash: signo del gradiente horizontal en una rejilla de 9x8.
+
+DedupIndex guarda en SQLite, por cada resultado cacheado, los dos hashes
+de su entrada, su tamaño y la clave del resultado. Para que la búsqueda
+siga siendo rápida con cientos de miles de entradas se usa multi-index
+hashing: el pHash se parte en 4 trozos de 16 bits con un índice cada uno.
+Si dos hashes difieren en d bits o menos, algún trozo difiere en d // 4
+bits o menos, así que basta consultar los vecinos de cada trozo dentro de
+ese radio y comprobar la distancia completa solo de esos candidatos.
+
+Solo se reutiliza el resultado de una entrada al menos tan grande como la
+nueva: ampliar el resultado de una miniatura daría una imagen borrosa en
+lugar de una restauración. El resultado reutilizado se reduce al tamaño
+que tendría el de la entrada nueva y se registra con correlación de fase (cv2.phaseCorrelate) para
+corregir pequeños desplazamientos; si la correlación es baja se descarta.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+_CHUNKS = 4
+_CHUNK_BITS = 16
+# Límite conservador de parámetros por consulta en SQLite
+_MAX_SQL_PARAMS = 500
+
+
+def _gray(image_bgr):
+    if image_bgr.ndim == 2:
+        return image_bgr
+    return cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image_bgr):
+    """pHash de 64 bits (DCT de 32x32, bloque 8x8 de frecuencias bajas)."""
+    small = cv2.resize(_gray(image_bgr), (32, 32), interpolation=cv2.INTER_AREA)
+    coeffs = cv2.dct(small.astype(np.float32))[:8, :8]
+    # La mediana sin la componente continua, que solo mide el brillo
+    median = np.median(coeffs.ravel()[1:])
+    return _bits_to_int(coeffs > median)
+
+
+def dhash(image_bgr):
+    """dHash de 64 bits (gradiente horizontal en 9x8)."""
+    small = cv2.resize(_gray(image_bgr), (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def hamming(a, b):
+    """Bits distintos entre dos hashes."""
+    return bin(a ^ b).count('1')
+
+
+def _to_sql(value):
+    """Entero sin signo de 64 bits a INTEGER de SQLite (con signo)."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _from_sql(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _chunks(value):
+    mask = (1 << _CHUNK_BITS) - 1
+    return [(value >> (_CHUNK_BITS * i)) & mask for i in range(_CHUNKS)]
+
+
+def _neighbours(chunk, radius):
+    """Valores de un trozo a distancia de Hamming <= radius."""
+    values = [chunk]
+    for distance in range(1, radius + 1):
+        for positions in itertools.combinations(range(_CHUNK_BITS), distance):
+            flipped = chunk
+            for position in positions:
+                flipped ^= 1 << position
+            values.append(flipped)
+    return values
+
+
+class DedupIndex:
+    """Índice persistente de hashes perceptuales de entradas ya procesadas."""
+
+    def __init__(self, path=None, phash_distance=None, dhash_distance=None):
+        """
+        Args:
+            path: Fichero SQLite (CONFIG['dedup_index_path'])
+            phash_distance: Distancia máxima de pHash para considerar dos
+                fotos la misma (CONFIG['dedup_phash_distance'])
+            dhash_distance: Distancia máxima de dHash, como segunda
+                comprobación (CONFIG['dedup_dhash_distance'])
+        """
+        self.path = path or CONFIG['dedup_index_path']
+        self.phash_distance = (CONFIG['dedup_phash_distance']
+                               if phash_distance is None else phash_distance)
+        self.dhash_distance = (CONFIG['dedup_dhash_distance']
+                               if dhash_distance is None else dhash_distance)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Compartida por los hilos de la cola de trabajos (con self._lock)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY,"
+            " options TEXT NOT NULL,"
+            " result_key TEXT NOT NULL UNIQUE,"
+            " phash INTEGER NOT NULL,"
+            " dhash INTEGER NOT NULL,"
+            " c0 INTEGER NOT NULL, c1 INTEGER NOT NULL,"
+            " c2 INTEGER NOT NULL, c3 INTEGER NOT NULL,"
+            " width INTEGER NOT NULL,"
+            " height INTEGER NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        for i in range(_CHUNKS):
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS entries_c{i} ON entries (c{i}, options)"
+            )
+        self._db.commit()
+
+    @staticmethod
+    def hashes(image_bgr):
+        """(pHash, dHash) de una imagen."""
+        return phash(image_bgr), dhash(image_bgr)
+
+    def add(self, image_bgr, options, result_key, hashes=None):
+        """
+        Registra la entrada de un resultado guardado en la caché.
+
+        Args:
+            image_bgr: Imagen de entrada
+            options: options_key de la petición (src/cache.py)
+            result_key: Clave del resultado en ResultCache
+            hashes: (pHash, dHash) ya calculados, si se tienen
+        """
+        p, d = hashes or self.hashes(image_bgr)
+        height, width = image_bgr.shape[:2]
+        chunks = _chunks(p)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (options, result_key, phash, dhash,"
+                " c0, c1, c2, c3, width, height, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (options, result_key, _to_sql(p), _to_sql(d), *chunks, width, height, time.time())
+            )
+            self._db.commit()
+
+    def _candidates(self, p, options):
+        radius = self.phash_distance // _CHUNKS
+        rows = {}
+        for i, chunk in enumerate(_chunks(p)):
+            values = _neighbours(chunk, radius)
+            for start in range(0, len(values), _MAX_SQL_PARAMS):
+                batch = values[start:start + _MAX_SQL_PARAMS]
+                marks = ",".join("?" * len(batch))
+                query = (f"SELECT id, result_key, phash, dhash, width, height FROM entries"
+                         f" WHERE options = ? AND c{i} IN ({marks})")
+                for row in self._db.execute(query, (options, *batch)):
+                    rows[row[0]] = row
+        return rows.values()
+
+    def find(self, image_bgr, options, hashes=None):
+        """
+        Busca una entrada ya procesada que sea la misma foto.
+
+        Args:
+            image_bgr: Imagen de entrada
+            options: options_key de la petición
+            hashes: (pHash, dHash) ya calculados, si se tienen
+
+        Solo se aceptan entradas guardadas al menos tan grandes como
+        image_bgr (ver reuse_result).
+
+        Returns:
+            dict con result_key, size (ancho, alto de la entrada original) y
+            las distancias, o None
+        """
+        p, d = hashes or self.hashes(image_bgr)
+        height, width = image_bgr.shape[:2]
+        max_aspect = CONFIG['dedup_max_aspect_change']
+        best = None
+        with self._lock:
+            candidates = list(self._candidates(p, options))
+        for _, key, stored_p, stored_d, stored_w, stored_h in candidates:
+            p_dist = hamming(p, _from_sql(stored_p))
+            d_dist = hamming(d, _from_sql(stored_d))
+            if p_dist > self.phash_distance or d_dist > self.dhash_distance:
+                continue
+            # Una entrada más pequeña daría un resultado ampliado (borroso)
+            if stored_w < width or stored_h < height:
+                continue
+            # Un recorte cambia la proporción: no es la misma foto
+            if abs(width / height - stored_w / stored_h) > max_aspect * stored_w / stored_h:
+                continue
+            if best is None or (p_dist, d_dist) < (best['phash_distance'], best['dhash_distance']):
+                best = {
+                    'result_key': key,
+                    'size': (stored_w, stored_h),
+                    'phash_distance': p_dist,
+                    'dhash_distance': d_dist,
+                }
+        with self._lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def forget(self, result_key):
+        """Elimina una entrada (p. ej., si su resultado ya no está en la caché)."""
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE result_key = ?", (result_key,))
+            self._db.commit()
+
+    def stats(self):
+        """Devuelve contadores de uso del índice."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def reuse_result(result_bgr, image_bgr, upscale, min_response=None, max_side=None):
+    """
+    Adapta un resultado de una foto repetida a una entrada nueva.
+
+    El resultado se reduce al tamaño de la entrada por upscale y se alinea
+    con ella por correlación de fase (a baja resolución, sobre la
+    luminancia). Un resultado más pequeño que la salida pedida se
+    descarta: ampliarlo no es una restauración.
+
+    Args:
+        result_bgr: Resultado guardado de la foto original
+        image_bgr: Entrada nueva
+        upscale: Escala de salida de la petición nueva
+        min_response: Pico mínimo de la correlación para aceptar el
+            resultado (CONFIG['dedup_min_response'])
+        max_side: Lado largo de la comparación (CONFIG['dedup_register_side'])
+
+    Returns:
+        tuple: (imagen BGR, dict con la escala y el desplazamiento) o
+        (None, dict) si el resultado es más pequeño o no encaja con la entrada
+    """
+    min_response = CONFIG['dedup_min_response'] if min_response is None else min_response
+    max_side = max_side or CONFIG['dedup_register_side']
+    height, width = image_bgr.shape[:2]
+    out_size = (max(1, round(width * upscale)), max(1, round(height * upscale)))
+    result_h, result_w = result_bgr.shape[:2]
+    info = {'scale': round(out_size[0] / result_w, 4)}
+    if out_size[0] > result_w or out_size[1] > result_h:
+        info['rejected'] = 'upscale'
+        return None, info
+
+    if (result_w, result_h) != out_size:
+        result_bgr = cv2.resize(result_bgr, out_size, interpolation=cv2.INTER_AREA)
+
+    factor = min(1.0, max_side / max(width, height))
+    size = (max(1, round(width * factor)), max(1, round(height * factor)))
+    reference = cv2.resize(_gray(result_bgr), size, interpolation=cv2.INTER_AREA)
+    current = cv2.resize(_gray(image_bgr), size, interpolation=cv2.INTER_AREA)
+    window = cv2.createHanningWindow(size, cv2.CV_32F)
+    (dx, dy), response = cv2.phaseCorrelate(np.float32(reference), np.float32(current), window)
+    info.update(shift=[round(dx / factor, 2), round(dy / factor, 2)],
+                response=round(float(response), 4))
+    if response < min_response:
+        return None, info
+
+    # Desplazamiento a la escala de la salida
+    dx, dy = dx / factor * upscale, dy / factor * upscale
+    if abs(dx) >= 0.5 or abs(dy) >= 0.5:
+        shift = np.float32([[1, 0, dx], [0, 1, dy]])
+        result_bgr = cv2.warpAffine(result_bgr, shift, out_size, flags=cv2.INTER_LINEAR,
+                                    borderMode=cv2.BORDER_REPLICATE)
+    return result_bgr, info
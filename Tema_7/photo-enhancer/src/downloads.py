@@ -0,0 +1,119 @@
+"""
+Codificación de las descargas en segundo plano.
+
+Cada resultado se codifica una sola vez por formato, en un hilo aparte, y
+los bytes se guardan asociados al id del resultado: los reruns de
+Streamlit reutilizan el mismo Future en lugar de volver a codificar.
+cv2.imencode trabaja directamente sobre BGR y libera el GIL mientras
+comprime, así que no frena al script.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+# formato -> (extensión, tipo MIME, etiqueta para la UI)
+FORMATS = {
+    'png': ('.png', 'image/png', "PNG (sin pérdida)"),
+    'webp': ('.webp', 'image/webp', "WebP (sin pérdida)"),
+    'jpeg': ('.jpg', 'image/jpeg', "JPEG (con pérdida, más pequeño)"),
+}
+
+
+def encode_params(fmt):
+    """Parámetros de cv2.imencode para un formato según CONFIG."""
+    if fmt == 'png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, CONFIG['download_png_compression']]
+    if fmt == 'webp':
+        # Calidad > 100 activa el modo sin pérdida de libwebp
+        return [cv2.IMWRITE_WEBP_QUALITY, 101]
+    if fmt == 'jpeg':
+        return [cv2.IMWRITE_JPEG_QUALITY, CONFIG['download_jpeg_quality']]
+    raise ValueError(f"Formato de descarga no soportado: {fmt}")
+
+
+def encode_image(image, fmt):
+    """
+    Codifica una imagen.
+
+    Args:
+        image: numpy array BGR o imagen PIL (RGB)
+        fmt: 'png', 'webp' o 'jpeg'
+
+    Returns:
+        bytes codificados
+    """
+    if not isinstance(image, np.ndarray):
+        image = cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+    ok, buffer = cv2.imencode(FORMATS[fmt][0], image, encode_params(fmt))
+    if not ok:
+        raise RuntimeError(f"No se pudo codificar la imagen como {fmt}")
+    return buffer.tobytes()
+
+
+class DownloadEncoder:
+    """Codificaciones en segundo plano, cacheadas por (resultado, formato)."""
+
+    def __init__(self, workers=None, max_entries=None):
+        """
+        Args:
+            workers: Hilos de codificación (CONFIG['download_encoder_workers'])
+            max_entries: Codificaciones que se conservan
+                (CONFIG['download_cache_entries'])
+        """
+        self.max_entries = max_entries or CONFIG['download_cache_entries']
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or CONFIG['download_encoder_workers'],
+            thread_name_prefix="download-encoder"
+        )
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, result_id, image, fmt):
+        """
+        Codificación de un resultado, lanzándola si aún no existe.
+
+        Args:
+            result_id: Identificador del resultado
+            image: numpy array BGR o imagen PIL
+            fmt: Formato de FORMATS
+
+        Returns:
+            Future con los bytes
+        """
+        key = (result_id, fmt)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._executor.submit(encode_image, image, fmt)
+                self._futures[key] = future
+                while len(self._futures) > self.max_entries:
+                    self._futures.popitem(last=False)
+            else:
+                self._futures.move_to_end(key)
+            return future
+
+    def prefetch(self, result_id, image, formats=None):
+        """Lanza las codificaciones habituales de un resultado recién terminado."""
+        for fmt in formats or CONFIG['download_prefetch_formats']:
+            self.submit(result_id, image, fmt)
+
+    def get(self, result_id, fmt):
+        """Future de una codificación ya lanzada (o None)."""
+        with self._lock:
+            return self._futures.get((result_id, fmt))
+
+    def forget(self, result_id):
+        """Descarta todas las codificaciones de un resultado."""
+        with self._lock:
+            for key in [k for k in self._futures if k[0] == result_id]:
+                del self._futures[key]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,237 @@
+"""
+Lectura rápida de las imágenes subidas.
+
+Antes de decodificar nada se lee la cabecera (tamaño, formato y
+orientación EXIF) y se aplica el límite de píxeles contra bombas de
+descompresión. Después la imagen se decodifica:
+  - directamente en BGR con cv2.imdecode (sin pasar por RGB ni copiar),
+  - a escala reducida (1/2, 1/4 o 1/8) si se pide un tamaño máximo: en
+    JPEG libjpeg escala al decodificar la DCT, así que una foto de móvil
+    de 40 MP para mostrar en pantalla cuesta una fracción de la
+    decodificación completa,
+  - con la orientación EXIF aplicada explícitamente (igual para todos los
+    formatos y para la ruta de PIL).
+"""
+
+import io
+import warnings
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from config import CONFIG
+
+
+# Etiqueta EXIF de orientación
+_ORIENTATION = 0x0112
+
+# Factor de reducción -> flag de cv2.imdecode
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class IngestError(ValueError):
+    """La imagen no se puede leer o supera el límite de píxeles."""
+
+
+class PixelLimitError(IngestError):
+    """La imagen supera CONFIG['ingest_max_pixels']."""
+
+
+class ImageInfo:
+    """Datos de cabecera de una imagen."""
+
+    def __init__(self, width, height, fmt, orientation):
+        self.width = width
+        self.height = height
+        self.format = fmt
+        self.orientation = orientation
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    @property
+    def oriented_size(self):
+        """(ancho, alto) una vez aplicada la orientación EXIF."""
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+    def to_dict(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'format': self.format,
+            'orientation': self.orientation,
+        }
+
+
+def _read_bytes(source):
+    """Bytes de una ruta, de un fichero subido o de unos bytes."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def _open(data):
+    """
+    Image.open sin el aviso de bomba de descompresión de PIL.
+
+    PIL avisa por encima de Image.MAX_IMAGE_PIXELS (~89 MP por defecto) y
+    falla por encima del doble. El aviso se silencia solo aquí porque el
+    límite lo aplica check_pixels; Image.MAX_IMAGE_PIXELS no se toca, que
+    es global y lo usan también el lote y la ruta de imágenes grandes.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        return Image.open(io.BytesIO(data))
+
+
+def probe(data, max_pixels=None):
+    """
+    Lee la cabecera de una imagen sin decodificar los píxeles.
+
+    El límite de píxeles se comprueba antes de leer el EXIF: en PNG,
+    getexif() decodifica la imagen entera si el EXIF no está en la cabecera
+    (por eso solo se lee el que está antes de los datos).
+
+    Args:
+        data: Bytes del fichero
+        max_pixels: Límite de píxeles (CONFIG['ingest_max_pixels'])
+
+    Raises:
+        PixelLimitError: Si la imagen supera el límite de píxeles
+        IngestError: Si los bytes no son una imagen
+    """
+    try:
+        with _open(data) as image:
+            info = ImageInfo(image.width, image.height, image.format, 1)
+            check_pixels(info, max_pixels)
+            if image.format != 'PNG' or 'exif' in image.info:
+                orientation = image.getexif().get(_ORIENTATION, 1)
+                info.orientation = orientation if orientation in range(1, 9) else 1
+            return info
+    except PixelLimitError:
+        raise
+    except Image.DecompressionBombError as e:
+        # Por encima del doble de Image.MAX_IMAGE_PIXELS PIL no abre la imagen
+        raise PixelLimitError(f"Imagen demasiado grande: {e}")
+    except Exception as e:
+        raise IngestError(f"Imagen no válida: {e}")
+
+
+def check_pixels(info, max_pixels=None):
+    """
+    Raises:
+        PixelLimitError: Si la imagen supera CONFIG['ingest_max_pixels']
+    """
+    max_pixels = max_pixels or CONFIG['ingest_max_pixels']
+    if info.pixels > max_pixels:
+        raise PixelLimitError(
+            f"Imagen de {info.width}x{info.height} ({info.pixels / 1e6:.0f} MP): "
+            f"el máximo es {max_pixels / 1e6:.0f} MP"
+        )
+
+
+def reduction(info, max_side=None):
+    """
+    Mayor factor de reducción (1, 2, 4 u 8) que deja el lado largo en al
+    menos max_side píxeles.
+    """
+    if not max_side:
+        return 1
+    long_side = max(info.width, info.height)
+    factor = 1
+    while factor < 8 and -(-long_side // (factor * 2)) >= max_side:
+        factor *= 2
+    return factor
+
+
+def apply_orientation(image_bgr, orientation):
+    """Gira o voltea un array según la orientación EXIF (1 a 8)."""
+    if orientation == 2:
+        return cv2.flip(image_bgr, 1)
+    if orientation == 3:
+        return cv2.rotate(image_bgr, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image_bgr, 0)
+    if orientation == 5:
+        return cv2.transpose(image_bgr)
+    if orientation == 6:
+        return cv2.rotate(image_bgr, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.rotate(cv2.transpose(image_bgr), cv2.ROTATE_180)
+    if orientation == 8:
+        return cv2.rotate(image_bgr, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image_bgr
+
+
+def decode_bgr(source, max_side=None, max_pixels=None, trace=None):
+    """
+    Decodifica una imagen directamente en BGR.
+
+    Args:
+        source: Ruta, fichero subido o bytes
+        max_side: Lado largo mínimo que se necesita; si la imagen es mucho
+            mayor se decodifica reducida (por defecto CONFIG['ingest_max_side'];
+            None = resolución completa)
+        max_pixels: Límite de píxeles (CONFIG['ingest_max_pixels'])
+        trace: Trace opcional donde contar la copia
+
+    Returns:
+        tuple: (numpy array BGR, ImageInfo)
+
+    Raises:
+        IngestError: Si no es una imagen o supera el límite de píxeles
+    """
+    data = _read_bytes(source)
+    info = probe(data, max_pixels)
+    factor = reduction(info, max_side or CONFIG['ingest_max_side'])
+
+    flags = _REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION
+    image_bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image_bgr is None:
+        # Formato que OpenCV no sabe leer: se decodifica con PIL
+        image = decode_pil(data, max_side, max_pixels)[0]
+        image_bgr = np.frombuffer(bytearray(image.tobytes('raw', 'BGR')), dtype=np.uint8)
+        image_bgr = image_bgr.reshape(image.height, image.width, 3)
+    else:
+        image_bgr = apply_orientation(image_bgr, info.orientation)
+    if trace is not None:
+        trace.count_copy('ingest.decode', image_bgr.nbytes)
+    return image_bgr, info
+
+
+def decode_pil(source, max_side=None, max_pixels=None):
+    """
+    Decodifica una imagen en PIL (RGB), para mostrarla en la UI.
+
+    Con max_side, los JPEG se decodifican en modo draft (escala reducida
+    de libjpeg). Ver decode_bgr.
+
+    Returns:
+        tuple: (imagen PIL en RGB, ImageInfo)
+    """
+    data = _read_bytes(source)
+    info = probe(data, max_pixels)
+    factor = reduction(info, max_side or CONFIG['ingest_max_side'])
+
+    image = _open(data)
+    if factor > 1 and image.format == 'JPEG':
+        image.draft('RGB', (-(-info.width // factor), -(-info.height // factor)))
+    image = ImageOps.exif_transpose(image)
+    if factor > 1 and max(image.size) > -(-max(info.width, info.height) // factor):
+        # Formatos sin draft: reducción entera después de decodificar
+        image = image.reduce(factor)
+    return (image if image.mode == 'RGB' else image.convert('RGB')), info
@@ -0,0 +1,311 @@
+"""
+Cola local de trabajos de mejora.
+
+Los trabajos se ejecutan en un pool acotado de hilos, fuera del hilo del
+script de Streamlit. La cola tiene un máximo de trabajos pendientes
+(contrapresión): si está llena, submit lanza QueueFullError en lugar de
+aceptar más trabajo del que se puede atender.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from config import CONFIG
+from src.metrics import Trace
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """La cola ha alcanzado su máximo de trabajos pendientes."""
+
+
+class JobCancelled(Exception):
+    """Se lanza dentro del trabajo cuando se ha solicitado su cancelación."""
+
+
+class Job:
+    """Un trabajo de mejora y su estado."""
+
+    def __init__(self, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.stage = None
+        self.progress = 0.0
+        self.stages = []  # (etapa, segundos desde el inicio)
+        self.result = None
+        self.preview = None  # vista previa del modo progresivo
+        self.error = None
+        self.trace = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, stage, fraction):
+        """
+        Callback de progreso para ImageEnhancer.enhance.
+
+        Raises:
+            JobCancelled: Si se ha pedido cancelar el trabajo
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.stage = stage
+        self.progress = fraction
+        self.stages.append((stage, round(time.time() - self.started_at, 3)))
+
+    def publish_preview(self, image_bgr):
+        """Callback on_preview de ImageEnhancer.enhance (modo progresivo)."""
+        self.preview = image_bgr
+
+    def to_dict(self):
+        """Resumen serializable del estado del trabajo."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'stages': list(self.stages),
+            'error': self.error,
+            'preview_ready': self.preview is not None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """Cola FIFO de trabajos con un pool acotado de hilos."""
+
+    def __init__(self, enhancer, workers=None, max_pending=None, max_finished=None,
+                 on_done=None, on_evict=None):
+        """
+        Args:
+            enhancer: ImageEnhancer (headless) que ejecuta las mejoras
+            workers: Hilos de trabajo (CONFIG['job_workers'])
+            max_pending: Máximo de trabajos en espera (CONFIG['job_max_pending'])
+            max_finished: Trabajos terminados que se conservan para consulta
+                (CONFIG['job_max_finished'])
+            on_done: Callback opcional on_done(job), llamado desde el hilo
+                de trabajo cuando un trabajo termina con éxito
+            on_evict: Callback opcional on_evict(job), llamado (sin el lock
+                de la cola) cuando un trabajo terminado se olvida, por forget
+                o por superar max_finished
+        """
+        self.enhancer = enhancer
+        self.workers = workers or CONFIG['job_workers']
+        self.max_pending = max_pending or CONFIG['job_max_pending']
+        self.max_finished = max_finished or CONFIG['job_max_finished']
+        self.on_done = on_done
+        self.on_evict = on_evict
+        self._evicted = []  # olvidados con el lock tomado, pendientes de on_evict
+        self._pending = deque()
+        self._jobs = OrderedDict()
+        self._finished_order = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"enhance-worker-{index + 1}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, image_bgr, trace=None, progressive=False, **options):
+        """
+        Encola una mejora.
+
+        Args:
+            image_bgr: Imagen en formato BGR
+            trace: Trace donde registrar la mejora (por defecto, una nueva)
+            progressive: Publicar en job.preview una vista previa rápida
+                antes de terminar (ver ImageEnhancer.enhance, on_preview)
+            **options: Opciones de ImageEnhancer.enhance
+
+        Returns:
+            Job encolado
+
+        Raises:
+            QueueFullError: Si ya hay max_pending trabajos esperando
+        """
+        trace = trace or Trace()
+        job = Job(self.enhancer.enhance, (image_bgr,), dict(options, trace=trace))
+        job.trace = trace
+        if progressive:
+            job.kwargs['on_preview'] = job.publish_preview
+        return self._enqueue(job)
+
+    def submit_call(self, func, *args, **kwargs):
+        """
+        Encola una llamada arbitraria que acepte el callback `progress`.
+
+        Raises:
+            QueueFullError: Si ya hay max_pending trabajos esperando
+        """
+        return self._enqueue(Job(func, args, kwargs))
+
+    def _enqueue(self, job):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("La cola está cerrada")
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError(
+                    f"Hay {len(self._pending)} trabajos en espera; inténtalo más tarde"
+                )
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        """Devuelve un trabajo por id (o None)."""
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id):
+        """
+        Posición en la cola de espera.
+
+        Returns:
+            0 si está en ejecución o terminado, 1 si es el siguiente, etc.
+            None si el id no existe
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status != QUEUED:
+                return 0
+            return self._pending.index(job) + 1
+
+    def cancel(self, job_id):
+        """
+        Cancela un trabajo. Si está esperando se retira de la cola; si está
+        en ejecución se detendrá en la siguiente etapa.
+
+        Returns:
+            True si el trabajo existía y no había terminado
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job._cancel.set()
+            if job.status == QUEUED:
+                self._pending.remove(job)
+                self._finish(job, CANCELLED)
+        self._notify_evicted()
+        return True
+
+    def forget(self, job_id):
+        """Elimina un trabajo terminado (y su resultado) de la memoria."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+                self._finished_order.remove(job_id)
+                self._evicted.append(job)
+        self._notify_evicted()
+
+    def stats(self):
+        """Ocupación actual de la cola."""
+        with self._cond:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            return {
+                'pending': len(self._pending),
+                'running': running,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+            }
+
+    def close(self, cancel_pending=True):
+        """Detiene los hilos de trabajo."""
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                while self._pending:
+                    self._finish(self._pending.popleft(), CANCELLED)
+            self._cond.notify_all()
+        self._notify_evicted()
+        for thread in self._threads:
+            thread.join()
+
+    def _finish(self, job, status):
+        """Marca un trabajo como terminado (con el lock tomado)."""
+        job.status = status
+        job.finished_at = time.time()
+        self._finished_order.append(job.id)
+        while len(self._finished_order) > self.max_finished:
+            evicted = self._jobs.pop(self._finished_order.popleft(), None)
+            if evicted is not None:
+                self._evicted.append(evicted)
+
+    def _notify_evicted(self):
+        """Llama a on_evict con los trabajos olvidados (sin el lock tomado)."""
+        with self._cond:
+            evicted, self._evicted = self._evicted, []
+        if self.on_evict is None:
+            return
+        for job in evicted:
+            try:
+                self.on_evict(job)
+            except Exception:
+                pass
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                result = job.func(*job.args, progress=job.report, **job.kwargs)
+                status = DONE
+            except JobCancelled:
+                result, status = None, CANCELLED
+            except Exception as e:
+                result, status = None, FAILED
+                job.error = f"{type(e).__name__}: {e}"
+
+            with self._cond:
+                job.result = result
+                # Ya no hace falta retener la entrada
+                job.args = job.kwargs = None
+                self._finish(job, status)
+            self._notify_evicted()
+
+            if status == DONE and self.on_done is not None:
+                try:
+                    self.on_done(job)
+                except Exception:
+                    # Un fallo del callback no debe tumbar el hilo de trabajo
+                    pass
@@ -0,0 +1,343 @@
+"""
+Modo de memoria acotada para imágenes muy grandes.
+
+La imagen se vuelca a un array en disco (memmap) y se procesa en franjas
+horizontales con solape. Cada franja mejorada se escribe directamente en
+un .npy mapeado en memoria; solo las filas de solape con la franja
+siguiente se mantienen en RAM para fundirlas.
+
+La altura de las franjas se elige para no superar el techo de memoria
+configurado: la primera con la estimación de CONFIG['large_bytes_per_pixel']
+y las siguientes con la memoria medida en las anteriores. Las costuras se
+colocan fuera de las caras (detectadas en una copia reducida), para que
+ninguna cara se restaure partida.
+
+Volcar la entrada al memmap no es incremental: PIL decodifica la imagen
+entera la primera vez que se recorta. Esa copia (ancho x alto x 3 bytes
+en RGB) se libera al cerrar la imagen, antes de mejorar ninguna franja,
+así que no se suma al pico de las franjas, pero sí al del proceso.
+"""
+
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from config import CONFIG
+from src.metrics import current_rss_bytes, peak_rss_bytes
+
+
+# Etiqueta EXIF de orientación (ver src/ingest.py)
+_ORIENTATION = 0x0112
+
+# Orientación EXIF -> transformación de PIL que la deshace
+_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def estimate_strip_bytes(width, rows, bytes_per_pixel=None):
+    """Memoria estimada para mejorar una franja de width x rows píxeles."""
+    return width * rows * (bytes_per_pixel or CONFIG['large_bytes_per_pixel'])
+
+
+def max_strip_rows(width, max_peak_bytes, overlap, bytes_per_pixel=None):
+    """
+    Filas de la franja más alta que cabe en el techo de memoria.
+
+    Raises:
+        ValueError: Si ni la franja mínima cabe en el techo de memoria
+    """
+    bytes_per_pixel = bytes_per_pixel or CONFIG['large_bytes_per_pixel']
+    max_rows = int(max_peak_bytes // max(1, width * bytes_per_pixel))
+    if max_rows - overlap < max(16, overlap):
+        raise ValueError(
+            f"El techo de memoria ({max_peak_bytes / 2**20:.0f} MB) no permite "
+            f"procesar franjas de {width} px de ancho"
+        )
+    return max_rows
+
+
+def next_strip_end(start, height, max_rows, overlap, faces=()):
+    """
+    Fin de la franja que empieza en start.
+
+    La franja siguiente empieza overlap filas antes del fin y esas filas se
+    funden entre las dos; el fin se sube hasta que ninguna cara toque esa
+    banda, así cada cara queda entera dentro de una sola franja.
+
+    Args:
+        start: Primera fila de la franja
+        height: Alto de la imagen
+        max_rows: Filas máximas de la franja
+        overlap: Filas de solape con la franja siguiente
+        faces: Filas (y1, y2) ocupadas por caras
+
+    Returns:
+        tuple: (fin, True si no se ha podido evitar partir una cara)
+    """
+    end = min(height, start + max_rows)
+    if end >= height:
+        return end, False
+    min_end = start + overlap + max(16, overlap)
+    candidate = end
+    while candidate >= min_end:
+        crossing = [y1 for y1, y2 in faces if y1 < candidate and y2 > candidate - overlap]
+        if not crossing:
+            return candidate, False
+        candidate = min(crossing)
+    # Cara más alta que la franja: se parte por donde tocaba
+    return end, True
+
+
+def plan_strips(width, height, max_peak_bytes, overlap, faces=(), bytes_per_pixel=None):
+    """
+    Calcula las franjas a procesar respetando el techo de memoria.
+
+    Args:
+        width: Ancho de la imagen
+        height: Alto de la imagen
+        max_peak_bytes: Techo de memoria para una franja
+        overlap: Filas de solape entre franjas consecutivas
+        faces: Filas (y1, y2) ocupadas por caras, fuera de las costuras
+        bytes_per_pixel: Memoria por píxel (CONFIG['large_bytes_per_pixel'])
+
+    Returns:
+        Lista de (inicio, fin) de cada franja, solape incluido
+
+    Raises:
+        ValueError: Si ni la franja mínima cabe en el techo de memoria
+    """
+    max_rows = max_strip_rows(width, max_peak_bytes, overlap, bytes_per_pixel)
+    strips = []
+    start = 0
+    while True:
+        end = next_strip_end(start, height, max_rows, overlap, faces)[0]
+        strips.append((start, end))
+        if end >= height:
+            break
+        start = end - overlap
+    return strips
+
+
+def _source_box(orientation, width, height, y0, y1):
+    """
+    Zona de la imagen original que da las filas y0:y1 de la imagen ya
+    orientada (width x height son las dimensiones del original).
+    """
+    if orientation in (3, 4):
+        return 0, height - y1, width, height - y0
+    if orientation in (5, 6):
+        return y0, 0, y1, height
+    if orientation in (7, 8):
+        return width - y1, 0, width - y0, height
+    return 0, y0, width, y1
+
+
+def spill_to_memmap(image, path, orientation=1, rows_per_chunk=256):
+    """
+    Vuelca una imagen PIL a un array BGR mapeado en disco por bloques,
+    con la orientación EXIF aplicada.
+
+    PIL decodifica la imagen entera en el primer recorte (ver el
+    docstring del módulo); los bloques solo acotan las copias de la
+    conversión a BGR y de la orientación.
+
+    Args:
+        image: Imagen PIL (cualquier modo)
+        path: Ruta del fichero .npy a crear
+        orientation: Orientación EXIF (1 a 8)
+        rows_per_chunk: Filas que se convierten de cada vez
+
+    Returns:
+        numpy memmap de forma (alto, ancho, 3), ya orientado
+    """
+    width, height = image.size
+    transpose = _TRANSPOSES.get(orientation)
+    out_w, out_h = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+    target = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                       shape=(out_h, out_w, 3))
+    for y in range(0, out_h, rows_per_chunk):
+        y1 = min(out_h, y + rows_per_chunk)
+        chunk = image.crop(_source_box(orientation, width, height, y, y1))
+        if transpose is not None:
+            chunk = chunk.transpose(transpose)
+        if chunk.mode != 'RGB':
+            chunk = chunk.convert('RGB')
+        target[y:y1] = np.frombuffer(chunk.tobytes('raw', 'BGR'), dtype=np.uint8).reshape(y1 - y, out_w, 3)
+    target.flush()
+    return target
+
+
+class LargeImageProcessor:
+    """Mejora imágenes enormes por franjas con memoria acotada."""
+
+    def __init__(self, enhancer, max_peak_mb=None, overlap=None, work_dir=None):
+        """
+        Args:
+            enhancer: ImageEnhancer que procesa cada franja
+            max_peak_mb: Techo de memoria por franja (CONFIG['large_max_peak_mb'])
+            overlap: Filas de solape entre franjas (CONFIG['large_strip_overlap'])
+            work_dir: Directorio para ficheros temporales
+        """
+        self.enhancer = enhancer
+        self.max_peak_bytes = int((max_peak_mb or CONFIG['large_max_peak_mb']) * 1024 * 1024)
+        overlap = CONFIG['large_strip_overlap'] if overlap is None else overlap
+        self.overlap = overlap - overlap % 2
+        self.work_dir = work_dir
+
+    def face_rows(self, image_bgr):
+        """
+        Filas (y1, y2) ocupadas por caras, con su margen.
+
+        Se detectan en una copia reducida: las caras que no se ven ahí son
+        pequeñas y caben en el solape de todas formas.
+        """
+        from src import pipeline
+
+        height, width = image_bgr.shape[:2]
+        factor = min(1.0, CONFIG['large_face_scan_side'] / max(width, height))
+        small = cv2.resize(image_bgr, (max(1, round(width * factor)), max(1, round(height * factor))),
+                           interpolation=cv2.INTER_AREA)
+        helper = pipeline.new_face_helper(self.enhancer.load_model_simple())
+        pipeline.detect_faces(helper, small)
+        rows = []
+        for _, y1, _, y2 in pipeline.face_boxes(helper, small):
+            pad = (y2 - y1) * CONFIG['large_face_margin']
+            rows.append((max(0, int((y1 - pad) / factor)), min(height, int((y2 + pad) / factor) + 1)))
+        return rows
+
+    def process(self, source, output_path, repair_scratches=False, enhance_background=False):
+        """
+        Mejora una imagen grande y escribe el resultado de forma incremental.
+
+        Args:
+            source: Ruta o fichero de la imagen de entrada
+            output_path: Ruta de salida; '.npy' deja el memmap BGR tal cual,
+                cualquier otra extensión se codifica con OpenCV al terminar
+            repair_scratches: Reparar grietas en cada franja
+            enhance_background: Mejorar el fondo en cada franja
+
+        Returns:
+            dict con las franjas usadas, tiempos y memoria (estimada y medida)
+
+        Raises:
+            ValueError: Si ni la franja mínima cabe en el techo de memoria
+                con la estimación inicial
+        """
+        start_time = time.perf_counter()
+        with tempfile.TemporaryDirectory(dir=self.work_dir) as tmp:
+            with Image.open(source) as image:
+                orientation = image.getexif().get(_ORIENTATION, 1)
+                source_bgr = spill_to_memmap(image, os.path.join(tmp, "input.npy"),
+                                             orientation if orientation in range(1, 9) else 1)
+            height, width = source_bgr.shape[:2]
+            bytes_per_pixel = CONFIG['large_bytes_per_pixel']
+            max_rows = max_strip_rows(width, self.max_peak_bytes, self.overlap, bytes_per_pixel)
+            faces = self.face_rows(source_bgr) if CONFIG['large_face_seams'] else []
+
+            if output_path.lower().endswith(".npy"):
+                npy_path = output_path
+            else:
+                npy_path = os.path.join(tmp, "output.npy")
+
+            output = None
+            carry = None  # filas de solape de la franja anterior (float32)
+            scale = None
+            strips = []
+            cut_faces = over_ceiling = 0
+            y0 = 0
+            while True:
+                y1, cut = next_strip_end(y0, height, max_rows, self.overlap, faces)
+                strips.append((y0, y1))
+                cut_faces += cut
+                strip = np.ascontiguousarray(source_bgr[y0:y1])
+                rss_before, peak_before = current_rss_bytes(), peak_rss_bytes()
+                restored = self.enhancer.enhance(
+                    strip,
+                    repair_scratches=repair_scratches,
+                    enhance_background=enhance_background
+                )
+                peak_after = peak_rss_bytes()
+                if output is None:
+                    scale = restored.shape[0] // (y1 - y0)
+                    output = np.lib.format.open_memmap(
+                        npy_path, mode='w+', dtype=np.uint8,
+                        shape=(height * scale, width * scale, 3)
+                    )
+                carry = self._write_strip(output, restored, y0 * scale, carry,
+                                          has_next=y1 < height,
+                                          overlap=self.overlap * scale)
+                del strip, restored
+                if y1 >= height:
+                    break
+
+                # Si la franja ha marcado un nuevo pico, su coste es medible;
+                # la primera no cuenta (incluye la carga de los modelos)
+                if len(strips) > 1 and None not in (rss_before, peak_before, peak_after) \
+                        and peak_after > peak_before:
+                    strip_bytes = peak_after - rss_before
+                    over_ceiling += strip_bytes > self.max_peak_bytes
+                    bytes_per_pixel = strip_bytes / (width * (y1 - y0))
+                    try:
+                        max_rows = max_strip_rows(width, self.max_peak_bytes, self.overlap,
+                                                  bytes_per_pixel)
+                    except ValueError:
+                        # A mitad de imagen no se aborta: franjas mínimas
+                        max_rows = self.overlap + max(16, self.overlap)
+                y0 = y1 - self.overlap
+
+            output.flush()
+            if npy_path != output_path:
+                if not cv2.imwrite(output_path, output):
+                    raise IOError(f"No se pudo escribir {output_path}")
+            del output, source_bgr
+
+        peak = peak_rss_bytes()
+        first_rows = strips[0][1] - strips[0][0]
+        return {
+            'width': width,
+            'height': height,
+            'orientation': orientation,
+            'scale': scale,
+            'strips': len(strips),
+            'strip_rows': first_rows,
+            'estimated_strip_mb': round(estimate_strip_bytes(width, first_rows) / 2**20, 1),
+            'bytes_per_pixel': round(bytes_per_pixel, 1),
+            'strips_over_ceiling': over_ceiling,
+            'faces': len(faces),
+            'cut_faces': cut_faces,
+            'peak_rss_mb': round(peak / 2**20, 1) if peak else None,
+            'elapsed_s': round(time.perf_counter() - start_time, 3),
+        }
+
+    @staticmethod
+    def _write_strip(output, restored, top, carry, has_next, overlap):
+        """
+        Escribe una franja mejorada fundiendo el solape con la anterior.
+
+        Returns:
+            Filas finales pendientes de fundir con la franja siguiente
+        """
+        rows = restored.shape[0]
+        body_start = 0
+        if carry is not None:
+            ramp = ((np.arange(overlap, dtype=np.float32) + 0.5) / overlap)[:, None, None]
+            blended = carry * (1 - ramp) + restored[:overlap].astype(np.float32) * ramp
+            output[top:top + overlap] = np.clip(blended, 0, 255).round().astype(np.uint8)
+            body_start = overlap
+
+        body_end = rows - overlap if has_next else rows
+        output[top + body_start:top + body_end] = restored[body_start:body_end]
+        if has_next:
+            return restored[body_end:].astype(np.float32)
+        return None
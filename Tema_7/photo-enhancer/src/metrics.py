@@ -0,0 +1,234 @@
+"""
+Instrumentación por etapas del pipeline de mejora.
+
+Una Trace agrupa las etapas de una petición: para cada una se registra el
+tiempo de pared, el tiempo de CPU del proceso, la memoria residente y las
+dimensiones de la imagen. El pico de memoria (ru_maxrss) es de toda la vida
+del proceso, así que se guarda una vez por traza y no por etapa. Al terminar, la traza se envía a los sinks
+configurados (fichero JSON-lines, histogramas en memoria...).
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+def current_rss_bytes():
+    """Memoria residente actual del proceso (None si no se puede medir)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes():
+    """Pico histórico de memoria residente del proceso (None si no disponible)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS lo da en bytes, Linux en KB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, pct):
+    """Percentil por interpolación lineal (values ya ordenados)."""
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+class Trace:
+    """Tiempos y memoria de cada etapa de una petición."""
+
+    def __init__(self, request_id=None, **attributes):
+        """
+        Args:
+            request_id: Identificador de la petición (por defecto, aleatorio)
+            **attributes: Datos extra a guardar con la traza (opciones, etc.)
+        """
+        self.request_id = request_id or uuid.uuid4().hex
+        self.attributes = attributes
+        self.stages = []
+        self.copies = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_s = None
+        self.process_peak_rss_bytes = None
+
+    @contextmanager
+    def stage(self, name, image=None):
+        """
+        Mide una etapa.
+
+        Args:
+            name: Nombre de la etapa
+            image: Imagen (numpy) de entrada, para registrar sus dimensiones
+        """
+        record = {'stage': name}
+        if image is not None:
+            record['height'], record['width'] = image.shape[:2]
+        rss_before = current_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall_start
+            # Tiempo de CPU de todo el proceso: incluye los hilos de torch
+            record['cpu_s'] = time.process_time() - cpu_start
+            rss_after = current_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record['rss_bytes'] = rss_after
+                record['rss_delta_bytes'] = rss_after - rss_before
+            self.stages.append(record)
+
+    def count_copy(self, label, nbytes):
+        """
+        Registra una copia completa de la imagen.
+
+        Args:
+            label: Dónde se hizo la copia
+            nbytes: Tamaño de la copia en bytes
+        """
+        entry = self.copies.setdefault(label, {'count': 0, 'bytes': 0})
+        entry['count'] += 1
+        entry['bytes'] += nbytes
+
+    def elapsed(self):
+        """Segundos desde que empezó la traza."""
+        return time.perf_counter() - self._start
+
+    def finish(self):
+        """Cierra la traza y devuelve su tiempo total."""
+        self.total_s = self.elapsed()
+        self.process_peak_rss_bytes = peak_rss_bytes()
+        return self.total_s
+
+    def to_dict(self):
+        """Representación serializable de la traza."""
+        return {
+            'request_id': self.request_id,
+            'started_at': self.started_at,
+            'total_s': self.total_s,
+            'process_peak_rss_bytes': self.process_peak_rss_bytes,
+            'attributes': self.attributes,
+            'stages': list(self.stages),
+            'frame_copies': {k: dict(v) for k, v in self.copies.items()},
+        }
+
+
+class JsonLinesSink:
+    """Escribe cada traza como una línea JSON en un fichero."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def emit(self, trace):
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+# Límites superiores (segundos) de los histogramas de tiempo
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Histograma acumulativo de tiempos."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Cuantil aproximado (límite superior del bucket que lo contiene)."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class HistogramRegistry:
+    """Histogramas en memoria del tiempo de pared y de CPU por etapa."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, name, value):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def emit(self, trace):
+        with self._lock:
+            for record in trace.stages:
+                self._observe(f"{record['stage']}.wall_s", record['wall_s'])
+                self._observe(f"{record['stage']}.cpu_s", record['cpu_s'])
+            if trace.total_s is not None:
+                self._observe("total.wall_s", trace.total_s)
+
+    def summary(self):
+        """dict métrica -> {count, mean, p50, p95, p99}."""
+        with self._lock:
+            return {
+                name: {
+                    'count': h.count,
+                    'mean': h.sum / h.count if h.count else 0.0,
+                    'p50': h.quantile(0.5),
+                    'p95': h.quantile(0.95),
+                    'p99': h.quantile(0.99),
+                }
+                for name, h in sorted(self._histograms.items())
+            }
+
+
+class MetricsRecorder:
+    """Reparte las trazas terminadas entre varios sinks."""
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, trace):
+        for sink in self.sinks:
+            try:
+                sink.emit(trace)
+            except Exception:
+                # Un sink roto nunca debe tumbar la mejora
+                pass
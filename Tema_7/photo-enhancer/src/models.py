@@ -1,82 +1,297 @@
 import warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='torchvision')
 
+import threading
+
 import streamlit as st
-from gfpgan import GFPGANer
-from basicsr.archs.rrdbnet_arch import RRDBNet
-from realesrgan import RealESRGANer
 from config import CONFIG
-from zeroscratches import EraseScratches
-from PIL import Image
-import cv2
+from src import optimize, pipeline, scratches, startup
+from src.adaptive import LatencyModel, plan_resolution
+from src.cache import options_key, result_key
+from src.dedup import reuse_result
+from src.selection import normalize_selection, regions_of_interest, select_faces, upsample_regions
+from src.metrics import Trace
+from src.registry import ModelRegistry
+from src.weights import WEIGHT_SOURCES, WeightStoreError, assign_state_dict, get_weight_store
 import numpy as np
 
+# gfpgan, basicsr, realesrgan, zeroscratches, cv2 (y con ellos torch) se
+# importan dentro de los loaders: importar este módulo es casi instantáneo
+# y el coste se paga al cargar el primer modelo (ver src/startup.py).
+
+
+REALESRGAN_URL = WEIGHT_SOURCES['realesrgan']
+
+# Carpeta donde FaceRestoreHelper busca (o descarga) sus pesos
+FACEXLIB_WEIGHTS_DIR = 'gfpgan/weights'
+
+
+def _stored_weights(*names):
+    """
+    Almacén de pesos si contiene todos los nombres dados.
+
+    Returns:
+        WeightStore o None si hay que usar la descarga de siempre
+
+    Raises:
+        WeightStoreError: Si falta algún peso y CONFIG['weights_offline']
+    """
+    store = get_weight_store()
+    if store is not None and all(store.has(name) for name in names):
+        return store
+    if CONFIG['weights_offline']:
+        raise WeightStoreError(
+            f"Modo sin conexión y faltan pesos {names}: ejecuta python -m src.weights --populate"
+        )
+    return None
+
+
+def _gfpgan_from_store(store, bg_upsampler):
+    """
+    GFPGANer (arquitectura 'clean') con los pesos del almacén mapeados en
+    memoria: equivale a GFPGANer.__init__ pero sin torch.load del .pth.
+    """
+    import torch
+    from facexlib.utils.face_restoration_helper import FaceRestoreHelper
+    from gfpgan import GFPGANer
+    from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+
+    restorer = GFPGANer.__new__(GFPGANer)
+    restorer.upscale = CONFIG['upscale']
+    restorer.bg_upsampler = bg_upsampler
+    restorer.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    restorer.gfpgan = GFPGANv1Clean(
+        out_size=512, num_style_feat=512,
+        channel_multiplier=CONFIG['channel_multiplier'],
+        decoder_load_path=None, fix_decoder=False, num_mlp=8,
+        input_is_latent=True, different_w=True, narrow=1, sft_half=True
+    )
+    assign_state_dict(restorer.gfpgan, store.load_state_dict('gfpgan'))
+    restorer.gfpgan = restorer.gfpgan.eval().to(restorer.device)
+
+    # facexlib carga sus .pth por ruta: se dejan donde los busca y, en CPU,
+    # se sustituyen después por las versiones mapeadas
+    store.export_facexlib(FACEXLIB_WEIGHTS_DIR)
+    restorer.face_helper = FaceRestoreHelper(
+        CONFIG['upscale'], face_size=512, crop_ratio=(1, 1),
+        det_model='retinaface_resnet50', save_ext='png', use_parse=True,
+        device=restorer.device, model_rootpath=FACEXLIB_WEIGHTS_DIR
+    )
+    if restorer.device.type == 'cpu':
+        assign_state_dict(restorer.face_helper.face_det, store.load_state_dict('retinaface'))
+        assign_state_dict(restorer.face_helper.face_parse, store.load_state_dict('parsenet'))
+    return restorer
+
+
+def build_gfpgan(bg_upsampler=None):
+    """
+    Construye un GFPGANer con la configuración de CONFIG.
+
+    Si el almacén local tiene los pesos (y la arquitectura es 'clean') se
+    cargan de ahí sin descargar ni deserializar nada.
+
+    Args:
+        bg_upsampler: Upsampler de fondo opcional (RealESRGANer)
+
+    Returns:
+        GFPGANer listo para inferencia
+    """
+    from gfpgan import GFPGANer
+
+    if CONFIG['arch'] == 'clean':
+        store = _stored_weights('gfpgan', 'retinaface', 'parsenet')
+        if store is not None:
+            return _gfpgan_from_store(store, bg_upsampler)
+
+    return GFPGANer(
+        model_path=CONFIG['model_url'],
+        upscale=CONFIG['upscale'],
+        arch=CONFIG['arch'],
+        channel_multiplier=CONFIG['channel_multiplier'],
+        bg_upsampler=bg_upsampler
+    )
+
+
+def _realesrgan_from_store(store, model_bg):
+    """RealESRGANer x2 con los pesos del almacén mapeados en memoria."""
+    import torch
+    from realesrgan import RealESRGANer
+
+    upsampler = RealESRGANer.__new__(RealESRGANer)
+    upsampler.scale = 2
+    upsampler.tile_size = CONFIG['bg_tile_size']
+    upsampler.tile_pad = CONFIG['bg_tile_pad']
+    upsampler.pre_pad = 0
+    upsampler.mod_scale = None
+    upsampler.half = False
+    upsampler.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    assign_state_dict(model_bg, store.load_state_dict('realesrgan'))
+    upsampler.model = model_bg.eval().to(upsampler.device)
+    return upsampler
+
+
+def build_bg_upsampler(parallel=True):
+    """
+    Construye el RealESRGANer x2 usado para mejorar el fondo.
+
+    Args:
+        parallel: Si True y CONFIG['bg_tile_workers'] != 1, lo envuelve en
+            un ParallelTileUpsampler que procesa las teselas en paralelo
+
+    Returns:
+        RealESRGANer o ParallelTileUpsampler
+    """
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from realesrgan import RealESRGANer
+    from src.tiling import ParallelTileUpsampler
+
+    model_bg = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, 
+                       num_block=23, num_grow_ch=32, scale=2)
+    store = _stored_weights('realesrgan')
+    if store is not None:
+        upsampler = _realesrgan_from_store(store, model_bg)
+    else:
+        upsampler = RealESRGANer(
+            scale=2,
+            model_path=REALESRGAN_URL,
+            model=model_bg,
+            tile=CONFIG['bg_tile_size'],
+            tile_pad=CONFIG['bg_tile_pad'],
+            pre_pad=0,
+            half=False
+        )
+    if parallel and CONFIG['bg_tile_workers'] != 1:
+        return ParallelTileUpsampler(upsampler)
+    return upsampler
+
+
+def build_scratch_eraser():
+    """Construye el EraseScratches de zeroscratches."""
+    from zeroscratches import EraseScratches
+
+    return EraseScratches()
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def default_loaders():
+    """Loaders de los modelos reales para ModelRegistry."""
+    loaders = {
+        'gfpgan': build_gfpgan,
+        'realesrgan': build_bg_upsampler,
+        'scratches': build_scratch_eraser,
+    }
+    if CONFIG['cpu_fast_mode']:
+        loaders = optimize.fast_loaders(loaders)
+    return loaders
+
+
+def get_default_registry():
+    """Registro de modelos compartido por todo el proceso."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry(default_loaders())
+        return _default_registry
+
 
 class ImageEnhancer:
     """Clase para manejar el modelo GFPGAN y el procesamiento de imágenes."""
     
-    def __init__(self):
-        self.model = None
-        self.model_with_bg = None
-        self._scratch_eraser = None  # Caché interno
+    def __init__(self, headless=False, cache=None, registry=None, metrics=None,
+                 track_first_result=True, dedup=None):
+        """
+        Args:
+            headless: Si True, no usa Streamlit (spinners ni mensajes).
+                Pensado para procesos por lotes.
+            cache: ResultCache opcional para reutilizar resultados previos
+            registry: ModelRegistry a usar (por defecto, el del proceso)
+            metrics: MetricsRecorder opcional al que se envía cada traza
+            track_first_result: Registrar el tiempo hasta el primer
+                resultado en src.startup (False para el precalentamiento)
+            dedup: DedupIndex opcional para reutilizar resultados de fotos
+                repetidas aunque sus bytes cambien (requiere cache)
+        """
+        self.headless = headless
+        self.cache = cache
+        self.registry = registry or get_default_registry()
+        self.metrics = metrics
+        self.track_first_result = track_first_result
+        self.dedup = dedup if cache is not None else None
+        self.latency_model = LatencyModel()
     
     @property
     def scratch_eraser(self):
-        """Lazy loading del EraseScratches con caché."""
-        if self._scratch_eraser is None:
-            self._scratch_eraser = EraseScratches()
-        return self._scratch_eraser
+        """EraseScratches compartido a través del registro."""
+        return self._load('scratches', "Cargando EraseScratches...")
+
+    def _load(self, name, message):
+        """Obtiene un modelo del registro mostrando un spinner si se carga."""
+        if self.headless or self.registry.is_loaded(name):
+            return self.registry.get(name)
+        with st.spinner(message):
+            return self.registry.get(name)
     
-    @st.cache_resource
-    def load_model_simple(_self):
-        """Carga GFPGAN sin RealESRGAN (solo mejora caras)."""
-        with st.spinner("Cargando GFPGAN..."):
-            model = GFPGANer(
-                model_path=CONFIG['model_url'],
-                upscale=CONFIG['upscale'],
-                arch=CONFIG['arch'],
-                channel_multiplier=CONFIG['channel_multiplier'],
-                bg_upsampler=None
-            )
-        return model
+    def load_model_simple(self):
+        """Carga GFPGAN (solo mejora caras)."""
+        return self._load('gfpgan', "Cargando GFPGAN...")
     
-    @st.cache_resource
-    def load_model_with_background(_self):
-        """Carga GFPGAN con RealESRGAN (mejora caras + fondo)."""
-        with st.spinner("Cargando GFPGAN + RealESRGAN..."):
-            model_bg = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, 
-                               num_block=23, num_grow_ch=32, scale=2)
-            bg_upsampler = RealESRGANer(
-                scale=2,
-                model_path='https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth',
-                model=model_bg,
-                tile=400,
-                tile_pad=10,
-                pre_pad=0,
-                half=False
-            )
-            
-            model = GFPGANer(
-                model_path=CONFIG['model_url'],
-                upscale=CONFIG['upscale'],
-                arch=CONFIG['arch'],
-                channel_multiplier=CONFIG['channel_multiplier'],
-                bg_upsampler=bg_upsampler
-            )
-        return model
-
-    def _remove_scratches(self, image_bgr: np.ndarray) -> np.ndarray:
-        """Elimina rayas/grietas antes de pasar a GFPGAN."""
-        img_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(img_rgb)
-        
-        restored_rgb = self.scratch_eraser.erase(pil_img)
-        
-        restored_rgb = np.array(restored_rgb, dtype=np.uint8)
-        restored_bgr = cv2.cvtColor(restored_rgb, cv2.COLOR_RGB2BGR)
+    def load_model_with_background(self):
+        """
+        Carga GFPGAN y RealESRGAN (mejora caras + fondo).
+
+        Returns:
+            tuple: (GFPGANer compartido, RealESRGANer)
+        """
+        restorer = self.load_model_simple()
+        bg_upsampler = self._load('realesrgan', "Cargando RealESRGAN...")
+        return restorer, bg_upsampler
+
+    def _notify(self, message):
+        """Muestra un mensaje de estado en la UI (silencioso en modo headless)."""
+        if not self.headless:
+            st.info(message)
+
+    def _stage(self, progress, stage, fraction, message=None):
+        """
+        Informa del comienzo de una etapa.
+
+        Args:
+            progress: Callback opcional progress(etapa, fracción). Puede
+                lanzar una excepción para cancelar la mejora.
+            stage: Nombre de la etapa
+            fraction: Progreso aproximado (0 a 1)
+            message: Mensaje opcional para la UI
+        """
+        if message:
+            self._notify(message)
+        if progress is not None:
+            progress(stage, fraction)
+
+    def _remove_scratches(self, image_bgr: np.ndarray, trace=None) -> np.ndarray:
+        """
+        Elimina rayas/grietas antes de pasar a GFPGAN.
+
+        Con CONFIG['scratch_mode'] = 'masked' solo se reparan las zonas que
+        marca la máscara de daños (ver src/scratches.py).
+        """
+        trace = trace or Trace()
+        eraser = self.scratch_eraser
+        if CONFIG['scratch_mode'] != 'masked':
+            with trace.stage('scratches.erase', image_bgr):
+                return scratches.erase_bgr(eraser, image_bgr, trace)
+
+        with trace.stage('scratches.mask', image_bgr):
+            mask = scratches.mask_cache.get(image_bgr)
+        with trace.stage('scratches.erase', image_bgr):
+            restored_bgr, info = scratches.repair_masked(eraser, image_bgr, mask, trace)
+        trace.attributes['scratches'] = info
         return restored_bgr
     
-    def enhance(self, image_bgr, repair_scratches=False, enhance_background=False):
+    def enhance(self, image_bgr, repair_scratches=False, enhance_background=False,
+                progress=None, trace=None, adaptive=None, on_preview=None, selection=None):
         """
         Mejora una imagen con opciones configurables.
         
@@ -84,31 +299,326 @@ class ImageEnhancer:
             image_bgr: Imagen en formato BGR
             repair_scratches: Si True, repara grietas primero
             enhance_background: Si True, usa RealESRGAN para el fondo
+            progress: Callback opcional progress(etapa, fracción)
+            trace: Trace opcional donde registrar los tiempos por etapa
+            adaptive: dict opcional con pixel_budget, latency_budget_s y/o
+                output_long_side para el modo de resolución adaptativa
+                (ver src/adaptive.py). Con None se usa CONFIG['adaptive_mode'].
+            on_preview: Callback opcional on_preview(imagen BGR) para el
+                modo progresivo: con enhance_background recibe una vista
+                previa (solo caras, a baja resolución) antes de mejorar el
+                fondo, que es la etapa lenta
+            selection: dict opcional con faces (índices), boxes (cajas
+                [x1, y1, x2, y2]), largest (N caras más grandes) y margin
+                para mejorar solo esas caras y, con enhance_background, el
+                fondo solo alrededor de ellas (ver src/selection.py)
+
+        Raises:
+            SelectionError: Si la selección no es válida
+        """
+        selection = normalize_selection(selection)
+        if trace is None:
+            trace = Trace()
+        trace.attributes.update(
+            repair_scratches=repair_scratches,
+            enhance_background=enhance_background,
+            height=image_bgr.shape[0],
+            width=image_bgr.shape[1],
+        )
+        try:
+            plan = self._plan(image_bgr, adaptive)
+            if plan is not None:
+                trace.attributes['adaptive'] = plan.to_dict()
+            result = self._enhance(image_bgr, repair_scratches, enhance_background,
+                                   progress, trace, plan, on_preview, selection)
+            # Con selección el coste no es el de la foto entera
+            if plan is not None and selection is None:
+                self.latency_model.observe(trace)
+            if self.track_first_result:
+                startup.report.mark_first_result()
+            return result
+        finally:
+            trace.finish()
+            if self.metrics is not None:
+                self.metrics.emit(trace)
+
+    def _plan(self, image_bgr, adaptive):
+        """Plan de resolución adaptativa (None si el modo no está activo)."""
+        if adaptive is None:
+            if not CONFIG['adaptive_mode']:
+                return None
+            adaptive = {}
+        height, width = image_bgr.shape[:2]
+        return plan_resolution(
+            height, width,
+            pixel_budget=adaptive.get('pixel_budget', CONFIG['adaptive_pixel_budget']),
+            latency_budget_s=adaptive.get('latency_budget_s', CONFIG['adaptive_latency_budget_s']),
+            output_long_side=adaptive.get('output_long_side', CONFIG['adaptive_output_long_side']),
+            latency_model=self.latency_model
+        )
+
+    @staticmethod
+    def _cache_key(image_bgr, repair_scratches, enhance_background, plan=None, selection=None):
+        """Clave de la caché de resultados para una imagen y sus opciones."""
+        extra = {}
+        if enhance_background:
+            extra['bg_model_url'] = REALESRGAN_URL
+        if plan is not None:
+            extra['adaptive'] = [list(plan.work_size), round(plan.upscale, 4)]
+        if selection is not None:
+            extra['selection'] = selection
+        return result_key(image_bgr, repair_scratches, enhance_background, extra or None)
+
+    @staticmethod
+    def _dedup_options(repair_scratches, enhance_background, plan=None, selection=None):
         """
+        options_key de una petición para el índice de fotos repetidas.
+
+        Sin el tamaño: la escala se ajusta al reutilizar el resultado.
+        """
+        extra = {}
+        if enhance_background:
+            extra['bg_model_url'] = REALESRGAN_URL
+        if plan is not None:
+            extra['adaptive'] = True
+        if selection is not None:
+            extra['selection'] = selection
+        return options_key(repair_scratches, enhance_background, extra or None)
+
+    def _reuse_duplicate(self, image_bgr, options, hashes, upscale, trace):
+        """
+        Resultado de una foto ya procesada que sea la misma que image_bgr.
+
+        Returns:
+            Imagen BGR reescalada y registrada, o None
+        """
+        with trace.stage('dedup_lookup', image_bgr):
+            match = self.dedup.find(image_bgr, options, hashes)
+            stored = self.cache.get(match['result_key']) if match else None
+        if match is None:
+            return None
+        if stored is None:
+            # El resultado salió de la caché: la entrada ya no sirve
+            self.dedup.forget(match['result_key'])
+            return None
+        with trace.stage('dedup_register', image_bgr):
+            result, info = reuse_result(stored, image_bgr, upscale)
+        info.update(phash_distance=match['phash_distance'],
+                    dhash_distance=match['dhash_distance'],
+                    original_size=list(match['size']),
+                    accepted=result is not None)
+        trace.attributes['dedup'] = info
+        return result
+
+    def _enhance(self, image_bgr, repair_scratches, enhance_background, progress, trace,
+                 plan=None, on_preview=None, selection=None):
+        key = None
+        if self.cache is not None:
+            self._stage(progress, 'cache', 0.0)
+            with trace.stage('cache_lookup', image_bgr):
+                key = self._cache_key(image_bgr, repair_scratches, enhance_background, plan,
+                                      selection)
+                cached = self.cache.get(key)
+            trace.attributes['cache_hit'] = cached is not None
+            if cached is not None:
+                self._stage(progress, 'done', 1.0, "⚡ Resultado recuperado de la caché")
+                return cached
+
+        dedup_options = hashes = None
+        # Las cajas de una selección están en píxeles de esta imagen: no
+        # sirven para una copia a otra escala
+        if self.dedup is not None and not (selection and selection['boxes']):
+            dedup_options = self._dedup_options(repair_scratches, enhance_background, plan,
+                                                selection)
+            hashes = self.dedup.hashes(image_bgr)
+            upscale = plan.upscale if plan is not None else CONFIG['upscale']
+            reused = self._reuse_duplicate(image_bgr, dedup_options, hashes, upscale, trace)
+            if reused is not None:
+                self._stage(progress, 'done', 1.0, "⚡ Foto repetida: se reutiliza un resultado anterior")
+                return reused
+        input_bgr = image_bgr
+
         # Paso 1: Reparar grietas (opcional)
         if repair_scratches:
-            st.info("🔧 Reparando grietas y arañazos...")
-            image_bgr = self._remove_scratches(image_bgr)
+            self._stage(progress, 'scratches', 0.1, "🔧 Reparando grietas y arañazos...")
+            image_bgr = self._remove_scratches(image_bgr, trace)
         
         # Paso 2: Seleccionar modelo según opciones
-        if enhance_background:
-            st.info("✨ Mejorando caras y fondo...")
-            if self.model_with_bg is None:
-                self.model_with_bg = self.load_model_with_background()
-            model = self.model_with_bg
-        else:
-            st.info("✨ Mejorando caras...")
-            if self.model is None:
-                self.model = self.load_model_simple()
-            model = self.model
+        self._stage(progress, 'loading', 0.3)
+        with trace.stage('model_loading'):
+            if enhance_background:
+                model, bg_upsampler = self.load_model_with_background()
+                message = "✨ Mejorando caras y fondo..."
+            else:
+                model, bg_upsampler = self.load_model_simple(), None
+                message = "✨ Mejorando caras..."
         
-        # Paso 3: Aplicar mejora
-        _, _, restored_img = model.enhance(
-            image_bgr,
-            has_aligned=False,
-            only_center_face=False,
-            paste_back=True,
-            weight=CONFIG['enhancement_weight']
+        # Paso 3: Aplicar mejora, etapa a etapa (equivale a GFPGANer.enhance)
+        self._stage(progress, 'restoring', 0.4, message)
+        helper = pipeline.new_face_helper(model)
+        work_bgr, upscale = image_bgr, model.upscale
+        if plan is not None:
+            # Detección y fondo sobre la copia reducida; caras del original
+            with trace.stage('adaptive_downscale', image_bgr):
+                work_bgr = plan.work_image(image_bgr)
+            helper.upscale_factor = upscale = plan.upscale
+        with trace.stage('face_detection', work_bgr):
+            if work_bgr is image_bgr:
+                faces = pipeline.detect_faces(helper, image_bgr)
+            else:
+                faces = pipeline.detect_faces_scaled(helper, work_bgr, image_bgr)
+        trace.attributes['faces'] = faces
+        regions = None
+        if selection is not None:
+            with trace.stage('face_selection', image_bgr):
+                regions = self._select(helper, image_bgr, selection, trace)
+        with trace.stage('face_alignment', image_bgr):
+            crops = pipeline.align_faces(helper)
+        with trace.stage('face_restoration', image_bgr):
+            restored_faces = pipeline.restore_faces(model, crops, CONFIG['enhancement_weight'],
+                                                    trace=trace)
+
+        if on_preview is not None and bg_upsampler is not None:
+            # Vista previa con las caras ya restauradas, antes del fondo
+            with trace.stage('progressive_preview', image_bgr):
+                preview_bgr = pipeline.paste_preview(model, helper, restored_faces, image_bgr)
+            trace.attributes['preview_s'] = round(trace.elapsed(), 3)
+            on_preview(preview_bgr)
+
+        if bg_upsampler is not None:
+            self._stage(progress, 'background', 0.7)
+        with trace.stage('background_upsampling', work_bgr):
+            bg_outscale = upscale * image_bgr.shape[1] / work_bgr.shape[1]
+            if regions is None or bg_upsampler is None:
+                bg_img = pipeline.upsample_background(bg_upsampler, work_bgr, bg_outscale)
+            else:
+                factor = work_bgr.shape[1] / image_bgr.shape[1]
+                work_regions = [[round(v * factor) for v in box] for box in regions]
+                bg_img = upsample_regions(bg_upsampler, work_bgr, bg_outscale, work_regions)
+
+        self._stage(progress, 'paste_back', 0.9)
+        with trace.stage('paste_back', image_bgr):
+            restored_img = pipeline.paste_back(helper, restored_faces, bg_img)
+
+        # Con caras sin restaurar el resultado no se guarda: se reintenta
+        if key is not None and 'face_failures' not in trace.attributes:
+            with trace.stage('cache_store', restored_img):
+                self.cache.put(key, restored_img)
+                if dedup_options is not None:
+                    self.dedup.add(input_bgr, dedup_options, key, hashes)
+
+        self._stage(progress, 'done', 1.0)
+        return restored_img
+
+    @staticmethod
+    def _select(helper, image_bgr, selection, trace):
+        """
+        Deja en el helper solo las caras elegidas.
+
+        Returns:
+            Zonas de interés para el fondo, en píxeles de image_bgr
+        """
+        boxes = pipeline.face_boxes(helper, image_bgr)
+        indices = select_faces(boxes, selection)
+        pipeline.keep_faces(helper, indices)
+        height, width = image_bgr.shape[:2]
+        regions = regions_of_interest([boxes[i] for i in indices], selection, width, height)
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        trace.attributes['selection'] = {
+            'face_boxes': [[round(v) for v in box] for box in boxes],
+            'selected': indices,
+            'regions': regions,
+            'roi_ratio': round(area / (width * height), 4),
+        }
+        return regions
+
+    def enhance_many(self, images_bgr, repair_scratches=False, enhance_background=False,
+                     trace=None):
+        """
+        Mejora varias imágenes restaurando sus caras en lotes compartidos.
+
+        Cada imagen tiene su propio FaceRestoreHelper para detectar, alinear
+        y pegar, pero los recortes de todas se restauran juntos en
+        micro-lotes de CONFIG['face_batch_size'] caras.
+
+        Args:
+            images_bgr: Lista de imágenes en formato BGR
+            repair_scratches: Si True, repara grietas primero
+            enhance_background: Si True, usa RealESRGAN para el fondo
+            trace: Trace opcional (una para todo el grupo)
+
+        Returns:
+            Lista de imágenes mejoradas, en el mismo orden
+        """
+        if trace is None:
+            trace = Trace()
+        trace.attributes.update(
+            repair_scratches=repair_scratches,
+            enhance_background=enhance_background,
+            images=len(images_bgr),
         )
-        
-        return restored_img
\ No newline at end of file
+        try:
+            results = self._enhance_many(images_bgr, repair_scratches, enhance_background, trace)
+            if self.track_first_result:
+                startup.report.mark_first_result()
+            return results
+        finally:
+            trace.finish()
+            if self.metrics is not None:
+                self.metrics.emit(trace)
+
+    def _enhance_many(self, images_bgr, repair_scratches, enhance_background, trace):
+        results = [None] * len(images_bgr)
+        keys = [None] * len(images_bgr)
+        if self.cache is not None:
+            with trace.stage('cache_lookup'):
+                for index, image_bgr in enumerate(images_bgr):
+                    keys[index] = self._cache_key(image_bgr, repair_scratches, enhance_background)
+                    results[index] = self.cache.get(keys[index])
+        pending = [index for index, result in enumerate(results) if result is None]
+        trace.attributes['cache_hits'] = len(images_bgr) - len(pending)
+        if not pending:
+            return results
+
+        with trace.stage('model_loading'):
+            if enhance_background:
+                model, bg_upsampler = self.load_model_with_background()
+            else:
+                model, bg_upsampler = self.load_model_simple(), None
+
+        # Detección y alineado por imagen; los recortes se juntan
+        prepared = {}
+        crops, owners = [], []
+        for index in pending:
+            image_bgr = images_bgr[index]
+            if repair_scratches:
+                image_bgr = self._remove_scratches(image_bgr, trace)
+            helper = pipeline.new_face_helper(model)
+            with trace.stage('face_detection', image_bgr):
+                pipeline.detect_faces(helper, image_bgr)
+            with trace.stage('face_alignment', image_bgr):
+                image_crops = pipeline.align_faces(helper)
+            prepared[index] = (helper, image_bgr)
+            crops.extend(image_crops)
+            owners.extend([index] * len(image_crops))
+        trace.attributes['faces'] = len(crops)
+
+        with trace.stage('face_restoration'):
+            restored_faces = pipeline.restore_faces(model, crops, CONFIG['enhancement_weight'],
+                                                    trace=trace)
+        failures = trace.attributes.get('face_failures')
+        failed = {owners[i] for i in failures['indices']} if failures else set()
+        faces_by_image = {index: [] for index in pending}
+        for owner, face in zip(owners, restored_faces):
+            faces_by_image[owner].append(face)
+
+        for index in pending:
+            helper, image_bgr = prepared.pop(index)
+            with trace.stage('background_upsampling', image_bgr):
+                bg_img = pipeline.upsample_background(bg_upsampler, image_bgr, model.upscale)
+            with trace.stage('paste_back', image_bgr):
+                results[index] = pipeline.paste_back(helper, faces_by_image[index], bg_img)
+            if keys[index] is not None and index not in failed:
+                with trace.stage('cache_store', results[index]):
+                    self.cache.put(keys[index], results[index])
+        return results
@@ -0,0 +1,140 @@
+"""
+Modo rápido para CPU (opcional, CONFIG['cpu_fast_mode']).
+
+Aplica a las redes de GFPGAN y RRDBNet, una vez cargadas:
+  - cuantización dinámica int8 de las capas Linear (en GFPGAN, el MLP de
+    estilo y las modulaciones de cada convolución; RRDBNet no tiene). Las
+    convoluciones no se cuantizan: casi todo el coste sigue en fp32,
+  - pesos de las Conv2d en formato channels_last y entradas convertidas al
+    vuelo, que es el formato que aprovechan los kernels oneDNN de CPU,
+  - opcionalmente, autocast a bfloat16 (solo compensa en CPUs con AVX-512
+    BF16 o AMX).
+
+Son aproximaciones: benchmarks/bench_quality.py mide PSNR/SSIM frente a
+la salida fp32. Las redes transformadas ya no comparten los pesos mapeados
+del almacén (src/weights.py): cada proceso tiene su copia.
+"""
+
+from config import CONFIG
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """
+    Fija los hilos de torch del proceso.
+
+    Args:
+        intra_op: Hilos dentro de cada operador (CONFIG['torch_intra_op_threads'])
+        inter_op: Operadores en paralelo (CONFIG['torch_inter_op_threads'])
+
+    Returns:
+        dict con los valores efectivos
+    """
+    import torch
+
+    intra_op = intra_op or CONFIG['torch_intra_op_threads']
+    inter_op = inter_op or CONFIG['torch_inter_op_threads']
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Solo se puede fijar antes del primer trabajo paralelo de torch
+            pass
+    return {'intra_op': torch.get_num_threads(), 'inter_op': torch.get_num_interop_threads()}
+
+
+def _fast_module_class():
+    import torch
+
+    class FastCPUModule(torch.nn.Module):
+        """Red optimizada: convierte la entrada y aplica autocast si procede."""
+
+        def __init__(self, module, channels_last, bf16):
+            super().__init__()
+            self.module = module
+            self.channels_last = channels_last
+            self.bf16 = bf16
+
+        def forward(self, x, *args, **kwargs):
+            if self.channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+            if not self.bf16:
+                return self.module(x, *args, **kwargs)
+            with torch.autocast('cpu', dtype=torch.bfloat16):
+                output = self.module(x, *args, **kwargs)
+            if isinstance(output, tuple):
+                return tuple(o.float() if torch.is_tensor(o) else o for o in output)
+            return output.float()
+
+    return FastCPUModule
+
+
+def optimize_module(module, quantize_linear=None, channels_last=None, bf16=None):
+    """
+    Aplica las optimizaciones de CPU a una red en modo inferencia.
+
+    Args:
+        module: torch.nn.Module
+        quantize_linear: Cuantizar las Linear a int8 (CONFIG['cpu_quantize_linear'])
+        channels_last: Convs en channels_last (CONFIG['cpu_channels_last'])
+        bf16: Autocast a bfloat16 (CONFIG['cpu_bf16'])
+
+    Returns:
+        Red optimizada (un módulo nuevo que envuelve al original)
+    """
+    import torch
+
+    quantize_linear = (CONFIG['cpu_quantize_linear'] if quantize_linear is None
+                       else quantize_linear)
+    channels_last = CONFIG['cpu_channels_last'] if channels_last is None else channels_last
+    bf16 = CONFIG['cpu_bf16'] if bf16 is None else bf16
+
+    module = module.eval()
+    if quantize_linear:
+        module = torch.ao.quantization.quantize_dynamic(
+            module, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    if channels_last:
+        # Solo las Conv2d: GFPGAN tiene pesos 5D (convoluciones moduladas)
+        # que no admiten channels_last
+        for layer in module.modules():
+            if isinstance(layer, torch.nn.Conv2d):
+                layer.weight = torch.nn.Parameter(
+                    layer.weight.detach().contiguous(memory_format=torch.channels_last),
+                    requires_grad=False
+                )
+    return _fast_module_class()(module, channels_last, bf16).eval()
+
+
+def optimize_restorer(restorer):
+    """Optimiza la red de un GFPGANer (solo si se ejecuta en CPU)."""
+    if restorer.device.type == 'cpu':
+        restorer.gfpgan = optimize_module(restorer.gfpgan)
+    return restorer
+
+
+def optimize_upsampler(upsampler):
+    """Optimiza la red de un RealESRGANer o ParallelTileUpsampler en CPU."""
+    inner = getattr(upsampler, 'upsampler', upsampler)
+    if inner.device.type == 'cpu':
+        inner.model = optimize_module(inner.model)
+    return upsampler
+
+
+def fast_loaders(loaders):
+    """
+    Envuelve los loaders de ModelRegistry para optimizar lo que cargan.
+
+    Args:
+        loaders: dict nombre -> callable (ver default_loaders)
+
+    Returns:
+        dict con los mismos nombres
+    """
+    wrapped = dict(loaders)
+    if 'gfpgan' in loaders:
+        wrapped['gfpgan'] = lambda: optimize_restorer(loaders['gfpgan']())
+    if 'realesrgan' in loaders:
+        wrapped['realesrgan'] = lambda: optimize_upsampler(loaders['realesrgan']())
+    return wrapped
@@ -0,0 +1,240 @@
+"""
+Etapas de GFPGANer.enhance expuestas una a una.
+
+Reproduce el flujo de GFPGANer.enhance (detección, alineado, restauración,
+fondo y pegado) para poder medir cada etapa por separado. Cada llamada usa
+una copia ligera del FaceRestoreHelper y recibe el upsampler de fondo como
+argumento, así que varias peticiones pueden compartir el mismo GFPGANer.
+"""
+
+import copy
+
+import cv2
+
+from config import CONFIG
+
+
+def new_face_helper(restorer):
+    """
+    Copia del FaceRestoreHelper del restorer con el estado vacío.
+
+    Comparte las redes de detección y parsing, pero no las listas de caras,
+    así que es seguro usarla en paralelo con otras peticiones.
+    """
+    helper = copy.copy(restorer.face_helper)
+    helper.clean_all()
+    return helper
+
+
+def detect_faces(helper, image_bgr, only_center_face=False):
+    """
+    Detecta las caras y sus 5 puntos de referencia.
+
+    Returns:
+        Número de caras detectadas
+    """
+    helper.read_image(image_bgr)
+    # eye_dist_threshold=5: descarta caras con ojos a menos de 5 píxeles
+    helper.get_face_landmarks_5(only_center_face=only_center_face, eye_dist_threshold=5)
+    return len(helper.all_landmarks_5)
+
+
+def detect_faces_scaled(helper, work_bgr, image_bgr, only_center_face=False):
+    """
+    Detecta las caras sobre una copia reducida y deja el helper listo
+    para alinear sobre la imagen original.
+
+    Las cajas y los puntos de referencia se reescalan a las coordenadas
+    del original, así que los recortes salen a resolución nativa.
+
+    Args:
+        helper: FaceRestoreHelper
+        work_bgr: Copia reducida de la imagen
+        image_bgr: Imagen original
+
+    Returns:
+        Número de caras detectadas
+    """
+    faces = detect_faces(helper, work_bgr, only_center_face)
+    # Se mide sobre input_img porque read_image puede redimensionar
+    detect_width = helper.input_img.shape[1]
+    helper.read_image(image_bgr)
+    factor = helper.input_img.shape[1] / detect_width
+    if factor != 1:
+        helper.all_landmarks_5 = [landmarks * factor for landmarks in helper.all_landmarks_5]
+        helper.det_faces = [_scale_box(box, factor) for box in helper.det_faces]
+    return faces
+
+
+def _scale_box(box, factor):
+    """Escala las coordenadas de una caja [x1, y1, x2, y2, score]."""
+    box = box.copy()
+    box[:4] = box[:4] * factor
+    return box
+
+
+def face_boxes(helper, image_bgr):
+    """
+    Cajas [x1, y1, x2, y2] de las caras detectadas, en píxeles de image_bgr
+    (read_image puede haber agrandado la imagen del helper).
+    """
+    factor = image_bgr.shape[1] / helper.input_img.shape[1]
+    return [[float(v) * factor for v in box[:4]] for box in helper.det_faces]
+
+
+def keep_faces(helper, indices):
+    """Deja en el helper solo las caras detectadas con esos índices."""
+    helper.det_faces = [helper.det_faces[i] for i in indices]
+    helper.all_landmarks_5 = [helper.all_landmarks_5[i] for i in indices]
+
+
+def align_faces(helper):
+    """Alinea y recorta cada cara a 512x512. Devuelve los recortes."""
+    helper.align_warp_face()
+    return helper.cropped_faces
+
+
+def restore_faces(restorer, crops, weight, batch_size=None, trace=None):
+    """
+    Restaura los recortes de cara con la red GFPGAN, por micro-lotes.
+
+    Los recortes se apilan en lotes de batch_size y cada lote es una sola
+    pasada de la red. Con batch_size=1 equivale a la restauración cara a
+    cara de GFPGANer.enhance. Ver run_in_batches para los fallos.
+
+    Args:
+        restorer: GFPGANer (se usan su red y su dispositivo)
+        crops: Lista de caras alineadas en BGR (pueden ser de varias imágenes)
+        weight: Peso de la mejora
+        batch_size: Caras por pasada (por defecto CONFIG['face_batch_size'])
+        trace: Trace donde anotar las caras que no se han podido restaurar
+
+    Returns:
+        Lista de caras restauradas en BGR uint8, en el orden de crops
+    """
+    import torch
+    from basicsr.utils import img2tensor, tensor2img
+    from torchvision.transforms.functional import normalize
+
+    def run_batch(batch):
+        tensors = []
+        for crop in batch:
+            face_t = img2tensor(crop / 255., bgr2rgb=True, float32=True)
+            normalize(face_t, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
+            tensors.append(face_t)
+        faces_t = torch.stack(tensors).to(restorer.device)
+        with torch.no_grad():
+            output = restorer.gfpgan(faces_t, return_rgb=False, weight=weight)[0]
+        return [tensor2img(face, rgb2bgr=True, min_max=(-1, 1)) for face in output]
+
+    restored = run_in_batches(crops, batch_size or CONFIG['face_batch_size'], run_batch, trace)
+    return [face.astype('uint8') for face in restored]
+
+
+def run_in_batches(crops, batch_size, run_batch, trace=None):
+    """
+    Aplica run_batch a los recortes por lotes de batch_size.
+
+    Si un lote falla con RuntimeError (p. ej. sin memoria para el lote
+    entero) se reintenta cara a cara. Una cara que falla sola se deja sin
+    restaurar y se anota en trace.attributes['face_failures'] (índices y
+    error); sin trace, el error se relanza.
+
+    Returns:
+        Lista de resultados (o del recorte original si falló), en el orden de crops
+    """
+    failed = []
+    error = None
+
+    def run_single(index, crop):
+        nonlocal error
+        try:
+            return run_batch([crop])[0]
+        except RuntimeError as e:
+            if trace is None:
+                raise
+            error = e
+            failed.append(index)
+            return crop
+
+    batch_size = max(1, batch_size)
+    results = []
+    for start in range(0, len(crops), batch_size):
+        batch = crops[start:start + batch_size]
+        if len(batch) > 1:
+            try:
+                results.extend(run_batch(batch))
+                continue
+            except RuntimeError:
+                pass  # se reintenta cara a cara
+        results.extend(run_single(start + offset, crop) for offset, crop in enumerate(batch))
+    if failed:
+        trace.attributes['face_failures'] = {
+            'indices': failed,
+            'error': f"{type(error).__name__}: {error}",
+        }
+    return results
+
+
+def upsample_background(bg_upsampler, image_bgr, upscale):
+    """Reescala el fondo con RealESRGAN (None si no hay upsampler)."""
+    if bg_upsampler is None:
+        return None
+    return bg_upsampler.enhance(image_bgr, outscale=upscale)[0]
+
+
+def paste_preview(restorer, helper, restored_faces, image_bgr, max_side=None):
+    """
+    Vista previa rápida: caras restauradas sobre una copia reducida del
+    original, sin fondo mejorado ni escalado.
+
+    Reutiliza la detección, el alineado y las caras ya restauradas de
+    helper; solo repite el pegado, a baja resolución.
+
+    Args:
+        restorer: GFPGANer (para crear un helper nuevo)
+        helper: FaceRestoreHelper ya alineado sobre image_bgr
+        restored_faces: Caras restauradas de helper
+        image_bgr: Imagen de entrada
+        max_side: Lado largo de la vista previa (CONFIG['progressive_preview_side'])
+
+    Returns:
+        Vista previa en BGR
+    """
+    max_side = max_side or CONFIG['progressive_preview_side']
+    height, width = image_bgr.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    small = image_bgr
+    if scale < 1:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        small = cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA)
+
+    preview = new_face_helper(restorer)
+    # Sin read_image: facexlib agranda las imágenes pequeñas al leerlas
+    preview.input_img = small
+    preview.upscale_factor = 1
+    # Las matrices de alineado van de helper.input_img al recorte
+    factor = small.shape[1] / helper.input_img.shape[1]
+    for matrix in helper.affine_matrices:
+        matrix = matrix.copy()
+        matrix[:, :2] /= factor
+        preview.affine_matrices.append(matrix)
+    return paste_back(preview, restored_faces, None)
+
+
+def paste_back(helper, restored_faces, bg_img):
+    """
+    Pega las caras restauradas sobre el fondo.
+
+    Args:
+        helper: FaceRestoreHelper usado en la detección y el alineado
+        restored_faces: Caras restauradas, en el mismo orden que los recortes
+        bg_img: Fondo ya reescalado o None (se reescala con interpolación)
+
+    Returns:
+        Imagen final en BGR
+    """
+    for face in restored_faces:
+        helper.add_restored_face(face)
+    helper.get_inverse_affine(None)
+    return helper.paste_faces_to_input_image(upsample_img=bg_img)
@@ -0,0 +1,115 @@
+"""
+Previsualizaciones del comparador a resolución de pantalla.
+
+El comparador se vuelve a ejecutar con cada movimiento del slider, así que
+todo lo que depende solo del resultado (redimensionar la restaurada al
+tamaño del original y reducir ambas a resolución de pantalla) se calcula
+una vez por resultado en build_preview_pyramid. Después, compose_preview
+solo copia y recorta arrays pequeños.
+"""
+
+import numpy as np
+from PIL import Image
+
+from config import CONFIG
+
+
+class PreviewPyramid:
+    """Pares original/restaurada (arrays RGB) a varias anchuras."""
+
+    def __init__(self, levels):
+        """
+        Args:
+            levels: Lista de tuplas (original, restaurada) de mayor a menor
+        """
+        self.levels = levels
+
+    @property
+    def width(self):
+        return self.levels[0][0].shape[1]
+
+    def level(self, width=None):
+        """
+        Nivel más pequeño que cubre la anchura pedida.
+
+        Args:
+            width: Anchura de visualización en píxeles (None = la mayor)
+
+        Returns:
+            tuple: (original, restaurada) como arrays RGB del mismo tamaño
+        """
+        if width is None:
+            return self.levels[0]
+        for original, restored in reversed(self.levels):
+            if original.shape[1] >= width:
+                return original, restored
+        return self.levels[0]
+
+    def nbytes(self):
+        return sum(o.nbytes + r.nbytes for o, r in self.levels)
+
+
+def _fit_size(size, max_width):
+    """Tamaño que cabe en max_width conservando la proporción."""
+    width, height = size
+    if width <= max_width:
+        return width, height
+    return max_width, max(1, round(height * max_width / width))
+
+
+def build_preview_pyramid(original_image, restored_image, max_width=None, levels=None):
+    """
+    Calcula las previsualizaciones del comparador para un resultado.
+
+    La restaurada se reduce directamente al tamaño de pantalla (un único
+    LANCZOS, con reducción entera previa, desde la resolución completa) y
+    los niveles inferiores se obtienen dividiendo a la mitad el anterior.
+
+    Args:
+        original_image: Imagen original (PIL Image)
+        restored_image: Imagen restaurada (PIL Image)
+        max_width: Anchura del nivel mayor (por defecto CONFIG['preview_max_width'])
+        levels: Número de niveles (por defecto CONFIG['preview_levels'])
+
+    Returns:
+        PreviewPyramid
+    """
+    max_width = max_width or CONFIG['preview_max_width']
+    levels = levels or CONFIG['preview_levels']
+
+    size = _fit_size(original_image.size, max_width)
+    original, restored = (
+        image if image.size == size else image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        for image in (original_image, restored_image)
+    )
+
+    pyramid = [(np.asarray(original.convert('RGB')), np.asarray(restored.convert('RGB')))]
+    for _ in range(levels - 1):
+        if original.width < 2 * 64:
+            break
+        original, restored = original.reduce(2), restored.reduce(2)
+        pyramid.append((np.asarray(original), np.asarray(restored)))
+    return PreviewPyramid(pyramid)
+
+
+def compose_preview(pyramid, slider_value, width=None, line_width=3):
+    """
+    Compone la vista dividida a partir de las previsualizaciones.
+
+    Args:
+        pyramid: PreviewPyramid del resultado
+        slider_value: Posición de la división (0 a 100)
+        width: Anchura de visualización deseada
+        line_width: Grosor de la línea divisoria
+
+    Returns:
+        numpy array RGB con la composición
+    """
+    original, restored = pyramid.level(width)
+    split_pos = int(original.shape[1] * slider_value / 100)
+
+    combined = restored.copy()
+    combined[:, :split_pos] = original[:, :split_pos]
+    half = line_width // 2
+    combined[:, max(0, split_pos - half):split_pos + line_width - half] = 255
+    return combined
@@ -0,0 +1,167 @@
+"""
+Registro de modelos con presupuesto de memoria.
+
+Cada red se carga una sola vez por proceso y se comparte entre todos los
+modos de mejora. Si la memoria residente de los modelos supera el
+presupuesto, se descargan los usados hace más tiempo (LRU).
+"""
+
+import threading
+from collections import OrderedDict
+
+from config import CONFIG
+
+
+def _find_modules(obj, depth=2, seen=None):
+    """Busca módulos de torch dentro de un objeto (y sus atributos)."""
+    import torch
+
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return []
+    seen.add(id(obj))
+
+    if isinstance(obj, torch.nn.Module):
+        return [obj]
+    if depth == 0 or not hasattr(obj, '__dict__'):
+        return []
+
+    modules = []
+    for value in vars(obj).values():
+        modules.extend(_find_modules(value, depth - 1, seen))
+    return modules
+
+
+def model_memory_bytes(model):
+    """
+    Estima la memoria residente de un modelo.
+
+    Suma parámetros y buffers de todos los módulos de torch que contiene,
+    contando una sola vez los tensores que comparten almacenamiento.
+
+    Args:
+        model: Objeto que envuelve una o varias redes (GFPGANer, etc.)
+
+    Returns:
+        Bytes ocupados por los tensores del modelo
+    """
+    total = 0
+    storages = set()
+    for module in _find_modules(model):
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            ptr = tensor.data_ptr()
+            if ptr in storages:
+                continue
+            storages.add(ptr)
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _close_all(models):
+    """Libera los recursos propios de los modelos que los tienen (pools de hilos)."""
+    for model in models:
+        close = getattr(model, 'close', None)
+        if close is not None:
+            close()
+
+
+class ModelRegistry:
+    """Carga perezosa, compartida y con expulsión LRU de modelos."""
+
+    def __init__(self, loaders, budget_bytes=None):
+        """
+        Args:
+            loaders: dict nombre -> función sin argumentos que construye el modelo
+            budget_bytes: Presupuesto de memoria (por defecto
+                CONFIG['model_memory_budget_mb'])
+        """
+        self.loaders = dict(loaders)
+        if budget_bytes is None:
+            budget_bytes = CONFIG['model_memory_budget_mb'] * 1024 * 1024
+        self.budget_bytes = budget_bytes
+        self.loads = 0
+        self.evictions = 0
+        self._models = OrderedDict()  # nombre -> (modelo, bytes), LRU primero
+        self._lock = threading.RLock()
+        self._loading = {}  # nombre -> Lock, para no cargar dos veces en paralelo
+
+    def is_loaded(self, name):
+        """Indica si un modelo está ya en memoria."""
+        with self._lock:
+            return name in self._models
+
+    def get(self, name):
+        """
+        Devuelve un modelo, cargándolo si hace falta.
+
+        Args:
+            name: Nombre registrado del modelo
+
+        Returns:
+            El modelo construido por su loader
+        """
+        with self._lock:
+            if name not in self.loaders:
+                raise KeyError(f"Modelo desconocido: {name}")
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name][0]
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        # La carga puede tardar: se hace fuera del lock general
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name][0]
+
+            model = self.loaders[name]()
+            size = model_memory_bytes(model)
+
+            with self._lock:
+                self._models[name] = (model, size)
+                self.loads += 1
+                evicted = self._evict(keep=name)
+            _close_all(evicted)
+        return model
+
+    def _evict(self, keep):
+        """
+        Expulsa modelos LRU hasta respetar el presupuesto.
+
+        Returns:
+            Modelos expulsados, para cerrarlos fuera del lock
+        """
+        evicted = []
+        for name in list(self._models):
+            if self.resident_bytes() <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+            evicted.append(self._models.pop(name)[0])
+            self.evictions += 1
+        return evicted
+
+    def unload(self, name):
+        """Descarga un modelo de la memoria del registro."""
+        with self._lock:
+            entry = self._models.pop(name, None)
+        if entry is not None:
+            _close_all([entry[0]])
+
+    def resident_bytes(self):
+        """Memoria total estimada de los modelos cargados."""
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def stats(self):
+        """Devuelve el uso de memoria por modelo y los contadores."""
+        with self._lock:
+            return {
+                'models': {name: size for name, (_, size) in self._models.items()},
+                'resident_bytes': self.resident_bytes(),
+                'budget_bytes': self.budget_bytes,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
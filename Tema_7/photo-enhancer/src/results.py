@@ -0,0 +1,229 @@
+"""
+Resultados de las sesiones de la app, compactos y con expulsión.
+
+La sesión de Streamlit solo guarda el id de su resultado. Los datos viven
+aquí, compartidos por todas las sesiones del proceso y codificados:
+  - la subida original, tal cual llegó (bytes del fichero),
+  - la imagen restaurada en el formato en que la entrega el servicio
+    (PNG por defecto, que es además la descarga por defecto).
+Las imágenes se decodifican solo cuando hacen falta: las previsualizaciones
+del comparador se calculan una vez por resultado (a resolución de
+pantalla) y se guardan junto a él, contando en el mismo presupuesto.
+
+Con un techo global de memoria (CONFIG['result_store_max_mb']) se expulsan
+los resultados usados hace más tiempo, y los de sesiones que llevan más de
+CONFIG['result_store_idle_s'] segundos sin consultarlos se expulsan aunque
+haya sitio. stats() da el uso actual para dimensionar réplicas.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+from src.downloads import encode_image
+from src.ingest import decode_pil
+from src.preview import build_preview_pyramid
+from src.utils import bgr_to_pil
+
+
+class StoredResult:
+    """Un resultado codificado y las sesiones que lo están viendo."""
+
+    def __init__(self, result_id, original_bytes, restored_bytes, fmt):
+        self.id = result_id
+        self.original_bytes = original_bytes
+        self.restored_bytes = restored_bytes
+        self.format = fmt
+        self.preview = None
+        self.sessions = set()
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+
+    @property
+    def nbytes(self):
+        size = len(self.original_bytes) + len(self.restored_bytes)
+        if self.preview is not None:
+            size += self.preview.nbytes()
+        return size
+
+
+class ResultStore:
+    """Resultados por id, con techo de memoria y expulsión por inactividad."""
+
+    def __init__(self, max_bytes=None, idle_s=None):
+        """
+        Args:
+            max_bytes: Techo de memoria (CONFIG['result_store_max_mb'])
+            idle_s: Segundos sin acceso tras los que se expulsa un resultado
+                (CONFIG['result_store_idle_s'])
+        """
+        if max_bytes is None:
+            max_bytes = CONFIG['result_store_max_mb'] * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.idle_s = idle_s or CONFIG['result_store_idle_s']
+        self.evictions = 0
+        self.idle_evictions = 0
+        self._entries = OrderedDict()  # id -> StoredResult, del menos al más reciente
+        self._sessions = {}            # sesión -> id de su resultado
+        self._lock = threading.Lock()
+
+    def put(self, session_id, result_id, original_bytes, restored_bytes, fmt='png'):
+        """
+        Guarda el resultado de una sesión (sustituye al que tuviera).
+
+        Args:
+            session_id: Identificador de la sesión
+            result_id: Identificador del resultado (el id del trabajo)
+            original_bytes: Fichero subido
+            restored_bytes: Imagen restaurada codificada en fmt
+            fmt: Formato de restored_bytes (ver src/downloads.FORMATS)
+        """
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                entry = StoredResult(result_id, original_bytes, restored_bytes, fmt)
+                self._entries[result_id] = entry
+            self._attach(session_id, entry)
+            self._evict(keep=result_id)
+        return entry
+
+    def _attach(self, session_id, entry):
+        """Asocia una sesión a un resultado (con el lock tomado)."""
+        previous = self._sessions.get(session_id)
+        if previous is not None and previous != entry.id:
+            self._detach(session_id, previous)
+        self._sessions[session_id] = entry.id
+        entry.sessions.add(session_id)
+        self._touch(entry)
+
+    def _detach(self, session_id, result_id):
+        entry = self._entries.get(result_id)
+        if entry is None:
+            return
+        entry.sessions.discard(session_id)
+        if not entry.sessions:
+            del self._entries[result_id]
+
+    def _touch(self, entry):
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(entry.id)
+
+    def _drop(self, result_id):
+        entry = self._entries.pop(result_id)
+        for session_id in entry.sessions:
+            if self._sessions.get(session_id) == result_id:
+                del self._sessions[session_id]
+
+    def _evict(self, keep=None):
+        """Expulsa lo inactivo y, después, lo menos reciente hasta caber."""
+        now = time.monotonic()
+        for result_id, entry in list(self._entries.items()):
+            if result_id != keep and now - entry.last_access > self.idle_s:
+                self._drop(result_id)
+                self.idle_evictions += 1
+        total = sum(entry.nbytes for entry in self._entries.values())
+        for result_id in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if result_id == keep:
+                continue
+            total -= self._entries[result_id].nbytes
+            self._drop(result_id)
+            self.evictions += 1
+
+    def get(self, result_id):
+        """StoredResult por id (None si se ha expulsado)."""
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                self._touch(entry)
+            return entry
+
+    def release(self, session_id):
+        """La sesión ya no necesita su resultado."""
+        with self._lock:
+            result_id = self._sessions.pop(session_id, None)
+            if result_id is not None:
+                self._detach(session_id, result_id)
+
+    def restored_bgr(self, result_id):
+        """Imagen restaurada (BGR), decodificada en el momento."""
+        entry = self.get(result_id)
+        if entry is None:
+            return None
+        return cv2.imdecode(np.frombuffer(entry.restored_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def preview(self, result_id):
+        """
+        PreviewPyramid del resultado, calculada la primera vez que se pide.
+
+        Returns:
+            PreviewPyramid o None si el resultado se ha expulsado
+        """
+        entry = self.get(result_id)
+        if entry is None:
+            return None
+        if entry.preview is None:
+            # El original se decodifica ya reducido; la restaurada (que
+            # puede superar el límite de píxeles de las subidas) con OpenCV
+            restored_bgr = self.restored_bgr(result_id)
+            if restored_bgr is None:
+                # Expulsado entre la consulta y la decodificación
+                return None
+            original = decode_pil(entry.original_bytes, CONFIG['preview_max_width'])[0]
+            pyramid = build_preview_pyramid(original, bgr_to_pil(restored_bgr))
+            with self._lock:
+                entry.preview = pyramid
+                self._evict(keep=result_id)
+        return entry.preview
+
+    def download(self, result_id, fmt, encoder=None):
+        """
+        Bytes de descarga de un resultado en un formato.
+
+        El formato guardado se entrega tal cual; los demás se codifican con
+        el DownloadEncoder (una vez por formato).
+
+        Returns:
+            Future con los bytes, o None si el resultado se ha expulsado
+        """
+        entry = self.get(result_id)
+        if entry is None:
+            return None
+        if fmt == entry.format:
+            future = Future()
+            future.set_result(entry.restored_bytes)
+            return future
+        if encoder is not None:
+            future = encoder.get(result_id, fmt)
+            if future is not None:
+                return future
+        image_bgr = self.restored_bgr(result_id)
+        if image_bgr is None:
+            return None
+        if encoder is not None:
+            return encoder.submit(result_id, image_bgr, fmt)
+        future = Future()
+        future.set_result(encode_image(image_bgr, fmt))
+        return future
+
+    def stats(self):
+        """Uso actual del almacén."""
+        with self._lock:
+            self._evict()
+            entries = list(self._entries.values())
+            return {
+                'entries': len(entries),
+                'sessions': len(self._sessions),
+                'bytes': sum(entry.nbytes for entry in entries),
+                'max_bytes': self.max_bytes,
+                'preview_bytes': sum(entry.preview.nbytes() for entry in entries
+                                     if entry.preview is not None),
+                'evictions': self.evictions,
+                'idle_evictions': self.idle_evictions,
+            }
@@ -0,0 +1,257 @@
+"""
+Reparación de grietas guiada por una máscara de daños.
+
+EraseScratches es caro y su coste depende del tamaño de la imagen, no de
+cuánto daño tenga. Aquí se calcula primero una máscara barata (top-hat y
+black-hat morfológicos, quedándose con los trazos finos y alargados), la
+imagen se divide en teselas y solo las zonas con daño pasan por la red.
+Cada zona reparada se funde con el original a través de la máscara
+difuminada, así que fuera de las grietas los píxeles no cambian.
+
+Si el daño cubre demasiada imagen, o la máscara no encuentra nada (la
+heurística puede no ver grietas que sí hay), se repara entera, como antes.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+def erase_bgr(eraser, image_bgr, trace=None):
+    """
+    Pasa una imagen BGR por EraseScratches (que trabaja con PIL en RGB).
+
+    Returns:
+        Imagen reparada en BGR, del mismo tamaño que la entrada
+    """
+    from src.utils import bgr_to_pil, rgb_to_bgr_inplace
+
+    restored = np.array(eraser.erase(bgr_to_pil(image_bgr, trace)), dtype=np.uint8)
+    if trace is not None:
+        trace.count_copy('scratches.to_bgr', restored.nbytes)
+    rgb_to_bgr_inplace(restored)
+    height, width = image_bgr.shape[:2]
+    if restored.shape[:2] != (height, width):
+        restored = cv2.resize(restored, (width, height), interpolation=cv2.INTER_LINEAR)
+    return restored
+
+
+def damage_mask(image_bgr, max_side=None, kernel=None, threshold=None, min_length=None):
+    """
+    Máscara aproximada de grietas y arañazos.
+
+    Args:
+        image_bgr: Imagen en BGR
+        max_side: Lado máximo al que se reduce la imagen para calcularla
+            (CONFIG['scratch_mask_max_side'])
+        kernel: Tamaño del elemento estructurante (CONFIG['scratch_kernel'])
+        threshold: Contraste mínimo de un trazo (CONFIG['scratch_threshold'])
+        min_length: Longitud mínima de un trazo en píxeles de la imagen
+            reducida (CONFIG['scratch_min_length'])
+
+    Returns:
+        Máscara uint8 (0/255) del tamaño de la imagen
+    """
+    max_side = max_side or CONFIG['scratch_mask_max_side']
+    kernel = kernel or CONFIG['scratch_kernel']
+    threshold = threshold or CONFIG['scratch_threshold']
+    min_length = min_length or CONFIG['scratch_min_length']
+
+    height, width = image_bgr.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    element = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel, kernel))
+    response = np.maximum(cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, element),
+                          cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, element))
+    _, mask = cv2.threshold(response, threshold, 255, cv2.THRESH_BINARY)
+
+    # Solo trazos finos y alargados: longitud / grosor medio
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    length = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+    thickness = stats[:, cv2.CC_STAT_AREA] / np.maximum(length, 1)
+    keep = (length >= min_length) & (length >= 4 * thickness)
+    keep[0] = False
+    mask = np.where(keep[labels], 255, 0).astype(np.uint8)
+
+    mask = cv2.dilate(mask, np.ones((3, 3), np.uint8))
+    if scale < 1:
+        mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+    return mask
+
+
+def damage_regions(mask, tile=None, pad=None, min_pixels=None):
+    """
+    Rectángulos que cubren las teselas con daño.
+
+    Las teselas dañadas contiguas se agrupan en un solo rectángulo para
+    que la red vea el contexto de cada grieta entera.
+
+    Args:
+        mask: Máscara de daños
+        tile: Lado de tesela (CONFIG['scratch_tile'])
+        pad: Margen añadido a cada rectángulo (CONFIG['scratch_pad'])
+        min_pixels: Píxeles dañados para considerar una tesela dañada
+
+    Returns:
+        Lista de (y0, y1, x0, x1)
+    """
+    tile = tile or CONFIG['scratch_tile']
+    pad = CONFIG['scratch_pad'] if pad is None else pad
+    min_pixels = min_pixels or CONFIG['scratch_tile_min_pixels']
+    height, width = mask.shape[:2]
+    rows, cols = -(-height // tile), -(-width // tile)
+
+    # Píxeles dañados por tesela (con relleno hasta múltiplo de tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=np.uint32)
+    padded[:height, :width] = mask > 0
+    counts = padded.reshape(rows, tile, cols, tile).sum(axis=(1, 3))
+    damaged = (counts >= min_pixels).astype(np.uint8)
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(damaged, connectivity=8)
+    regions = []
+    for x, y, w, h, _ in stats[1:count]:
+        regions.append((max(0, y * tile - pad), min(height, (y + h) * tile + pad),
+                        max(0, x * tile - pad), min(width, (x + w) * tile + pad)))
+    return regions
+
+
+def repair_masked(eraser, image_bgr, mask, trace=None, feather=None, max_damage=None):
+    """
+    Repara solo las zonas con daño y las funde con el original.
+
+    Args:
+        eraser: EraseScratches
+        image_bgr: Imagen en BGR
+        mask: Máscara de damage_mask
+        trace: Trace opcional
+        feather: Sigma del difuminado de la máscara (CONFIG['scratch_feather'])
+        max_damage: Fracción de imagen a reparar a partir de la cual se
+            repara entera (CONFIG['scratch_full_ratio'])
+
+    Returns:
+        tuple: (imagen reparada en BGR, dict con las decisiones; mode es
+        'masked' o 'full', y reason explica por qué se reparó entera)
+    """
+    feather = feather or CONFIG['scratch_feather']
+    max_damage = max_damage or CONFIG['scratch_full_ratio']
+    height, width = image_bgr.shape[:2]
+
+    regions = damage_regions(mask)
+    area = sum((y1 - y0) * (x1 - x0) for y0, y1, x0, x1 in regions)
+    info = {
+        'damage_ratio': round(float(np.count_nonzero(mask)) / mask.size, 5),
+        'regions': len(regions),
+        'repaired_ratio': round(float(area) / (height * width), 4),
+    }
+    if not regions or area >= max_damage * height * width:
+        # Sin zonas: se ha pedido reparar, así que se repara entera
+        info['mode'] = 'full'
+        info['reason'] = 'empty_mask' if not regions else 'damage_ratio'
+        return erase_bgr(eraser, image_bgr, trace), info
+
+    info['mode'] = 'masked'
+    output = np.array(image_bgr)
+    if trace is not None:
+        trace.count_copy('scratches.output', output.nbytes)
+    for y0, y1, x0, x1 in regions:
+        crop = image_bgr[y0:y1, x0:x1]
+        repaired = erase_bgr(eraser, np.ascontiguousarray(crop), trace)
+        alpha = cv2.dilate(mask[y0:y1, x0:x1], np.ones((5, 5), np.uint8))
+        alpha = cv2.GaussianBlur(alpha.astype(np.float32) / 255.0, (0, 0), feather)[..., None]
+        blended = alpha * repaired + (1 - alpha) * crop
+        output[y0:y1, x0:x1] = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+    return output, info
+
+
+def mask_overlay(image_bgr, mask, color=(0, 0, 255), opacity=0.6):
+    """Imagen BGR con la máscara de daños resaltada, para la UI."""
+    overlay = image_bgr.copy()
+    damaged = mask > 0
+    overlay[damaged] = (overlay[damaged] * (1 - opacity) + np.array(color) * opacity).astype(np.uint8)
+    return overlay
+
+
+def damage_preview(image_bgr, mask, width):
+    """
+    Máscara resaltada a resolución de pantalla, para la UI.
+
+    Args:
+        image_bgr: Imagen en BGR
+        mask: Máscara de damage_mask
+        width: Ancho máximo de la vista previa
+
+    Returns:
+        tuple: (imagen BGR reducida con la máscara resaltada, fracción dañada)
+    """
+    damaged = np.count_nonzero(mask) / mask.size
+    height, original_width = image_bgr.shape[:2]
+    if original_width > width:
+        size = (width, max(1, round(height * width / original_width)))
+        image_bgr = cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA)
+        mask = cv2.resize(mask, size, interpolation=cv2.INTER_AREA)
+    return mask_overlay(image_bgr, mask), damaged
+
+
+# Ajustes de los que depende damage_mask
+_MASK_KEYS = ('scratch_mask_max_side', 'scratch_kernel', 'scratch_threshold',
+              'scratch_min_length')
+
+
+class MaskCache:
+    """
+    Máscaras de daños ya calculadas, por contenido de la imagen y ajustes
+    del detector (LRU, con techo de entradas y de bytes).
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        Args:
+            max_entries: Máscaras que se conservan (CONFIG['scratch_mask_cache_entries'])
+            max_bytes: Techo de memoria (CONFIG['scratch_mask_cache_mb'])
+        """
+        self.max_entries = max_entries or CONFIG['scratch_mask_cache_entries']
+        if max_bytes is None:
+            max_bytes = CONFIG['scratch_mask_cache_mb'] * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image_bgr):
+        digest = hashlib.sha256()
+        digest.update(str(image_bgr.shape).encode())
+        digest.update(repr([CONFIG[name] for name in _MASK_KEYS]).encode())
+        digest.update(np.ascontiguousarray(image_bgr).data)
+        return digest.hexdigest()
+
+    def get(self, image_bgr):
+        """Máscara de la imagen, calculándola solo si no está en la caché."""
+        key = self.key(image_bgr)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        mask = damage_mask(image_bgr)
+        if mask.nbytes > self.max_bytes:
+            return mask
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = mask
+                self._bytes += mask.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1].nbytes
+        return mask
+
+
+# Compartida por la UI y los trabajos del mismo proceso
+mask_cache = MaskCache()
@@ -0,0 +1,229 @@
+"""
+Mejora selectiva: solo algunas caras y las zonas de interés.
+
+En una foto de grupo el coste crece con cada cara (todas se restauran a
+512x512) y, con "Mejorar fondo", con los megapíxeles de todo el fotograma.
+Una selección indica qué caras importan:
+  - faces: índices de las caras detectadas (en el orden de la detección,
+    que se guarda en la traza),
+  - boxes: cajas [x1, y1, x2, y2] en píxeles de la imagen de entrada; se
+    eligen las caras cuyo centro cae dentro y la caja es también zona de
+    interés para el fondo,
+  - largest: las N caras más grandes.
+Los criterios se suman. Solo se restauran las caras elegidas y el fondo se
+mejora solo dentro de sus cajas (más un margen); el resto se escala con
+interpolación, como sin "Mejorar fondo".
+"""
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+class SelectionError(ValueError):
+    """Selección mal formada."""
+
+
+def normalize_selection(selection):
+    """
+    Valida una selección y la deja en forma canónica (para la clave de caché).
+
+    Args:
+        selection: dict con faces, boxes, largest y/o margin (o None)
+
+    Returns:
+        dict canónico, o None si no selecciona nada (se mejora todo)
+
+    Raises:
+        SelectionError: Si algún valor no es válido
+    """
+    if not selection:
+        return None
+    unknown = set(selection) - {'faces', 'boxes', 'largest', 'margin'}
+    if unknown:
+        raise SelectionError(f"Opciones de selección desconocidas: {', '.join(sorted(unknown))}")
+    try:
+        faces = sorted({int(index) for index in selection.get('faces') or ()})
+        boxes = [[int(round(float(v))) for v in box] for box in selection.get('boxes') or ()]
+        largest = int(selection.get('largest') or 0)
+        margin = selection.get('margin')
+        margin = CONFIG['selection_margin'] if margin is None else float(margin)
+    except (TypeError, ValueError) as e:
+        raise SelectionError(f"Selección no válida: {e}")
+    if any(index < 0 for index in faces) or largest < 0 or margin < 0:
+        raise SelectionError("Índices, número de caras y margen no pueden ser negativos")
+    for box in boxes:
+        if len(box) != 4 or box[2] <= box[0] or box[3] <= box[1]:
+            raise SelectionError(f"Caja no válida (se espera x1,y1,x2,y2): {box}")
+    if not (faces or boxes or largest):
+        return None
+    return {'faces': faces, 'boxes': boxes, 'largest': largest, 'margin': round(margin, 4)}
+
+
+def parse_selection(faces=None, boxes=None, largest=None, margin=None):
+    """
+    Selección a partir de texto (query string o línea de comandos).
+
+    Args:
+        faces: "0,2"
+        boxes: "x1,y1,x2,y2;x1,y1,x2,y2"
+        largest: "1"
+        margin: "0.25"
+
+    Raises:
+        SelectionError: Si algún valor no es válido
+    """
+    selection = {}
+    try:
+        if faces:
+            selection['faces'] = [int(v) for v in faces.split(',') if v.strip()]
+        if boxes:
+            selection['boxes'] = [[float(v) for v in box.split(',')]
+                                  for box in boxes.split(';') if box.strip()]
+        if largest:
+            selection['largest'] = int(largest)
+        if margin:
+            selection['margin'] = float(margin)
+    except ValueError as e:
+        raise SelectionError(f"Selección no válida: {e}")
+    return normalize_selection(selection)
+
+
+def selection_params(selection):
+    """Parámetros de query string de una selección (inverso de parse_selection)."""
+    selection = normalize_selection(selection)
+    if selection is None:
+        return {}
+    params = {'margin': selection['margin']}
+    if selection['faces']:
+        params['faces'] = ",".join(str(index) for index in selection['faces'])
+    if selection['boxes']:
+        params['boxes'] = ";".join(",".join(str(v) for v in box) for box in selection['boxes'])
+    if selection['largest']:
+        params['largest'] = selection['largest']
+    return params
+
+
+def select_faces(face_boxes, selection):
+    """
+    Índices de las caras elegidas.
+
+    Args:
+        face_boxes: Cajas [x1, y1, x2, y2] de las caras detectadas, en
+            píxeles de la imagen de entrada
+        selection: Selección normalizada
+
+    Returns:
+        Lista ordenada de índices de face_boxes
+    """
+    chosen = {index for index in selection['faces'] if index < len(face_boxes)}
+    for index, (x1, y1, x2, y2) in enumerate(face_boxes):
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        if any(bx1 <= cx <= bx2 and by1 <= cy <= by2 for bx1, by1, bx2, by2 in selection['boxes']):
+            chosen.add(index)
+    by_area = sorted(range(len(face_boxes)),
+                     key=lambda i: (face_boxes[i][2] - face_boxes[i][0]) *
+                                   (face_boxes[i][3] - face_boxes[i][1]),
+                     reverse=True)
+    chosen.update(by_area[:selection['largest']])
+    return sorted(chosen)
+
+
+def expand_box(box, margin, width, height):
+    """Caja ampliada en margin veces su tamaño y recortada a la imagen."""
+    x1, y1, x2, y2 = box
+    dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+    return [max(0, int(x1 - dx)), max(0, int(y1 - dy)),
+            min(width, int(x2 + dx + 0.5)), min(height, int(y2 + dy + 0.5))]
+
+
+def merge_boxes(boxes):
+    """Une las cajas que se solapan hasta que ninguna se solapa con otra."""
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def regions_of_interest(face_boxes, selection, width, height):
+    """
+    Zonas donde se mejora el fondo: las caras elegidas y las cajas de la
+    selección, ampliadas con el margen y unidas si se solapan.
+
+    Returns:
+        Lista de cajas [x1, y1, x2, y2] en píxeles de la imagen de entrada
+    """
+    boxes = [expand_box(box, selection['margin'], width, height)
+             for box in list(face_boxes) + selection['boxes']]
+    return merge_boxes([box for box in boxes if box[2] > box[0] and box[3] > box[1]])
+
+
+def _feather(length, start, end, fade_start, fade_end):
+    """
+    Pesos 1D de un recorte: 1 en [start, end) y rampa lineal hasta 0 en
+    los bordes del recorte que tienen imagen al otro lado.
+    """
+    weights = np.ones(length, dtype=np.float32)
+    if fade_start and start > 0:
+        weights[:start] = (np.arange(start, dtype=np.float32) + 0.5) / start
+    if fade_end and end < length:
+        weights[end:] = ((np.arange(length - end, dtype=np.float32) + 0.5) / (length - end))[::-1]
+    return weights
+
+
+def upsample_regions(bg_upsampler, image_bgr, outscale, regions, context=None):
+    """
+    Escala la imagen con interpolación y mejora con el upsampler solo las
+    zonas de interés.
+
+    Cada zona se procesa con un borde de contexto. Dentro de la zona se usa
+    la salida del upsampler; en la franja de contexto se funde linealmente
+    con la interpolación, para que el paso de una a otra no deje costura.
+
+    Args:
+        bg_upsampler: RealESRGANer
+        image_bgr: Imagen (o copia de trabajo) a escalar
+        outscale: Escala de salida
+        regions: Cajas [x1, y1, x2, y2] en píxeles de image_bgr
+        context: Píxeles de contexto alrededor de cada zona, que son también
+            el ancho del fundido (CONFIG['selection_context_px'])
+
+    Returns:
+        Imagen escalada en BGR
+    """
+    context = CONFIG['selection_context_px'] if context is None else context
+    height, width = image_bgr.shape[:2]
+    out_w, out_h = int(width * outscale), int(height * outscale)
+    output = cv2.resize(image_bgr, (out_w, out_h), interpolation=cv2.INTER_LINEAR)
+    for x1, y1, x2, y2 in regions:
+        cx1, cy1 = max(0, x1 - context), max(0, y1 - context)
+        cx2, cy2 = min(width, x2 + context), min(height, y2 + context)
+        enhanced = bg_upsampler.enhance(image_bgr[cy1:cy2, cx1:cx2], outscale=outscale)[0]
+        # Recorte con contexto en la salida
+        ox1, oy1 = int(cx1 * outscale), int(cy1 * outscale)
+        ox2, oy2 = min(out_w, int(cx2 * outscale)), min(out_h, int(cy2 * outscale))
+        patch = enhanced[:oy2 - oy1, :ox2 - ox1]
+        if patch.shape[:2] != (oy2 - oy1, ox2 - ox1):
+            patch = cv2.resize(enhanced, (ox2 - ox1, oy2 - oy1), interpolation=cv2.INTER_LINEAR)
+        # Fundido en la franja de contexto; no hacia los bordes de la imagen
+        wy = _feather(oy2 - oy1, int(y1 * outscale) - oy1, min(out_h, int(y2 * outscale)) - oy1,
+                      cy1 > 0, cy2 < height)
+        wx = _feather(ox2 - ox1, int(x1 * outscale) - ox1, min(out_w, int(x2 * outscale)) - ox1,
+                      cx1 > 0, cx2 < width)
+        alpha = (wy[:, None] * wx[None, :])[..., None]
+        base = output[oy1:oy2, ox1:ox2].astype(np.float32)
+        blended = base + (patch.astype(np.float32) - base) * alpha
+        output[oy1:oy2, ox1:ox2] = np.clip(np.rint(blended), 0, 255).astype(np.uint8)
+    return output
@@ -0,0 +1,596 @@
+"""
+Servicio HTTP local de mejora de imágenes y vídeos.
+
+Expone ImageEnhancer a otras herramientas (y a app.py, que es un cliente
+más, ver src/client.py) con la librería estándar: ThreadingHTTPServer,
+un hilo por conexión y un límite de conexiones simultáneas. Detrás hay un
+único ImageEnhancer con sus modelos precalentados y una JobQueue acotada.
+
+Rutas:
+    GET    /health                 Estado, cola, modelos y arranque
+    POST   /jobs?opciones          Encola una imagen (cuerpo: fichero de imagen)
+                                   (selección: faces=0,2 boxes=x1,y1,x2,y2;...
+                                   largest=N margin=0.25, ver src/selection.py)
+    POST   /videos?opciones        Encola un vídeo (cuerpo: fichero de vídeo)
+    GET    /jobs/<id>              Estado del trabajo
+    GET    /jobs/<id>/result       Resultado (?format=png|webp|jpeg|npy para imágenes)
+    GET    /jobs/<id>/preview      Vista previa rápida (?format=jpeg|png|webp, con progressive=1)
+    GET    /jobs/<id>/trace        Traza por etapas de una imagen
+    DELETE /jobs/<id>              Deja de esperar el trabajo: lo cancela si sigue en
+                                   curso o libera su resultado si ya terminó (si
+                                   nadie más lo espera)
+    POST   /enhance?opciones       Encola, espera y devuelve el resultado
+
+Dos peticiones idénticas (mismos bytes y opciones) mientras la primera
+sigue en curso comparten trabajo: la segunda recibe el mismo id.
+
+Errores: 400 entrada no válida, 404 trabajo desconocido, 409 resultado (o
+vista previa) aún no disponible, 411/413 cuerpo sin tamaño o demasiado grande, 429 cola
+llena (con Retry-After), 503 servicio precalentando o sin conexiones
+libres, 504 /enhance sin resultado en el tiempo máximo.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from config import CONFIG
+from src import startup
+from src.downloads import FORMATS, DownloadEncoder, encode_image
+from src.ingest import IngestError, PixelLimitError, decode_bgr
+from src.jobs import DONE, FAILED, JobQueue, QueueFullError
+from src.selection import SelectionError, parse_selection
+
+
+# Opciones booleanas admitidas en la query string
+IMAGE_OPTIONS = ('repair_scratches', 'enhance_background', 'progressive')
+VIDEO_OPTIONS = ('enhance_background',)
+
+
+class ServiceError(Exception):
+    """Error con su código HTTP."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_options(query, names):
+    """
+    Opciones booleanas de una query string ya parseada.
+
+    Raises:
+        ServiceError: Si el valor no es 0/1/true/false
+    """
+    options = {}
+    for name in names:
+        values = query.get(name)
+        if not values:
+            continue
+        value = values[-1].lower()
+        if value not in ('0', '1', 'true', 'false'):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Valor no válido para {name}: {value}")
+        options[name] = value in ('1', 'true')
+    return options
+
+
+def parse_selection_query(query):
+    """
+    Selección de caras y zonas de interés de una query string ya parseada.
+
+    Raises:
+        ServiceError: 400 si la selección no es válida
+    """
+    values = {name: query[name][-1] for name in ('faces', 'boxes', 'largest', 'margin')
+              if query.get(name)}
+    try:
+        return parse_selection(**values)
+    except SelectionError as e:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, str(e))
+
+
+def decode_image(data):
+    """
+    Decodifica un fichero de imagen directamente a BGR (ver src/ingest.py).
+
+    Raises:
+        ServiceError: 400 si los bytes no son una imagen, 413 si supera el
+            límite de píxeles
+    """
+    try:
+        return decode_bgr(data)[0]
+    except PixelLimitError as e:
+        raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, str(e))
+    except IngestError as e:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, str(e))
+
+
+class EnhanceService:
+    """Trabajos del servicio, independiente del transporte HTTP."""
+
+    def __init__(self, enhancer, workers=None, max_pending=None, require_warm=None):
+        """
+        Args:
+            enhancer: ImageEnhancer (headless) con los modelos del servicio
+            workers: Hilos de la cola (CONFIG['job_workers'])
+            max_pending: Trabajos en espera (CONFIG['job_max_pending'])
+            require_warm: Responder 503 mientras se precalientan los modelos
+                (CONFIG['service_require_warm'])
+        """
+        self.enhancer = enhancer
+        self.encoder = DownloadEncoder()
+        self.queue = JobQueue(enhancer, workers=workers, max_pending=max_pending,
+                              on_done=self._on_done, on_evict=self._on_evict)
+        self.require_warm = (CONFIG['service_require_warm']
+                             if require_warm is None else require_warm)
+        self.coalesced = 0
+        self._inflight = {}  # clave de la petición -> id del trabajo
+        self._waiters = {}   # id del trabajo -> clientes que lo esperan
+        self._videos = {}    # id del trabajo -> (directorio, vídeo de salida)
+        self._lock = threading.Lock()
+
+    def _on_done(self, job):
+        if job.trace is not None:
+            self.encoder.prefetch(job.id, job.result)
+
+    def _on_evict(self, job):
+        """La cola ha olvidado un trabajo: se borra todo lo que queda de él."""
+        with self._lock:
+            self._waiters.pop(job.id, None)
+            video = self._videos.pop(job.id, None)
+        self.encoder.forget(job.id)
+        if video is not None:
+            shutil.rmtree(video[0], ignore_errors=True)
+
+    def _check_ready(self):
+        if self.require_warm and startup.report.warmup_state == 'running':
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE,
+                               "Los modelos se están cargando",
+                               retry_after=CONFIG['service_retry_after_s'])
+
+    def _sweep(self):
+        """Olvida las claves de trabajos ya terminados (con el lock tomado)."""
+        for key, job_id in list(self._inflight.items()):
+            job = self.queue.get(job_id)
+            if job is None or job.finished:
+                del self._inflight[key]
+
+    def _submit(self, key, submit):
+        """
+        Encola un trabajo, o devuelve el que ya está en curso con la misma clave.
+
+        Returns:
+            tuple: (Job, True si se ha unido a uno existente)
+        """
+        self._check_ready()
+        with self._lock:
+            self._sweep()
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+                self.coalesced += 1
+                return self.queue.get(job_id), True
+            try:
+                job = submit()
+            except QueueFullError as e:
+                raise ServiceError(HTTPStatus.TOO_MANY_REQUESTS, str(e),
+                                   retry_after=CONFIG['service_retry_after_s'])
+            self._inflight[key] = job.id
+            self._waiters[job.id] = 1
+            return job, False
+
+    @staticmethod
+    def _key(kind, data, options):
+        digest = hashlib.sha256()
+        digest.update(json.dumps([kind, options], sort_keys=True).encode('utf-8'))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def submit_image(self, data, **options):
+        """
+        Encola la mejora de un fichero de imagen.
+
+        Returns:
+            tuple: (Job, True si se ha unido a uno existente)
+        """
+        key = self._key('image', data, options)
+        with self._lock:
+            job_id = self._inflight.get(key)
+        # Se decodifica fuera del lock (salvo si ya hay un trabajo igual)
+        image_bgr = decode_image(data) if job_id is None else None
+
+        def submit():
+            return self.queue.submit(image_bgr if image_bgr is not None else decode_image(data),
+                                     **options)
+        return self._submit(key, submit)
+
+    def submit_video(self, data, filename="video.mp4", **options):
+        """
+        Encola la mejora de un fichero de vídeo (se guarda en disco).
+
+        Returns:
+            tuple: (Job, True si se ha unido a uno existente)
+        """
+        from src.video import VideoEnhancer
+
+        key = self._key('video', data, options)
+        self._check_ready()
+        # El vídeo se escribe fuera del lock: puede tardar
+        work_dir = tempfile.mkdtemp(prefix="video_")
+        source = os.path.join(work_dir, os.path.basename(filename) or "video.mp4")
+        output = os.path.join(work_dir, "video_mejorado.mp4")
+        with open(source, 'wb') as f:
+            f.write(data)
+
+        def submit():
+            job = self.queue.submit_call(VideoEnhancer(self.enhancer).process,
+                                         source, output, **options)
+            self._videos[job.id] = (work_dir, output)
+            return job
+        try:
+            job, coalesced = self._submit(key, submit)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        if coalesced:
+            # Se ha unido a un trabajo igual: su copia no hace falta
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return job, coalesced
+
+    def get(self, job_id):
+        """
+        Raises:
+            ServiceError: 404 si el trabajo no existe (o ya se olvidó)
+        """
+        job = self.queue.get(job_id)
+        if job is None:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"Trabajo desconocido: {job_id}")
+        return job
+
+    def status(self, job_id):
+        """Estado serializable de un trabajo."""
+        job = self.get(job_id)
+        status = job.to_dict()
+        status['position'] = self.queue.position(job_id)
+        status['kind'] = 'video' if job_id in self._videos else 'image'
+        if status['kind'] == 'video' and job.status == DONE:
+            status['report'] = job.result
+        return status
+
+    def wait(self, job_id, timeout=None):
+        """
+        Espera a que termine un trabajo.
+
+        Raises:
+            ServiceError: 504 si no termina en timeout segundos
+        """
+        timeout = timeout or CONFIG['service_request_timeout_s']
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while not job.finished:
+            if time.monotonic() > deadline:
+                raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT,
+                                   f"El trabajo {job_id} sigue en curso")
+            time.sleep(CONFIG['service_poll_interval'])
+        return job
+
+    def _finished(self, job_id):
+        job = self.get(job_id)
+        if not job.finished:
+            raise ServiceError(HTTPStatus.CONFLICT, f"El trabajo {job_id} sigue en curso")
+        if job.status == FAILED:
+            raise ServiceError(HTTPStatus.INTERNAL_SERVER_ERROR, job.error)
+        if job.status != DONE:
+            raise ServiceError(HTTPStatus.GONE, f"El trabajo {job_id} se canceló")
+        return job
+
+    def result(self, job_id, fmt='png'):
+        """
+        Resultado de un trabajo terminado.
+
+        Returns:
+            tuple: (tipo MIME, tamaño, iterador de trozos de bytes)
+        """
+        job = self._finished(job_id)
+        chunk = CONFIG['service_chunk_bytes']
+        if job_id in self._videos:
+            path = self._videos[job_id][1]
+            size = os.path.getsize(path)
+            # Se abre ya: si el trabajo se olvida mientras tanto, el fichero
+            # abierto sigue siendo legible aunque se borre su directorio
+            f = open(path, 'rb')
+
+            def read_file():
+                with f:
+                    while True:
+                        data = f.read(chunk)
+                        if not data:
+                            return
+                        yield data
+            return 'video/mp4', size, read_file()
+
+        if fmt == 'npy':
+            # Sin comprimir, para clientes que quieren el array BGR
+            buffer = io.BytesIO()
+            np.save(buffer, job.result, allow_pickle=False)
+            data, content_type = buffer.getbuffer(), 'application/x-npy'
+        elif fmt in FORMATS:
+            data = self.encoder.submit(job_id, job.result, fmt).result()
+            content_type = FORMATS[fmt][1]
+        else:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Formato no soportado: {fmt}")
+        view = memoryview(data)
+        return content_type, len(view), (view[i:i + chunk] for i in range(0, len(view), chunk))
+
+    def preview(self, job_id, fmt='jpeg'):
+        """
+        Vista previa de una imagen en curso (modo progresivo).
+
+        Returns:
+            tuple: (tipo MIME, bytes)
+        """
+        job = self.get(job_id)
+        if job.preview is None:
+            raise ServiceError(HTTPStatus.CONFLICT, f"El trabajo {job_id} no tiene vista previa")
+        if fmt not in FORMATS:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"Formato no soportado: {fmt}")
+        return FORMATS[fmt][1], encode_image(job.preview, fmt)
+
+    def trace(self, job_id):
+        """Traza de una imagen terminada (dict de Trace.to_dict)."""
+        job = self._finished(job_id)
+        if job.trace is None:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"El trabajo {job_id} no tiene traza")
+        return job.trace.to_dict()
+
+    def cancel(self, job_id):
+        """
+        Un cliente deja de esperar un trabajo. Si era el último, el trabajo
+        se cancela si sigue en curso o, si ya terminó, se olvida: se liberan
+        su resultado, sus codificaciones y el directorio de un vídeo.
+
+        Returns:
+            True si se ha cancelado el trabajo
+        """
+        job = self.get(job_id)
+        with self._lock:
+            waiters = self._waiters.get(job_id, 1) - 1
+            if waiters > 0:
+                self._waiters[job_id] = waiters
+                return False
+            self._waiters.pop(job_id, None)
+        if job.finished:
+            self.queue.forget(job_id)
+            return False
+        return self.queue.cancel(job_id)
+
+    def health(self):
+        """Estado del servicio para /health."""
+        report = startup.report.to_dict()
+        return {
+            'ready': not (self.require_warm and report['warmup_state'] == 'running'),
+            'queue': self.queue.stats(),
+            'coalesced': self.coalesced,
+            'models': self.enhancer.registry.stats(),
+            'startup': report,
+        }
+
+    def close(self):
+        self.queue.close()
+        for work_dir, _ in list(self._videos.values()):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Traduce las rutas HTTP a llamadas de EnhanceService."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "PhotoEnhancer/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if CONFIG['service_log_requests']:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, content_type, size, chunks, headers=None):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(size))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk)
+
+    def _read_body(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise ServiceError(HTTPStatus.LENGTH_REQUIRED, "Falta Content-Length")
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "Content-Length no válido")
+        if length > CONFIG['service_max_body_mb'] * 1024 * 1024:
+            raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Cuerpo de {length / 2**20:.0f} MB: máximo "
+                               f"{CONFIG['service_max_body_mb']} MB")
+        return self.rfile.read(length)
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        # Antes de leer el cuerpo, para no aceptar datos que no se van a usar
+        if not self.server.slots.acquire(blocking=False):
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, "Demasiadas conexiones",
+                               retry_after=CONFIG['service_retry_after_s'])
+        try:
+            return self._route(method, parts, query)
+        finally:
+            self.server.slots.release()
+
+    def _route(self, method, parts, query):
+        service = self.service
+        if method == 'GET' and parts == ['health']:
+            return self._send_json(HTTPStatus.OK, service.health())
+
+        if method == 'POST' and parts in (['jobs'], ['enhance']):
+            options = parse_options(query, IMAGE_OPTIONS)
+            selection = parse_selection_query(query)
+            if selection is not None:
+                options['selection'] = selection
+            job, coalesced = service.submit_image(self._read_body(), **options)
+            headers = {"X-Job-Id": job.id, "X-Coalesced": str(int(coalesced))}
+            if parts == ['jobs']:
+                return self._send_json(HTTPStatus.ACCEPTED,
+                                       {'id': job.id, 'coalesced': coalesced}, headers)
+            fmt = query.get('format', ['png'])[-1]
+            try:
+                service.wait(job.id)
+                return self._send_stream(*service.result(job.id, fmt), headers)
+            finally:
+                # También tras un 504: el cliente ya no espera el resultado
+                service.cancel(job.id)
+
+        if method == 'POST' and parts == ['videos']:
+            options = parse_options(query, VIDEO_OPTIONS)
+            name = query.get('name', ['video.mp4'])[-1]
+            job, coalesced = service.submit_video(self._read_body(), name, **options)
+            return self._send_json(HTTPStatus.ACCEPTED, {'id': job.id, 'coalesced': coalesced},
+                                   {"X-Job-Id": job.id})
+
+        if len(parts) >= 2 and parts[0] == 'jobs':
+            job_id, rest = parts[1], parts[2:]
+            if method == 'GET' and not rest:
+                return self._send_json(HTTPStatus.OK, service.status(job_id))
+            if method == 'GET' and rest == ['result']:
+                fmt = query.get('format', ['png'])[-1]
+                return self._send_stream(*service.result(job_id, fmt))
+            if method == 'GET' and rest == ['preview']:
+                content_type, data = service.preview(job_id, query.get('format', ['jpeg'])[-1])
+                return self._send_stream(content_type, len(data), [data])
+            if method == 'GET' and rest == ['trace']:
+                return self._send_json(HTTPStatus.OK, service.trace(job_id))
+            if method == 'DELETE' and not rest:
+                return self._send_json(HTTPStatus.OK, {'cancelled': service.cancel(job_id)})
+
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {method} {self.path}")
+
+    def _handle(self, method):
+        try:
+            self._dispatch(method)
+        except ServiceError as e:
+            if method == 'POST':
+                # El cuerpo puede haberse quedado sin leer
+                self.close_connection = True
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+            self._send_json(e.status, {'error': str(e)}, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cerró la conexión a mitad de respuesta
+            self.close_connection = True
+        except Exception as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR,
+                            {'error': f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+def build_service(stub=False, workers=None, max_pending=None, use_cache=True, metrics=None):
+    """
+    EnhanceService con un ImageEnhancer nuevo y su propio registro de modelos.
+
+    Args:
+        stub: Usar los modelos sustitutos de src/stubs.py (sin pesos)
+        workers: Hilos de la cola (CONFIG['job_workers'])
+        max_pending: Trabajos en espera (CONFIG['job_max_pending'])
+        use_cache: Usar la caché de resultados y el índice de fotos repetidas
+        metrics: MetricsRecorder opcional
+
+    Returns:
+        EnhanceService
+    """
+    from src.cache import ResultCache
+    from src.dedup import DedupIndex
+    from src.models import ImageEnhancer, get_default_registry
+    from src.registry import ModelRegistry
+
+    if stub:
+        from src.stubs import stub_loaders
+        registry = ModelRegistry(stub_loaders())
+    else:
+        registry = get_default_registry()
+    cache = ResultCache() if use_cache else None
+    dedup = DedupIndex() if use_cache and CONFIG['dedup_enabled'] else None
+    enhancer = ImageEnhancer(headless=True, cache=cache, registry=registry,
+                             metrics=metrics, dedup=dedup)
+    return EnhanceService(enhancer, workers=workers, max_pending=max_pending)
+
+
+def create_server(service, host=None, port=None, max_connections=None):
+    """
+    Servidor HTTP (sin arrancar) para un EnhanceService.
+
+    Args:
+        service: EnhanceService
+        host: Dirección (CONFIG['service_host'])
+        port: Puerto; 0 elige uno libre (CONFIG['service_port'])
+        max_connections: Peticiones atendidas a la vez; el resto recibe
+            503 (CONFIG['service_max_connections'])
+
+    Returns:
+        ThreadingHTTPServer
+    """
+    host = host or CONFIG['service_host']
+    port = CONFIG['service_port'] if port is None else port
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.slots = threading.BoundedSemaphore(
+        max_connections or CONFIG['service_max_connections']
+    )
+    return server
+
+
+def serve_in_background(server):
+    """
+    Atiende peticiones en un hilo daemon.
+
+    Returns:
+        El hilo lanzado
+    """
+    thread = threading.Thread(target=server.serve_forever, name="enhance-service", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,167 @@
+"""
+Arranque de la aplicación: importaciones diferidas y precalentamiento.
+
+Con CONFIG['startup_mode'] = 'lazy' las librerías de ML no se importan
+hasta que se carga el primer modelo; con 'eager' se importan todas al
+arrancar (comportamiento anterior). Aparte, CONFIG['warmup'] lanza en un
+hilo de fondo la carga de los modelos y una inferencia de prueba para que
+la primera petición real no pague ni la descarga ni la deserialización.
+
+`report` recoge los tiempos de importación, de precalentamiento y el
+tiempo hasta el primer resultado.
+"""
+
+import importlib
+import threading
+import time
+
+from config import CONFIG
+
+
+# Librerías pesadas en el orden en que se importan (torch arrastra el resto)
+ML_MODULES = ('torch', 'torchvision', 'cv2', 'basicsr', 'facexlib', 'gfpgan',
+              'realesrgan', 'zeroscratches')
+
+
+class StartupReport:
+    """Tiempos de arranque del proceso."""
+
+    def __init__(self):
+        self.process_start = time.perf_counter()
+        self.mode = CONFIG['startup_mode']
+        self.imports = {}
+        self.warmup = {}
+        self.warmup_state = 'disabled'
+        self.warmup_error = None
+        self.ready_s = None
+        self.first_result_s = None
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.process_start
+
+    def mark_ready(self):
+        """Registra cuándo la interfaz quedó lista (solo la primera vez)."""
+        with self._lock:
+            if self.ready_s is None:
+                self.ready_s = self.elapsed()
+
+    def mark_first_result(self):
+        """Registra el tiempo hasta el primer resultado (solo la primera vez)."""
+        with self._lock:
+            if self.first_result_s is None:
+                self.first_result_s = self.elapsed()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'imports_s': dict(self.imports),
+                'imports_total_s': round(sum(self.imports.values()), 3),
+                'ready_s': round(self.ready_s, 3) if self.ready_s is not None else None,
+                'warmup_state': self.warmup_state,
+                'warmup_s': dict(self.warmup),
+                'warmup_error': self.warmup_error,
+                'time_to_first_result_s': (round(self.first_result_s, 3)
+                                           if self.first_result_s is not None else None),
+            }
+
+
+report = StartupReport()
+
+
+def import_ml_modules(modules=ML_MODULES):
+    """
+    Importa las librerías de ML midiendo cuánto cuesta cada una.
+
+    Una librería ya importada (directa o indirectamente) cuenta como ~0 s.
+
+    Returns:
+        dict módulo -> segundos
+    """
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+    with report._lock:
+        report.imports.update(timings)
+    return timings
+
+
+def warm_up(registry, modes=None):
+    """
+    Carga los modelos y ejecuta una inferencia con una imagen de prueba.
+
+    Args:
+        registry: ModelRegistry cuyos modelos se precalientan
+        modes: Lista de dicts de opciones de enhance a precalentar
+            (por defecto CONFIG['warmup_modes'])
+
+    Returns:
+        dict etapa -> segundos
+    """
+    import numpy as np
+    from src.models import ImageEnhancer
+
+    enhancer = ImageEnhancer(headless=True, registry=registry, track_first_result=False)
+
+    modes = modes if modes is not None else CONFIG['warmup_modes']
+    timings = {}
+
+    start = time.perf_counter()
+    import_ml_modules()
+    timings['imports'] = round(time.perf_counter() - start, 3)
+
+    dummy = np.full((256, 256, 3), 127, dtype=np.uint8)
+    for options in modes:
+        label = "+".join(k for k, v in sorted(options.items()) if v) or "faces"
+        start = time.perf_counter()
+        enhancer.enhance(dummy, **options)
+        timings[label] = round(time.perf_counter() - start, 3)
+
+    with report._lock:
+        report.warmup.update(timings)
+    return timings
+
+
+def start_background_warmup(registry, modes=None):
+    """
+    Lanza warm_up en un hilo daemon.
+
+    Returns:
+        El hilo lanzado
+    """
+    def run():
+        with report._lock:
+            report.warmup_state = 'running'
+        try:
+            warm_up(registry, modes)
+            state = 'done'
+        except Exception as e:
+            state = 'failed'
+            report.warmup_error = f"{type(e).__name__}: {e}"
+        with report._lock:
+            report.warmup_state = state
+
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def prepare():
+    """
+    Aplica el modo de arranque configurado.
+
+    En modo 'eager' importa ya todas las librerías de ML; en 'lazy' no
+    hace nada y las importaciones se pagan con el primer modelo. Si hay
+    hilos de torch configurados se fijan aquí (eso sí importa torch).
+    """
+    if CONFIG['startup_mode'] == 'eager':
+        import_ml_modules()
+    if CONFIG['torch_intra_op_threads'] or CONFIG['torch_inter_op_threads']:
+        from src.optimize import configure_threads
+        configure_threads()
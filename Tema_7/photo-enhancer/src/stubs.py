@@ -0,0 +1,220 @@
+"""
+Modelos sustitutos ligeros para benchmarks y CI sin pesos.
+
+Tienen la misma interfaz que GFPGANer, RealESRGANer y EraseScratches (y
+que el FaceRestoreHelper de facexlib en la parte que usa src/pipeline.py),
+pero no descargan nada: las redes son convoluciones diminutas con pesos
+fijos y el "detector de caras" busca las caras sintéticas que dibuja
+benchmarks/corpus.py, pintadas con FACE_COLOR.
+"""
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from config import CONFIG
+from src import pipeline
+
+
+# Color BGR de las caras sintéticas que detecta StubFaceHelper
+FACE_COLOR = (140, 170, 225)
+
+# Puntos de referencia de facexlib para una cara de 512x512
+FACE_TEMPLATE_512 = np.array([
+    [192.98138, 239.94708], [318.90277, 240.19360], [256.63416, 314.01935],
+    [201.26117, 371.41043], [313.08905, 371.15118]
+], dtype=np.float32)
+
+
+def _tiny_conv(in_ch, out_ch, seed):
+    """Convolución 3x3 con pesos deterministas y pequeños."""
+    conv = torch.nn.Conv2d(in_ch, out_ch, 3, padding=1)
+    generator = torch.Generator().manual_seed(seed)
+    with torch.no_grad():
+        conv.weight.copy_(torch.randn(conv.weight.shape, generator=generator) * 0.01)
+        conv.bias.zero_()
+    return conv
+
+
+class StubFaceHelper:
+    """Sustituto de facexlib.FaceRestoreHelper basado en color."""
+
+    def __init__(self, upscale_factor, face_size=512):
+        self.upscale_factor = upscale_factor
+        self.face_size = face_size
+        self.face_template = FACE_TEMPLATE_512 * (face_size / 512)
+        self.clean_all()
+
+    def clean_all(self):
+        self.all_landmarks_5 = []
+        self.det_faces = []
+        self.affine_matrices = []
+        self.inverse_affine_matrices = []
+        self.cropped_faces = []
+        self.restored_faces = []
+        self.input_img = None
+
+    def read_image(self, img):
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        elif img.shape[2] == 4:
+            img = img[:, :, :3]
+        self.input_img = img
+
+    def get_face_landmarks_5(self, only_center_face=False, eye_dist_threshold=None, **kwargs):
+        mask = cv2.inRange(self.input_img, np.subtract(FACE_COLOR, 12), np.add(FACE_COLOR, 12))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        for x, y, w, h, area in stats[1:count]:
+            if eye_dist_threshold and w * 0.4 < eye_dist_threshold:
+                continue
+            if area < 64:
+                continue
+            self.det_faces.append(np.array([x, y, x + w, y + h, 1.0], dtype=np.float32))
+            self.all_landmarks_5.append(np.array([
+                [x + 0.3 * w, y + 0.40 * h], [x + 0.7 * w, y + 0.40 * h],
+                [x + 0.5 * w, y + 0.55 * h],
+                [x + 0.35 * w, y + 0.72 * h], [x + 0.65 * w, y + 0.72 * h],
+            ], dtype=np.float32))
+        if only_center_face and self.det_faces:
+            h, w = self.input_img.shape[:2]
+            dist = [np.hypot((b[0] + b[2]) / 2 - w / 2, (b[1] + b[3]) / 2 - h / 2) for b in self.det_faces]
+            keep = int(np.argmin(dist))
+            self.det_faces = [self.det_faces[keep]]
+            self.all_landmarks_5 = [self.all_landmarks_5[keep]]
+        return len(self.all_landmarks_5)
+
+    def align_warp_face(self, save_cropped_path=None, border_mode='constant'):
+        for landmark in self.all_landmarks_5:
+            matrix = cv2.estimateAffinePartial2D(landmark, self.face_template, method=cv2.LMEDS)[0]
+            self.affine_matrices.append(matrix)
+            crop = cv2.warpAffine(self.input_img, matrix, (self.face_size, self.face_size),
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=(135, 133, 132))
+            self.cropped_faces.append(crop)
+
+    def add_restored_face(self, face, input_face=None):
+        self.restored_faces.append(face)
+
+    def get_inverse_affine(self, save_inverse_affine_path=None):
+        for matrix in self.affine_matrices:
+            inverse = cv2.invertAffineTransform(matrix) * self.upscale_factor
+            self.inverse_affine_matrices.append(inverse)
+
+    def paste_faces_to_input_image(self, save_path=None, upsample_img=None):
+        h, w = self.input_img.shape[:2]
+        h_up, w_up = int(h * self.upscale_factor), int(w * self.upscale_factor)
+        if upsample_img is None:
+            upsample_img = cv2.resize(self.input_img, (w_up, h_up), interpolation=cv2.INTER_LANCZOS4)
+        else:
+            upsample_img = cv2.resize(upsample_img, (w_up, h_up), interpolation=cv2.INTER_LANCZOS4)
+
+        result = upsample_img.astype(np.float32)
+        face_mask = np.ones((self.face_size, self.face_size), dtype=np.float32)
+        for face, inverse in zip(self.restored_faces, self.inverse_affine_matrices):
+            warped = cv2.warpAffine(face, inverse, (w_up, h_up))
+            mask = cv2.warpAffine(face_mask, inverse, (w_up, h_up))
+            mask = cv2.GaussianBlur(cv2.erode(mask, np.ones((5, 5), np.uint8)), (11, 11), 0)[..., None]
+            result = mask * warped + (1 - mask) * result
+        return np.clip(result, 0, 255).astype(np.uint8)
+
+
+class StubGFPGANNet(torch.nn.Module):
+    """Red sustituta con la firma de GFPGANv1Clean.forward."""
+
+    def __init__(self):
+        super().__init__()
+        self.conv = _tiny_conv(3, 3, seed=1)
+
+    def forward(self, x, return_latents=False, return_rgb=True, **kwargs):
+        out = (x + torch.tanh(self.conv(x))).clamp(-1, 1)
+        return out, None
+
+
+class StubRRDBNet(torch.nn.Module):
+    """Red sustituta de RRDBNet: interpolación más un residuo aprendido."""
+
+    def __init__(self, scale=2):
+        super().__init__()
+        self.scale = scale
+        self.conv = _tiny_conv(3, 3 * scale * scale, seed=2)
+        self.shuffle = torch.nn.PixelShuffle(scale)
+
+    def forward(self, x):
+        base = F.interpolate(x, scale_factor=self.scale, mode='bilinear', align_corners=False)
+        return base + self.shuffle(self.conv(x))
+
+
+class StubGFPGANer:
+    """Sustituto de GFPGANer sin pesos descargados."""
+
+    def __init__(self, upscale=None, bg_upsampler=None):
+        self.upscale = upscale or CONFIG['upscale']
+        self.bg_upsampler = bg_upsampler
+        self.device = torch.device('cpu')
+        self.face_helper = StubFaceHelper(self.upscale)
+        self.gfpgan = StubGFPGANNet().eval()
+
+    def enhance(self, img, has_aligned=False, only_center_face=False, paste_back=True, weight=0.5):
+        helper = pipeline.new_face_helper(self)
+        if has_aligned:
+            helper.cropped_faces = [cv2.resize(img, (512, 512))]
+        else:
+            pipeline.detect_faces(helper, img, only_center_face)
+            pipeline.align_faces(helper)
+        restored = pipeline.restore_faces(self, helper.cropped_faces, weight)
+        if has_aligned or not paste_back:
+            return helper.cropped_faces, restored, None
+        bg_img = pipeline.upsample_background(self.bg_upsampler, img, self.upscale)
+        return helper.cropped_faces, restored, pipeline.paste_back(helper, restored, bg_img)
+
+
+class StubRealESRGANer:
+    """Sustituto de RealESRGANer x2."""
+
+    def __init__(self, scale=2, tile=None, tile_pad=None):
+        self.scale = scale
+        self.tile_size = tile or CONFIG['bg_tile_size']
+        self.tile_pad = tile_pad or CONFIG['bg_tile_pad']
+        self.pre_pad = 0
+        self.half = False
+        self.device = torch.device('cpu')
+        self.model = StubRRDBNet(scale).eval()
+
+    def enhance(self, img, outscale=None, alpha_upsampler='realesrgan'):
+        h, w = img.shape[:2]
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        tensor = torch.from_numpy(np.ascontiguousarray(rgb.transpose(2, 0, 1))).float().div_(255)
+        with torch.no_grad():
+            output = self.model(tensor.unsqueeze(0)).squeeze(0).clamp_(0, 1)
+        output = (output.permute(1, 2, 0).numpy() * 255.0).round().astype(np.uint8)
+        output = cv2.cvtColor(output, cv2.COLOR_RGB2BGR)
+        if outscale is not None and outscale != self.scale:
+            output = cv2.resize(output, (int(w * outscale), int(h * outscale)),
+                                interpolation=cv2.INTER_LANCZOS4)
+        return output, 'RGB'
+
+
+class StubEraseScratches:
+    """Sustituto de zeroscratches.EraseScratches (filtro de mediana)."""
+
+    def erase(self, image):
+        array = np.asarray(image)
+        return Image.fromarray(cv2.medianBlur(array, 3))
+
+
+def stub_loaders():
+    """Loaders de ModelRegistry con los modelos sustitutos."""
+    from src.tiling import ParallelTileUpsampler
+
+    def bg_upsampler():
+        upsampler = StubRealESRGANer()
+        if CONFIG['bg_tile_workers'] != 1:
+            return ParallelTileUpsampler(upsampler)
+        return upsampler
+
+    return {
+        'gfpgan': StubGFPGANer,
+        'realesrgan': bg_upsampler,
+        'scratches': StubEraseScratches,
+    }
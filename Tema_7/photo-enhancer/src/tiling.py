@@ -0,0 +1,227 @@
+"""
+Ejecución paralela por teselas del upsampler de fondo (RealESRGAN).
+
+RealESRGANer procesa las teselas una detrás de otra. ParallelTileUpsampler
+reparte las teselas entre un pool de hilos (torch libera el GIL durante la
+inferencia) y une los bordes con un fundido lineal. La acumulación se hace
+siempre en el mismo orden, así que el resultado es determinista.
+
+Los hilos de torch son un ajuste de todo el proceso (se fijan una vez en
+src/optimize.configure_threads): el pool no los toca, sino que se limita a
+núcleos / hilos de torch para no sobresuscribir la CPU.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+def _even(value):
+    """Redondea hacia abajo a un número par (mínimo 2)."""
+    return max(2, value - value % 2)
+
+
+def tile_bounds(length, tile):
+    """
+    Divide una dimensión en tramos de tamaño similar y límites pares.
+
+    Args:
+        length: Longitud total (par)
+        tile: Tamaño máximo de cada tramo
+
+    Returns:
+        Lista de (inicio, fin)
+    """
+    count = max(1, -(-length // tile))
+    cuts = [0] + [_even(round(i * length / count)) for i in range(1, count)] + [length]
+    return [(cuts[i], cuts[i + 1]) for i in range(count) if cuts[i + 1] > cuts[i]]
+
+
+def _ramp(size, overlap, fade_in, fade_out):
+    """Pesos 1D de una tesela con rampas en los lados que tienen vecina."""
+    weights = np.ones(size, dtype=np.float32)
+    if overlap > 0:
+        ramp = (np.arange(overlap, dtype=np.float32) + 0.5) / overlap
+        if fade_in:
+            weights[:overlap] = ramp
+        if fade_out:
+            weights[-overlap:] = ramp[::-1]
+    return weights
+
+
+class ParallelTileUpsampler:
+    """Envuelve un RealESRGANer y ejecuta sus teselas en paralelo."""
+
+    def __init__(self, upsampler, tile=None, tile_pad=None, workers=None):
+        """
+        Args:
+            upsampler: RealESRGANer ya construido (se usan su red y escala)
+            tile: Tamaño de tesela en píxeles de entrada (CONFIG['bg_tile_size'])
+            tile_pad: Margen de solape por lado (CONFIG['bg_tile_pad'])
+            workers: Hilos en paralelo; 0 reparte los núcleos entre los
+                hilos de torch del proceso (CONFIG['bg_tile_workers'])
+        """
+        self.upsampler = upsampler
+        self.scale = upsampler.scale
+        self.tile = _even(tile or CONFIG['bg_tile_size'])
+        pad = CONFIG['bg_tile_pad'] if tile_pad is None else tile_pad
+        # El fundido necesita que el solape (2 * pad) quepa en cada tesela
+        self.tile_pad = min(pad - pad % 2, _even(self.tile // 4))
+        if workers is None:
+            workers = CONFIG['bg_tile_workers']
+        self.workers = workers or _pool_size()
+        self._executor = None
+        self._active = 0      # llamadas a enhance usando el pool
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire_executor(self):
+        with self._lock:
+            self._active += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="bg-tile"
+                )
+            return self._executor
+
+    def _release_executor(self):
+        with self._lock:
+            self._active -= 1
+            executor = self._take_idle_executor()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _take_idle_executor(self):
+        """Pool a cerrar si ya se pidió close() y nadie lo usa (con el lock tomado)."""
+        if not self._closed or self._active:
+            return None
+        executor, self._executor = self._executor, None
+        return executor
+
+    def _run_tile(self, img_bgr, box):
+        """
+        Ejecuta la red sobre una tesela con su margen.
+
+        Los canales se reordenan a RGB en la misma copia que prepara el
+        tensor, sin convertir la imagen completa.
+        """
+        import torch
+
+        y0, y1, x0, x1 = box
+        patch = np.ascontiguousarray(img_bgr[y0:y1, x0:x1, ::-1].transpose(2, 0, 1))
+        tensor = torch.from_numpy(patch).float().div_(255).unsqueeze(0)
+        tensor = tensor.to(self.upsampler.device)
+        if self.upsampler.half:
+            tensor = tensor.half()
+        with torch.no_grad():
+            output = self.upsampler.model(tensor)
+        output = output.squeeze(0).float().clamp_(0, 1).permute(1, 2, 0)
+        return output.cpu().numpy()
+
+    def enhance(self, img, outscale=None, alpha_upsampler='realesrgan'):
+        """
+        Reescala una imagen como RealESRGANer.enhance.
+
+        Las imágenes que no son BGR de 8 bits (alfa, gris, 16 bits) se
+        delegan en el RealESRGANer original.
+
+        Args:
+            img: Imagen BGR uint8
+            outscale: Escala final (por defecto, la de la red)
+
+        Returns:
+            tuple: (imagen BGR reescalada, modo de imagen)
+        """
+        if img.ndim != 3 or img.shape[2] != 3 or img.dtype != np.uint8:
+            return self.upsampler.enhance(img, outscale=outscale,
+                                          alpha_upsampler=alpha_upsampler)
+
+        h, w = img.shape[:2]
+        # RRDBNet x2 trabaja con dimensiones pares (pixel unshuffle)
+        pad_h, pad_w = h % 2, w % 2
+        if pad_h or pad_w:
+            img = cv2.copyMakeBorder(img, 0, pad_h, 0, pad_w, cv2.BORDER_REFLECT)
+        height, width = img.shape[:2]
+
+        scale, pad = self.scale, self.tile_pad
+        rows = tile_bounds(height, self.tile)
+        cols = tile_bounds(width, self.tile)
+        boxes = []
+        for i, (y0, y1) in enumerate(rows):
+            for j, (x0, x1) in enumerate(cols):
+                box = (max(0, y0 - pad), min(height, y1 + pad),
+                       max(0, x0 - pad), min(width, x1 + pad))
+                boxes.append((box, i > 0, i < len(rows) - 1, j > 0, j < len(cols) - 1))
+
+        accum = np.zeros((height * scale, width * scale, 3), dtype=np.float32)
+        weight = np.zeros((height * scale, width * scale, 1), dtype=np.float32)
+        overlap = 2 * pad * scale
+
+        def blend(entry, output):
+            (y0, y1, x0, x1), top, bottom, left, right = entry
+            wy = _ramp(output.shape[0], overlap, top, bottom)
+            wx = _ramp(output.shape[1], overlap, left, right)
+            mask = (wy[:, None] * wx[None, :])[..., None]
+            region = np.s_[y0 * scale:y1 * scale, x0 * scale:x1 * scale]
+            # La red devuelve RGB: se acumula ya en BGR
+            accum[region] += output[..., ::-1] * mask
+            weight[region] += mask
+
+        if self.workers == 1:
+            for entry in boxes:
+                blend(entry, self._run_tile(img, entry[0]))
+        else:
+            # Como mucho 2 teselas por hilo en vuelo para acotar la memoria;
+            # se consumen en orden de envío para que la suma sea determinista.
+            executor = self._acquire_executor()
+            try:
+                pending = deque()
+                for entry in boxes:
+                    pending.append((entry, executor.submit(self._run_tile, img, entry[0])))
+                    if len(pending) >= 2 * self.workers:
+                        done_entry, future = pending.popleft()
+                        blend(done_entry, future.result())
+                while pending:
+                    done_entry, future = pending.popleft()
+                    blend(done_entry, future.result())
+            finally:
+                self._release_executor()
+
+        # Normalización sobre el propio acumulador: sin temporales float
+        np.maximum(weight, 1e-8, out=weight)
+        np.divide(accum, weight, out=accum)
+        accum *= 255.0
+        np.clip(accum, 0, 255, out=accum)
+        np.rint(accum, out=accum)
+        output = accum[:h * scale, :w * scale].astype(np.uint8)
+
+        if outscale is not None and outscale != scale:
+            output = cv2.resize(output, (int(w * outscale), int(h * outscale)),
+                                interpolation=cv2.INTER_LANCZOS4)
+        return output, 'RGB'
+
+    def close(self):
+        """
+        Libera el pool de hilos.
+
+        Si hay una mejora en curso (un modelo expulsado del registro que
+        todavía se está usando), el pool se cierra cuando termina.
+        """
+        with self._lock:
+            self._closed = True
+            executor = self._take_idle_executor()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _pool_size():
+    """Teselas en paralelo que caben en los núcleos con los hilos de torch actuales."""
+    import torch
+    return max(1, (os.cpu_count() or 1) // torch.get_num_threads())
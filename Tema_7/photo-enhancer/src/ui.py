@@ -1,9 +1,8 @@
 import streamlit as st
 from config import CONFIG
-from PIL import Image
-import numpy as np
-import cv2
-import io
+
+from src.downloads import FORMATS
+from src.preview import compose_preview
 
 
 def render_header():
@@ -21,19 +20,21 @@ def render_file_uploader():
     """
     uploaded_file = st.file_uploader(
         "Selecciona una imagen",
-        type=CONFIG["allowed_formats"],
-        help="Sube una foto para mejorar su calidad"
+        type=CONFIG["allowed_formats"] + CONFIG["video_formats"],
+        help="Sube una foto (o un vídeo) para mejorar su calidad"
     )
     return uploaded_file
 
 
-def render_interactive_slider(original_image, restored_image):
+def render_interactive_slider(pyramid):
     """
     Renderiza el comparador interactivo con slider.
+
+    La composición se hace sobre las previsualizaciones del resultado, a
+    resolución de pantalla, no sobre las imágenes completas.
     
     Args:
-        original_image: Imagen original (PIL Image)
-        restored_image: Imagen restaurada (PIL Image)
+        pyramid: PreviewPyramid del resultado (ver ResultStore.preview)
     """
     st.markdown("---")
     st.subheader("🔄 Comparador Interactivo")
@@ -46,49 +47,251 @@ def render_interactive_slider(original_image, restored_image):
         label_visibility="collapsed"
     )
 
-    # Asegurar mismo tamaño
-    if original_image.size != restored_image.size:
-        restored_image = restored_image.resize(original_image.size, Image.LANCZOS)
-
-    # Crear imagen dividida
-    width = original_image.width
-    split_pos = int(width * slider_value / 100)
-
-    combined = Image.new('RGB', original_image.size)
-    combined.paste(original_image.crop((0, 0, split_pos, original_image.height)), (0, 0))
-    combined.paste(restored_image.crop((split_pos, 0, width, original_image.height)), (split_pos, 0))
-
-    # Añadir línea divisoria
-    combined_array = np.array(combined)
-    cv2.line(
-        combined_array,               # imagen
-        (split_pos, 0),               # punto inicial (x1, y1)
-        (split_pos, combined.height), # punto final (x2, y2)
-        (255, 255, 255),              # color (blanco)
-        3                             # grosor
-        )
+    combined_array = compose_preview(pyramid, slider_value, CONFIG['preview_display_width'])
     st.image(combined_array, width='stretch')
 
 
-def render_download_button(restored_image):
+def render_download_button(store, result_id, encoder=None):
     """
-    Renderiza el botón de descarga.
+    Renderiza el botón de descarga con selector de formato.
+
+    El formato en que está guardado el resultado se descarga tal cual; los
+    demás se codifican una vez por formato con el DownloadEncoder y se
+    reutilizan en cada rerun.
     
     Args:
-        restored_image: Imagen restaurada (PIL Image)
+        store: ResultStore con el resultado
+        result_id: Identificador del resultado
+        encoder: DownloadEncoder opcional
     """
     st.markdown("---")
-    buf = io.BytesIO()
-    restored_image.save(buf, format='PNG')
+    fmt = st.selectbox(
+        "Formato de descarga",
+        CONFIG['download_formats'],
+        format_func=lambda f: FORMATS[f][2]
+    )
+    extension, mime, _ = FORMATS[fmt]
+
+    future = store.download(result_id, fmt, encoder)
+    if future is None:
+        return
+    if not future.done():
+        with st.spinner("Preparando descarga..."):
+            data = future.result()
+    else:
+        data = future.result()
+
     st.download_button(
-        label="💾 Descargar Imagen Mejorada",
-        data=buf.getvalue(),
-        file_name="foto_mejorada.png",
-        mime="image/png",
+        label=f"💾 Descargar Imagen Mejorada ({len(data) / 2**20:.1f} MB)",
+        data=data,
+        file_name=f"foto_mejorada{extension}",
+        mime=mime,
         width="stretch"
     )
 
 
+STAGE_LABELS = {
+    'cache': "Buscando en la caché",
+    'scratches': "🔧 Reparando grietas y arañazos",
+    'loading': "Cargando modelos",
+    'restoring': "✨ Mejorando caras",
+    'background': "✨ Mejorando fondo",
+    'paste_back': "Componiendo resultado",
+    'done': "Terminando",
+}
+
+
+def render_job_status(job, position):
+    """
+    Muestra el estado de un trabajo en cola o en ejecución.
+
+    Args:
+        job: Job de la cola de trabajos
+        position: Posición en la cola (0 si ya se está ejecutando)
+
+    Returns:
+        True si el usuario ha pulsado cancelar
+    """
+    if position:
+        st.info(f"⏳ En cola: posición {position}")
+        st.progress(0.0)
+    else:
+        label = STAGE_LABELS.get(job.stage, "Procesando con IA")
+        st.progress(job.progress, text=f"{label}... ⏳")
+    return st.button("✖️ Cancelar", key=f"cancel_{job.id}")
+
+
+def render_progressive_preview(data):
+    """
+    Muestra la vista previa del modo progresivo mientras termina la mejora.
+
+    Args:
+        data: Bytes de la vista previa (JPEG)
+    """
+    st.image(data, width='stretch',
+             caption="Vista previa rápida: caras mejoradas; el fondo se está procesando")
+
+
+def render_trace(trace):
+    """
+    Muestra el desglose de tiempos por etapa de una petición.
+
+    Args:
+        trace: dict devuelto por Trace.to_dict()
+    """
+    with st.expander(f"⏱️ Tiempos por etapa ({trace['total_s']:.2f} s)"):
+        rows = []
+        for record in trace['stages']:
+            rss = record.get('rss_bytes')
+            rows.append({
+                'Etapa': record['stage'],
+                'Pared (s)': round(record['wall_s'], 3),
+                'CPU (s)': round(record['cpu_s'], 3),
+                'Tamaño': f"{record['width']}x{record['height']}" if 'width' in record else "",
+                'RSS (MB)': round(rss / 2**20) if rss else None,
+            })
+        st.dataframe(rows, width='stretch', hide_index=True)
+        plan = trace['attributes'].get('adaptive')
+        if plan:
+            st.caption("Resolución adaptativa: " + "; ".join(plan['reasons']))
+        dedup = trace['attributes'].get('dedup')
+        if dedup and dedup['accepted']:
+            st.caption(f"Foto repetida (pHash a {dedup['phash_distance']} bits): resultado "
+                       f"reutilizado a escala x{dedup['scale']}, desplazado {dedup['shift']} px")
+        selection = trace['attributes'].get('selection')
+        if selection:
+            text = (f"Mejora selectiva: {len(selection['selected'])} de "
+                    f"{len(selection['face_boxes'])} caras")
+            if trace['attributes'].get('enhance_background'):
+                text += f", fondo mejorado en el {selection['roi_ratio'] * 100:.1f} % de la imagen"
+            st.caption(text)
+        preview_s = trace['attributes'].get('preview_s')
+        if preview_s is not None:
+            st.caption(f"Vista previa progresiva a los {preview_s:.2f} s")
+        repair = trace['attributes'].get('scratches')
+        if repair and repair['mode'] == 'full':
+            reason = ("la máscara no encontró grietas" if repair.get('reason') == 'empty_mask'
+                      else "demasiado daño para repararlo por zonas")
+            st.caption(f"Grietas: imagen reparada entera ({reason})")
+        failures = trace['attributes'].get('face_failures')
+        if failures:
+            st.caption(f"⚠️ {len(failures['indices'])} caras sin restaurar: {failures['error']}")
+        if repair:
+            st.caption(f"Grietas: modo {repair['mode']}, {repair['regions']} zonas, "
+                       f"{repair['repaired_ratio'] * 100:.1f} % de la imagen reparada")
+        copies = trace.get('frame_copies') or {}
+        if copies:
+            count = sum(c['count'] for c in copies.values())
+            size = sum(c['bytes'] for c in copies.values())
+            st.caption(f"Copias de la imagen completa: {count} ({size / 2**20:.0f} MB)")
+
+
+def render_model_memory(stats):
+    """
+    Muestra en la barra lateral la memoria residente de los modelos.
+
+    Args:
+        stats: dict devuelto por ModelRegistry.stats()
+    """
+    mb = 1024 * 1024
+    with st.sidebar:
+        st.caption(
+            f"🧠 Modelos en memoria: {stats['resident_bytes'] / mb:.0f} MB "
+            f"de {stats['budget_bytes'] / mb:.0f} MB"
+        )
+        for name, size in stats['models'].items():
+            st.caption(f"• {name}: {size / mb:.0f} MB")
+
+
+def render_result_store(stats):
+    """
+    Muestra en la barra lateral la memoria de los resultados de las sesiones.
+
+    Args:
+        stats: dict devuelto por ResultStore.stats()
+    """
+    mb = 1024 * 1024
+    with st.sidebar:
+        st.caption(
+            f"📦 Resultados en memoria: {stats['bytes'] / mb:.0f} MB "
+            f"de {stats['max_bytes'] / mb:.0f} MB ({stats['entries']} resultados, "
+            f"{stats['sessions']} sesiones)"
+        )
+        if stats['evictions'] or stats['idle_evictions']:
+            st.caption(f"• Expulsados: {stats['evictions']} por memoria, "
+                       f"{stats['idle_evictions']} por inactividad")
+
+
+def render_startup_report(report):
+    """
+    Muestra en la barra lateral los tiempos de arranque.
+
+    Args:
+        report: dict devuelto por StartupReport.to_dict()
+    """
+    states = {
+        'disabled': "desactivado",
+        'running': "en curso ⏳",
+        'done': "listo ✅",
+        'failed': "fallido ❌",
+    }
+    with st.sidebar:
+        with st.expander("🚀 Arranque"):
+            st.caption(f"Modo: {report['mode']}")
+            if report['ready_s'] is not None:
+                st.caption(f"Interfaz lista en {report['ready_s']:.2f} s")
+            st.caption(f"Importaciones ML: {report['imports_total_s']:.2f} s")
+            st.caption(f"Precalentamiento: {states.get(report['warmup_state'], report['warmup_state'])}")
+            for label, seconds in report['warmup_s'].items():
+                st.caption(f"• {label}: {seconds:.2f} s")
+            if report['warmup_error']:
+                st.caption(f"Error: {report['warmup_error']}")
+            if report['time_to_first_result_s'] is not None:
+                st.caption(f"Primer resultado a los {report['time_to_first_result_s']:.2f} s")
+
+
+def render_damage_mask(overlay, damaged):
+    """
+    Muestra la máscara de daños que guiará la reparación de grietas.
+
+    Args:
+        overlay: Vista previa de src.scratches.damage_preview (BGR)
+        damaged: Fracción de la imagen marcada como dañada
+    """
+    with st.expander(f"🔍 Daños detectados ({damaged * 100:.2f} % de la imagen)"):
+        st.image(overlay, channels="BGR", width='stretch')
+        if CONFIG['scratch_mode'] == 'masked':
+            st.caption("Solo las zonas marcadas pasan por la red de reparación")
+
+
+def render_video_result(path, report):
+    """
+    Muestra el vídeo mejorado, su descarga y el resumen del proceso.
+
+    Args:
+        path: Ruta del vídeo mejorado
+        report: dict devuelto por VideoEnhancer.process
+    """
+    st.markdown("---")
+    st.subheader("🎞️ Vídeo mejorado")
+    st.video(path)
+    with open(path, 'rb') as f:
+        st.download_button(
+            label="💾 Descargar Vídeo Mejorado",
+            data=f,
+            file_name="video_mejorado.mp4",
+            mime="video/mp4",
+            width="stretch"
+        )
+    st.caption(
+        f"{report['frames']} fotogramas a {report['processing_fps']:.2f} fps "
+        f"({report['keyframes']} con detección, {report['tracked_frames']} con seguimiento) · "
+        f"memoria máx. {report['rss_max_mb']:.0f} MB"
+    )
+    if report.get('failed_faces'):
+        st.warning(f"⚠️ {report['failed_faces']} caras no se pudieron restaurar y se dejaron como estaban")
+
+
 def render_instructions():
     """Renderiza las instrucciones de uso."""
     st.info("👆 Sube una imagen para comenzar")
@@ -3,43 +3,78 @@ import numpy as np
 from PIL import Image
 
 
-def pil_to_bgr(image):
+# El orden de canales canónico del pipeline es BGR (el de OpenCV, GFPGAN y
+# RealESRGAN). Las conversiones con PIL usan sus modos 'raw' BGR, que
+# reordenan los canales mientras copian: una sola copia por conversión en
+# lugar de copiar y después convertir. Si se pasa una Trace, cada copia de
+# la imagen completa queda registrada en ella.
+
+
+def pil_to_bgr(image, trace=None):
     """
     Convierte una imagen PIL a formato BGR (OpenCV).
 
     Args:
         image: Imagen PIL
+        trace: Trace opcional donde contar la copia
 
     Returns:
-        numpy array en formato BGR
+        numpy array en formato BGR, escribible (se puede modificar en el
+        sitio, también con dst= en cv2)
     """
-    img_array = np.array(image)
-    img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    img_bgr = np.frombuffer(bytearray(image.tobytes('raw', 'BGR')), dtype=np.uint8)
+    img_bgr = img_bgr.reshape(image.height, image.width, 3)
+    if trace is not None:
+        trace.count_copy('pil_to_bgr', img_bgr.nbytes)
     return img_bgr
 
-def bgr_to_pil(image_bgr):
+def bgr_to_pil(image_bgr, trace=None):
     """
     Convierte una imagen BGR (OpenCV) a formato PIL.
 
     Args:
         image_bgr: numpy array en formato BGR
+        trace: Trace opcional donde contar la copia
 
     Returns:
         Imagen PIL
     """
-    img_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-    pil_image = Image.fromarray(img_rgb)
+    h, w = image_bgr.shape[:2]
+    pil_image = Image.frombuffer('RGB', (w, h), np.ascontiguousarray(image_bgr),
+                                 'raw', 'BGR', 0, 1)
+    if trace is not None:
+        trace.count_copy('bgr_to_pil', image_bgr.nbytes)
     return pil_image
 
-def load_image(uploaded_file):
+def rgb_to_bgr_inplace(image_rgb):
     """
-    Carga una imagen desde un archivo subido.
+    Reordena los canales de un array RGB a BGR sin reservar otro buffer.
 
     Args:
-        uploaded_file: Archivo subido por Streamlit
+        image_rgb: numpy array RGB escribible (se modifica)
 
     Returns:
-        Imagen PIL en formato RGB
+        El mismo array, ahora en BGR
+    """
+    return cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR, dst=image_rgb)
+
+def load_image(uploaded_file, max_side=None):
     """
-    image = Image.open(uploaded_file).convert('RGB')
-    return image
\ No newline at end of file
+    Carga una imagen desde un archivo subido (ver src/ingest.py).
+
+    Args:
+        uploaded_file: Archivo subido por Streamlit (o ruta)
+        max_side: Lado largo que basta para mostrarla; los JPEG mucho
+            mayores se decodifican a escala reducida
+
+    Returns:
+        Imagen PIL en formato RGB, con la orientación EXIF aplicada
+
+    Raises:
+        IngestError: Si no es una imagen o supera el límite de píxeles
+    """
+    from src.ingest import decode_pil
+
+    return decode_pil(uploaded_file, max_side)[0]
\ No newline at end of file
@@ -0,0 +1,313 @@
+"""
+Mejora de vídeos y secuencias de fotogramas.
+
+El vídeo se procesa en flujo, con memoria acotada sea cual sea su duración:
+  1. Un hilo lector decodifica fotogramas con cv2.VideoCapture en una cola
+     de tamaño fijo.
+  2. FaceTracker sigue los 5 puntos de referencia de cada cara de un
+     fotograma al siguiente con flujo óptico (Lucas-Kanade). Solo se vuelve
+     a ejecutar el detector en los fotogramas clave: cada
+     video_keyframe_interval fotogramas, tras un cambio de plano o cuando
+     se pierde el seguimiento.
+  3. Un pool de hilos alinea, restaura y pega cada fotograma a partir de
+     los puntos seguidos; los resultados se consumen en orden.
+  4. cv2.VideoWriter escribe cada fotograma en cuanto está listo.
+
+El audio no se conserva (OpenCV no lo lee ni lo escribe).
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+from src import pipeline
+from src.metrics import Trace, current_rss_bytes, peak_rss_bytes
+
+
+_END = object()
+
+
+class FrameReader:
+    """Decodifica fotogramas en un hilo aparte, con una cola acotada."""
+
+    def __init__(self, source, max_buffered=None):
+        """
+        Args:
+            source: Ruta del vídeo o patrón de secuencia (p. ej. 'f_%04d.png')
+            max_buffered: Fotogramas decodificados en espera
+                (CONFIG['video_queue_size'])
+        """
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise ValueError(f"No se pudo abrir el vídeo: {source}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        self._queue = queue.Queue(maxsize=max_buffered or CONFIG['video_queue_size'])
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="video-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ok, frame = self.capture.read()
+                if not ok or not self._put(frame):
+                    break
+        finally:
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            frame = self._queue.get()
+            if frame is _END:
+                return
+            yield frame
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.capture.release()
+
+
+class FaceTracker:
+    """
+    Puntos de referencia de las caras fotograma a fotograma.
+
+    Se comprueba cada punto seguido con el flujo hacia atrás
+    (forward-backward): si una cara pierde más de un punto, se redetecta.
+    """
+
+    def __init__(self, restorer, keyframe_interval=None, max_fb_error=None, scene_cut=None):
+        """
+        Args:
+            restorer: GFPGANer cuyo detector se usa en los fotogramas clave
+            keyframe_interval: Fotogramas entre detecciones forzadas
+                (CONFIG['video_keyframe_interval'])
+            max_fb_error: Error máximo ida-vuelta de un punto, en píxeles
+                (CONFIG['video_max_track_error'])
+            scene_cut: Diferencia media de gris que se considera cambio de
+                plano (CONFIG['video_scene_cut'])
+        """
+        self.restorer = restorer
+        self.keyframe_interval = keyframe_interval or CONFIG['video_keyframe_interval']
+        self.max_fb_error = max_fb_error or CONFIG['video_max_track_error']
+        self.scene_cut = scene_cut or CONFIG['video_scene_cut']
+        self.prev_gray = None
+        self.landmarks = []
+        self.boxes = []
+        self.since_keyframe = 0
+        self.keyframes = 0
+        self.tracked = 0
+
+    def _detect(self, frame):
+        helper = pipeline.new_face_helper(self.restorer)
+        pipeline.detect_faces(helper, frame)
+        # Coordenadas del fotograma (read_image puede haberlo redimensionado)
+        factor = frame.shape[1] / helper.input_img.shape[1]
+        self.landmarks = [np.asarray(l, dtype=np.float32) * factor for l in helper.all_landmarks_5]
+        self.boxes = []
+        for box in helper.det_faces:
+            box = np.array(box, dtype=np.float32)
+            box[:4] *= factor
+            self.boxes.append(box)
+        self.since_keyframe = 0
+        self.keyframes += 1
+
+    def _track(self, gray):
+        """
+        Sigue los puntos; devuelve False si hay que redetectar.
+
+        Sin caras que seguir también se redetecta: una cara que entra en
+        el plano no debe esperar al siguiente fotograma clave.
+        """
+        if not self.landmarks:
+            return False
+        points = np.concatenate(self.landmarks).reshape(-1, 1, 2)
+        params = dict(winSize=(21, 21), maxLevel=3,
+                      criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, **params)
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, moved, None, **params)
+        error = np.linalg.norm((back - points).reshape(-1, 2), axis=1)
+        valid = (status.ravel() == 1) & (status_back.ravel() == 1) & (error < self.max_fb_error)
+
+        moved = moved.reshape(-1, 5, 2)
+        valid = valid.reshape(-1, 5)
+        if (valid.sum(axis=1) < 4).any():
+            return False
+        for index, landmarks in enumerate(self.landmarks):
+            shift = (moved[index] - landmarks).mean(axis=0)
+            self.landmarks[index] = moved[index]
+            self.boxes[index][:4] += np.tile(shift, 2)
+        return True
+
+    def update(self, frame):
+        """
+        Puntos de las caras en un fotograma nuevo.
+
+        Returns:
+            tuple: (lista de puntos 5x2, lista de cajas, True si se detectó)
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        redetect = (
+            self.prev_gray is None
+            or self.since_keyframe + 1 >= self.keyframe_interval
+            or np.mean(cv2.absdiff(gray, self.prev_gray)) > self.scene_cut
+            or not self._track(gray)
+        )
+        if redetect:
+            self._detect(frame)
+        else:
+            self.since_keyframe += 1
+            self.tracked += 1
+        self.prev_gray = gray
+        return [l.copy() for l in self.landmarks], [b.copy() for b in self.boxes], redetect
+
+
+def restore_frame(restorer, bg_upsampler, frame, landmarks, boxes, weight, trace=None):
+    """
+    Mejora un fotograma con caras ya localizadas (sin detector).
+
+    Args:
+        restorer: GFPGANer
+        bg_upsampler: Upsampler de fondo o None
+        frame: Fotograma BGR
+        landmarks: Puntos 5x2 de cada cara, en coordenadas del fotograma
+        boxes: Cajas de cada cara
+        weight: Peso de la mejora
+        trace: Trace donde anotar las caras que no se han podido restaurar
+            (sin ella, un fallo de GFPGAN se propaga)
+
+    Returns:
+        Fotograma mejorado en BGR
+    """
+    helper = pipeline.new_face_helper(restorer)
+    helper.read_image(frame)
+    factor = helper.input_img.shape[1] / frame.shape[1]
+    helper.all_landmarks_5 = [l * factor for l in landmarks]
+    helper.det_faces = [np.concatenate([b[:4] * factor, b[4:]]) for b in boxes]
+    crops = pipeline.align_faces(helper)
+    restored = pipeline.restore_faces(restorer, crops, weight, trace=trace)
+    bg_img = pipeline.upsample_background(bg_upsampler, frame, restorer.upscale)
+    return pipeline.paste_back(helper, restored, bg_img)
+
+
+class VideoEnhancer:
+    """Mejora un vídeo en flujo a partir de un ImageEnhancer."""
+
+    def __init__(self, enhancer, workers=None, keyframe_interval=None, queue_size=None):
+        """
+        Args:
+            enhancer: ImageEnhancer (se usan sus modelos)
+            workers: Hilos de restauración (CONFIG['video_workers'])
+            keyframe_interval: Ver FaceTracker
+            queue_size: Fotogramas decodificados en espera (ver FrameReader)
+        """
+        self.enhancer = enhancer
+        self.workers = workers or CONFIG['video_workers']
+        self.keyframe_interval = keyframe_interval
+        self.queue_size = queue_size
+
+    def process(self, source, output_path, enhance_background=False, progress=None,
+                fourcc=None):
+        """
+        Mejora un vídeo y lo escribe fotograma a fotograma.
+
+        Args:
+            source: Ruta del vídeo o patrón de secuencia de imágenes
+            output_path: Vídeo de salida
+            enhance_background: Si True, usa RealESRGAN para el fondo
+            progress: Callback opcional progress(etapa, fracción); puede
+                lanzar una excepción para cancelar
+            fourcc: Códec de salida (CONFIG['video_fourcc'])
+
+        Returns:
+            dict con fotogramas, fps de proceso, fotogramas clave, caras sin
+            restaurar y memoria
+        """
+        if enhance_background:
+            restorer, bg_upsampler = self.enhancer.load_model_with_background()
+        else:
+            restorer, bg_upsampler = self.enhancer.load_model_simple(), None
+        weight = CONFIG['enhancement_weight']
+
+        reader = FrameReader(source, self.queue_size)
+        tracker = FaceTracker(restorer, self.keyframe_interval)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="video-frame")
+        writer = None
+        written = 0
+        failed_faces = 0
+        max_in_flight = 2 * self.workers
+        rss_max = 0
+        start = time.perf_counter()
+
+        def write(frame, frame_trace):
+            nonlocal writer, written, failed_faces, rss_max
+            failures = frame_trace.attributes.get('face_failures')
+            if failures:
+                failed_faces += len(failures['indices'])
+            if writer is None:
+                height, width = frame.shape[:2]
+                code = cv2.VideoWriter_fourcc(*(fourcc or CONFIG['video_fourcc']))
+                writer = cv2.VideoWriter(output_path, code, reader.fps, (width, height))
+                if not writer.isOpened():
+                    raise ValueError(f"No se pudo crear el vídeo: {output_path}")
+            writer.write(frame)
+            written += 1
+            rss_max = max(rss_max, current_rss_bytes() or 0)
+            if progress is not None:
+                fraction = written / reader.frame_count if reader.frame_count else 0.0
+                progress('video', min(fraction, 1.0))
+
+        pending = deque()
+        try:
+            for frame in reader:
+                landmarks, boxes, _ = tracker.update(frame)
+                frame_trace = Trace()
+                pending.append((executor.submit(
+                    restore_frame, restorer, bg_upsampler, frame, landmarks, boxes, weight,
+                    frame_trace
+                ), frame_trace))
+                # Como mucho 2 fotogramas por hilo en vuelo; salida en orden
+                if len(pending) >= max_in_flight:
+                    future, frame_trace = pending.popleft()
+                    write(future.result(), frame_trace)
+            while pending:
+                future, frame_trace = pending.popleft()
+                write(future.result(), frame_trace)
+        finally:
+            for future, _ in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            reader.close()
+            if writer is not None:
+                writer.release()
+
+        elapsed = time.perf_counter() - start
+        return {
+            'frames': written,
+            'input_fps': round(reader.fps, 3),
+            'elapsed_s': round(elapsed, 3),
+            'processing_fps': round(written / elapsed, 3) if elapsed > 0 else 0.0,
+            'keyframes': tracker.keyframes,
+            'tracked_frames': tracker.tracked,
+            'failed_faces': failed_faces,
+            'workers': self.workers,
+            'max_frames_in_memory': max_in_flight + reader._queue.maxsize,
+            'rss_max_mb': round(rss_max / 2**20, 1),
+            'peak_rss_mb': round((peak_rss_bytes() or 0) / 2**20, 1),
+        }
@@ -0,0 +1,388 @@
+"""
+Almacén local de pesos direccionado por checksum.
+
+Los .pth se descargan una sola vez, se verifica su sha256 y se convierten
+a ficheros .safetensors guardados con su propio sha256 como nombre. Al
+cargar, los tensores son vistas de un np.memmap de solo lectura sobre el
+fichero: todos los procesos del host comparten las mismas páginas físicas
+(la caché de páginas del sistema) en lugar de tener cada uno su copia
+deserializada.
+
+Con el almacén poblado la app funciona sin conexión:
+    python -m src.weights --populate
+    python -m src.weights --verify
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.request
+import warnings
+
+import numpy as np
+
+from config import CONFIG
+
+
+# Pesos que usa la app: nombre -> URL de origen
+WEIGHT_SOURCES = {
+    'gfpgan': CONFIG['model_url'],
+    'realesrgan': 'https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth',
+    'retinaface': 'https://github.com/xinntao/facexlib/releases/download/v0.1.0/detection_Resnet50_Final.pth',
+    'parsenet': 'https://github.com/xinntao/facexlib/releases/download/v0.2.2/parsing_parsenet.pth',
+}
+
+# Nombre con el que facexlib busca cada modelo en su carpeta de pesos
+FACEXLIB_FILES = {
+    'retinaface': 'detection_Resnet50_Final.pth',
+    'parsenet': 'parsing_parsenet.pth',
+}
+
+# dtype de safetensors <-> numpy (torch se importa solo al cargar)
+_DTYPES = {
+    'F64': np.float64, 'F32': np.float32, 'F16': np.float16,
+    'I64': np.int64, 'I32': np.int32, 'I16': np.int16, 'I8': np.int8,
+    'U8': np.uint8, 'BOOL': np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+
+class WeightStoreError(Exception):
+    """Pesos ausentes, corruptos o con checksum inesperado."""
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    """sha256 hexadecimal de un fichero."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_safetensors(path, arrays, metadata=None):
+    """
+    Escribe un dict nombre -> numpy array en formato safetensors.
+
+    Los tensores se ordenan por tamaño de elemento (de mayor a menor) y la
+    cabecera se rellena a múltiplo de 8, así que cada tensor queda alineado
+    a su tamaño de elemento y se puede mapear sin copias.
+    """
+    names = sorted(arrays, key=lambda n: (-arrays[n].dtype.itemsize, n))
+    header = {}
+    offset = 0
+    for name in names:
+        array = arrays[name]
+        header[name] = {
+            'dtype': _DTYPE_NAMES[array.dtype],
+            'shape': list(array.shape),
+            'data_offsets': [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    if metadata:
+        header['__metadata__'] = {k: str(v) for k, v in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    with open(path, 'wb') as f:
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name in names:
+            f.write(np.ascontiguousarray(arrays[name]).tobytes())
+
+
+def read_safetensors_mmap(path):
+    """
+    Abre un .safetensors como vistas numpy de un memmap de solo lectura.
+
+    Returns:
+        tuple: (dict nombre -> numpy array, metadatos)
+    """
+    with open(path, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+    metadata = header.pop('__metadata__', {})
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=8 + header_size)
+    arrays = {}
+    for name, info in header.items():
+        begin, end = info['data_offsets']
+        dtype = np.dtype(_DTYPES[info['dtype']])
+        arrays[name] = data[begin:end].view(dtype).reshape(info['shape'])
+    return arrays, metadata
+
+
+def to_torch_state_dict(arrays):
+    """Convierte las vistas numpy en tensores de torch sin copiar."""
+    import torch
+
+    with warnings.catch_warnings():
+        # Los memmap son de solo lectura: los pesos no se modifican nunca
+        warnings.filterwarnings('ignore', message='The given NumPy array is not writable')
+        return {name: torch.from_numpy(array) for name, array in arrays.items()}
+
+
+def assign_state_dict(module, state_dict):
+    """
+    Sustituye parámetros y buffers de un módulo por los tensores dados.
+
+    A diferencia de load_state_dict no copia los datos: los tensores
+    mapeados pasan a ser los propios parámetros del módulo.
+
+    Raises:
+        WeightStoreError: Si faltan claves o las formas no coinciden
+    """
+    import torch
+
+    expected = module.state_dict()
+    missing = set(expected) - set(state_dict)
+    if missing:
+        raise WeightStoreError(f"Faltan pesos: {sorted(missing)[:5]}...")
+
+    for name, tensor in state_dict.items():
+        if name not in expected:
+            continue
+        if tuple(expected[name].shape) != tuple(tensor.shape):
+            raise WeightStoreError(f"Forma distinta en {name}")
+        owner_path, _, leaf = name.rpartition('.')
+        owner = module.get_submodule(owner_path) if owner_path else module
+        if leaf in owner._parameters:
+            owner._parameters[leaf] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            owner._buffers[leaf] = tensor
+
+
+def _extract_state_dict(checkpoint):
+    """Saca el state dict de un checkpoint de basicsr/facexlib."""
+    for key in ('params_ema', 'params', 'state_dict'):
+        if isinstance(checkpoint, dict) and key in checkpoint:
+            checkpoint = checkpoint[key]
+            break
+    # facexlib guarda algunos modelos envueltos en DataParallel
+    return {k[7:] if k.startswith('module.') else k: v for k, v in checkpoint.items()}
+
+
+class WeightStore:
+    """Pesos locales en safetensors, direccionados por sha256."""
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root: Carpeta del almacén (por defecto CONFIG['weights_dir'])
+        """
+        self.root = root or CONFIG['weights_dir']
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.index = self._read_index()
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def has(self, name):
+        """
+        Indica si un peso está en el almacén y viene de su URL actual.
+
+        Si la URL de WEIGHT_SOURCES ha cambiado (p. ej. otro model_url en
+        CONFIG), los pesos guardados son de otro modelo y se consideran
+        ausentes, para que populate los vuelva a descargar.
+        """
+        entry = self.index.get(name)
+        if entry is None or self.is_stale(name):
+            return False
+        return os.path.exists(self._blob_path(entry['sha256'], '.safetensors'))
+
+    def is_stale(self, name):
+        """True si el peso se descargó de una URL distinta de la actual."""
+        entry = self.index.get(name)
+        return (entry is not None and name in WEIGHT_SOURCES
+                and entry.get('source') is not None
+                and entry['source'] != WEIGHT_SOURCES[name])
+
+    def _blob_path(self, digest, suffix):
+        return os.path.join(self.blob_dir, digest + suffix)
+
+    def add_checkpoint(self, name, pth_path, source=None, expected_sha256=None):
+        """
+        Añade un .pth local al almacén.
+
+        Args:
+            name: Nombre lógico del peso
+            pth_path: Ruta del checkpoint
+            source: URL de origen; si no coincide con la de WEIGHT_SOURCES
+                el peso se considera desactualizado (None = añadido a mano)
+            expected_sha256: Checksum esperado del .pth (None = no verificar)
+
+        Raises:
+            WeightStoreError: Si el checksum no coincide
+        """
+        import torch
+
+        source_sha = sha256_file(pth_path)
+        if expected_sha256 and source_sha != expected_sha256:
+            raise WeightStoreError(
+                f"{name}: checksum {source_sha} distinto del esperado {expected_sha256}"
+            )
+
+        # Se guarda también el .pth original (facexlib lo necesita tal cual)
+        raw_path = self._blob_path(source_sha, '.pth')
+        if not os.path.exists(raw_path):
+            shutil.copyfile(pth_path, raw_path)
+
+        checkpoint = torch.load(pth_path, map_location='cpu')
+        arrays = {k: v.detach().cpu().numpy() for k, v in _extract_state_dict(checkpoint).items()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix='.tmp')
+        os.close(fd)
+        write_safetensors(tmp_path, arrays, metadata={'name': name, 'source_sha256': source_sha})
+        digest = sha256_file(tmp_path)
+        os.replace(tmp_path, self._blob_path(digest, '.safetensors'))
+
+        with self._lock:
+            self.index[name] = {
+                'sha256': digest,
+                'source_sha256': source_sha,
+                'source': source,
+            }
+            self._write_index()
+        return digest
+
+    def populate(self, names=None, force=False):
+        """
+        Descarga y añade los pesos que falten.
+
+        Args:
+            names: Pesos a poblar (por defecto, todos los de WEIGHT_SOURCES)
+            force: Volver a descargar aunque ya estén
+
+        Returns:
+            dict nombre -> sha256
+        """
+        names = names or list(WEIGHT_SOURCES)
+        checksums = CONFIG['weights_checksums']
+        result = {}
+        for name in names:
+            if self.has(name) and not force:
+                result[name] = self.index[name]['sha256']
+                continue
+            url = WEIGHT_SOURCES[name]
+            fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix='.download')
+            os.close(fd)
+            try:
+                urllib.request.urlretrieve(url, tmp_path)
+                result[name] = self.add_checkpoint(name, tmp_path, source=url,
+                                                   expected_sha256=checksums.get(name))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return result
+
+    def verify(self, names=None):
+        """
+        Recalcula el sha256 de cada peso.
+
+        Returns:
+            dict nombre -> True si coincide con el índice
+        """
+        names = names or list(self.index)
+        return {
+            name: self.has(name) and sha256_file(
+                self._blob_path(self.index[name]['sha256'], '.safetensors')
+            ) == self.index[name]['sha256']
+            for name in names
+        }
+
+    def path(self, name):
+        """Ruta del .safetensors de un peso."""
+        if self.is_stale(name):
+            raise WeightStoreError(
+                f"'{name}' se descargó de {self.index[name]['source']} y ahora se usa "
+                f"{WEIGHT_SOURCES[name]}: ejecuta python -m src.weights --populate"
+            )
+        if not self.has(name):
+            raise WeightStoreError(f"'{name}' no está en el almacén ({self.root})")
+        return self._blob_path(self.index[name]['sha256'], '.safetensors')
+
+    def load_state_dict(self, name, verify=None):
+        """
+        State dict de torch mapeado en memoria (sin copias).
+
+        Args:
+            name: Nombre del peso
+            verify: Verificar el sha256 antes de cargar
+                (por defecto CONFIG['weights_verify_on_load'])
+        """
+        path = self.path(name)
+        verify = CONFIG['weights_verify_on_load'] if verify is None else verify
+        if verify and sha256_file(path) != self.index[name]['sha256']:
+            raise WeightStoreError(f"'{name}' está corrupto: el checksum no coincide")
+        arrays, _ = read_safetensors_mmap(path)
+        return to_torch_state_dict(arrays)
+
+    def export_facexlib(self, target_dir):
+        """
+        Deja los .pth de facexlib donde los busca FaceRestoreHelper, para
+        que no intente descargarlos.
+        """
+        os.makedirs(target_dir, exist_ok=True)
+        for name, filename in FACEXLIB_FILES.items():
+            target = os.path.join(target_dir, filename)
+            if os.path.exists(target) or not self.has(name):
+                continue
+            source = self._blob_path(self.index[name]['source_sha256'], '.pth')
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_weight_store():
+    """Almacén de pesos del proceso (None si está desactivado en CONFIG)."""
+    global _default_store
+    if not CONFIG['use_weight_store']:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = WeightStore()
+        return _default_store
+
+
+def main(argv=None):
+    """CLI del almacén de pesos."""
+    parser = argparse.ArgumentParser(description="Almacén local de pesos")
+    parser.add_argument("--root", default=None, help="Carpeta del almacén")
+    parser.add_argument("--populate", action="store_true", help="Descargar los pesos que falten")
+    parser.add_argument("--force", action="store_true", help="Volver a descargar todo")
+    parser.add_argument("--verify", action="store_true", help="Comprobar checksums")
+    args = parser.parse_args(argv)
+
+    store = WeightStore(args.root)
+    if args.populate:
+        print(json.dumps(store.populate(force=args.force), indent=2))
+    if args.verify:
+        status = store.verify()
+        print(json.dumps(status, indent=2))
+        return 0 if all(status.values()) else 1
+    if not (args.populate or args.verify):
+        print(json.dumps(store.index, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+"""
+Configuración común de las pruebas.
+
+Las pruebas no necesitan torch ni los pesos de los modelos: usan imágenes
+sintéticas y sustitutos ligeros del ImageEnhancer.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Los módulos se importan como en la app: from config import CONFIG, from src...
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def textured_image(height, width, seed=0):
+    """Imagen BGR con estructura (gradientes y manchas), no ruido puro."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.zeros((height, width, 3), np.float32)
+    for channel in range(3):
+        for _ in range(6):
+            cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+            radius = rng.uniform(0.1, 0.4) * max(height, width)
+            image[..., channel] += rng.uniform(40, 120) * np.exp(
+                -((xs - cx) ** 2 + (ys - cy) ** 2) / (2 * radius ** 2))
+    image += (xs / width * 60)[..., None]
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def config():
+    """CONFIG de la app; los cambios se deshacen al terminar cada prueba."""
+    from config import CONFIG
+
+    saved = dict(CONFIG)
+    yield CONFIG
+    CONFIG.clear()
+    CONFIG.update(saved)
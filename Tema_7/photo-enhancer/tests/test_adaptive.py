@@ -0,0 +1,75 @@
+"""Resolución adaptativa (src/adaptive.py)."""
+
+import pytest
+
+from src.adaptive import LatencyModel, plan_resolution
+from src.metrics import Trace
+from tests.conftest import textured_image
+
+
+def test_small_input_keeps_native_resolution():
+    plan = plan_resolution(100, 200, upscale=2, pixel_budget=1_000_000)
+    assert plan.work_scale == 1.0 and plan.work_size == (200, 100)
+    image = textured_image(100, 200)
+    assert plan.work_image(image) is image
+
+
+def test_pixel_budget_reduces_work_copy_only():
+    plan = plan_resolution(2000, 4000, upscale=2, pixel_budget=2_000_000)
+    work_w, work_h = plan.work_size
+    assert work_w * work_h <= 2_000_000 * 1.01
+    assert plan.bg_outscale == pytest.approx(2 / plan.work_scale)
+    assert plan.to_dict()['output_size'] == [8000, 4000]
+
+
+def test_work_image_is_resized_to_plan():
+    plan = plan_resolution(200, 400, upscale=2, pixel_budget=20_000)
+    work_w, work_h = plan.work_size
+    assert plan.work_image(textured_image(200, 400)).shape[:2] == (work_h, work_w)
+    assert work_w == 200 and work_h == 100
+
+
+def test_output_long_side_caps_upscale():
+    plan = plan_resolution(500, 1000, upscale=4, output_long_side=1500)
+    assert plan.upscale == 1.5 and plan.to_dict()['output_size'] == [1500, 750]
+    # Nunca se escala más de lo pedido
+    assert plan_resolution(500, 1000, upscale=2, output_long_side=5000).upscale == 2
+
+
+def test_stricter_budget_wins():
+    model = LatencyModel(seconds_per_mp=1.0, seconds_per_face=0.5)
+    # 2 s - 1 cara * 0.5 s = 1.5 MP, más estricto que 4 MP
+    plan = plan_resolution(2000, 2000, upscale=2, pixel_budget=4_000_000,
+                           latency_budget_s=2.0, latency_model=model)
+    work_w, work_h = plan.work_size
+    assert work_w * work_h == pytest.approx(1_500_000, rel=0.01)
+    assert len(plan.reasons) == 3
+
+
+def test_latency_budget_keeps_a_floor():
+    model = LatencyModel(seconds_per_mp=1.0, seconds_per_face=10.0)
+    assert model.pixel_budget(2.0) == 200_000
+
+
+def make_trace(work_size, stages, faces, **attributes):
+    trace = Trace(adaptive={'work_size': work_size}, faces=faces, **attributes)
+    trace.stages = [{'stage': name, 'wall_s': wall} for name, wall in stages]
+    return trace
+
+
+def test_latency_model_learns_from_traces():
+    model = LatencyModel(seconds_per_mp=1.0, seconds_per_face=1.0, alpha=0.5)
+    model.observe(make_trace([1000, 1000], [('face_detection', 1.0),
+                                            ('background_upsampling', 2.0),
+                                            ('face_restoration', 6.0)], faces=2))
+    assert model.to_dict() == {'seconds_per_mp': 2.0, 'seconds_per_face': 2.0,
+                               'expected_faces': 1.5}
+
+
+def test_latency_model_ignores_reused_results():
+    model = LatencyModel(seconds_per_mp=1.0, seconds_per_face=1.0)
+    stages = [('face_detection', 5.0)]
+    model.observe(make_trace([1000, 1000], stages, faces=1, cache_hit=True))
+    model.observe(make_trace([1000, 1000], stages, faces=1, dedup={'accepted': True}))
+    model.observe(Trace())
+    assert model.seconds_per_mp == 1.0
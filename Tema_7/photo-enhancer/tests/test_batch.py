@@ -0,0 +1,135 @@
+"""Lotes sin Streamlit (src/batch.py) con un enhancer sustituto."""
+
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import src.batch as batch
+from src.batch import (PROGRESS_FILE, find_images, load_progress, output_path_for,
+                       plan_outputs, read_manifest, run_batch, summarize)
+from tests.conftest import textured_image
+
+
+class FakeEnhancer:
+    """Escala x2; falla con las imágenes de 8 px de alto."""
+
+    def enhance(self, image_bgr, **options):
+        if image_bgr.shape[0] == 8:
+            raise RuntimeError("imagen rota")
+        return cv2.resize(image_bgr, None, fx=2, fy=2, interpolation=cv2.INTER_NEAREST)
+
+    def enhance_many(self, images_bgr, **options):
+        return [self.enhance(image) for image in images_bgr]
+
+
+@pytest.fixture
+def fake_worker(monkeypatch):
+    monkeypatch.setattr(batch, '_worker_enhancer', FakeEnhancer())
+
+
+def write_image(path, height=16, width=24):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(path, textured_image(height, width))
+
+
+def task(tmp_path, name, options=None):
+    return (str(tmp_path / "in" / name), output_path_for(name, str(tmp_path / "out")), name,
+            options or {}, None)
+
+
+def test_find_images_recurses_and_filters(tmp_path):
+    for name in ("b.png", "sub/a.JPG", "notas.txt", "sub/deep/c.jpeg"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    assert find_images(str(tmp_path)) == sorted(
+        ["b.png", os.path.join("sub", "a.JPG"), os.path.join("sub", "deep", "c.jpeg")])
+
+
+def test_manifest_and_output_paths(tmp_path):
+    manifest = tmp_path / "lista.txt"
+    manifest.write_text("# fotos\nuno.jpg\n\n  dos/tres.png  \n", encoding='utf-8')
+    assert read_manifest(str(manifest)) == ["uno.jpg", "dos/tres.png"]
+    assert output_path_for("dos/tres.jpg", "out") == os.path.join("out", "dos/tres.png")
+    assert output_path_for("/abs/C:foto.jpg", "out") == os.path.join("out", "abs/Cfoto.png")
+
+
+def test_same_name_inputs_keep_their_extension():
+    outputs = plan_outputs(["a.jpg", "a.png", "b.jpg", "sub/a.jpg"], "out")
+    assert outputs == {
+        "a.jpg": os.path.join("out", "a.jpg.png"),
+        "a.png": os.path.join("out", "a.png.png"),
+        "b.jpg": os.path.join("out", "b.png"),
+        "sub/a.jpg": os.path.join("out", "sub/a.png"),
+    }
+    # No depende del orden ni de qué entradas estén ya hechas
+    assert plan_outputs(["a.png", "a.jpg"], "out")["a.jpg"] == outputs["a.jpg"]
+
+
+def test_unresolvable_output_collision_fails():
+    with pytest.raises(ValueError):
+        plan_outputs(["a.jpg.png", "a.jpg", "a.png"], "out")
+
+
+def test_progress_skips_failures_and_truncated_lines(tmp_path):
+    lines = [json.dumps({'input': 'a.png', 'ok': True}),
+             json.dumps({'input': 'b.png', 'ok': False}),
+             '{"input": "c.png", "o']
+    (tmp_path / PROGRESS_FILE).write_text("\n".join(lines), encoding='utf-8')
+    assert load_progress(str(tmp_path)) == {'a.png'}
+
+
+def test_process_one_writes_png(tmp_path, fake_worker):
+    write_image(str(tmp_path / "in" / "sub" / "foto.jpg"))
+    result = batch._process_one(task(tmp_path, "sub/foto.jpg"))
+    assert result['ok'] and result['error'] is None
+    assert cv2.imread(result['output']).shape == (32, 48, 3)
+    assert not os.path.exists(result['output'] + ".tmp.png")
+
+
+def test_process_one_records_errors(tmp_path, fake_worker):
+    write_image(str(tmp_path / "in" / "rota.png"), height=8)
+    result = batch._process_one(task(tmp_path, "rota.png"))
+    assert not result['ok'] and "imagen rota" in result['error']
+    assert not os.path.exists(result['output'])
+
+
+def test_process_group_shares_one_call(tmp_path, fake_worker):
+    for name in ("a.png", "b.png"):
+        write_image(str(tmp_path / "in" / name))
+    results = batch._process_group([task(tmp_path, "a.png"), task(tmp_path, "b.png"),
+                                    task(tmp_path, "falta.png")])
+    by_input = {result['input']: result for result in results}
+    assert by_input['a.png']['ok'] and by_input['b.png']['ok']
+    assert not by_input['falta.png']['ok']
+    assert by_input['a.png']['latency'] == by_input['b.png']['latency']
+
+
+def test_summarize():
+    results = [{'ok': True, 'latency': 1.0}, {'ok': True, 'latency': 3.0},
+               {'ok': False, 'latency': 0.1}]
+    summary = summarize(results, 2.0)
+    assert summary['processed'] == 2 and summary['failed'] == 1
+    assert summary['images_per_s'] == 1.0 and summary['latency_mean_s'] == 2.0
+    assert summary['latency_max_s'] == 3.0
+
+
+def test_resume_skips_finished_images(tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / PROGRESS_FILE).write_text(json.dumps({'input': 'a.png', 'ok': True}) + "\n",
+                                     encoding='utf-8')
+    summary = run_batch(["a.png"], str(out), base_dir=str(tmp_path), workers=1)
+    assert summary['skipped'] == 1 and summary['processed'] == 0
+
+
+def test_threads_are_shared_between_workers(config, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 8)
+    config['torch_intra_op_threads'] = None
+    assert batch.default_threads_per_worker(2) == 4
+    assert batch.default_threads_per_worker(16) == 1
+    config['torch_intra_op_threads'] = 3
+    assert batch.default_threads_per_worker(2) == 3
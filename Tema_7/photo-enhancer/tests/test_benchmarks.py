@@ -0,0 +1,50 @@
+"""Corpus y suite de benchmarks (benchmarks/) con los modelos sustitutos."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+
+from benchmarks.corpus import build_corpus, synthetic_image, synthetic_portrait  # noqa: E402
+from benchmarks.run_benchmarks import OPTION_COMBOS, latency_summary, main  # noqa: E402
+from src.stubs import StubFaceHelper  # noqa: E402
+
+
+def test_synthetic_images_are_deterministic():
+    np.testing.assert_array_equal(synthetic_image(64, 48, seed=3), synthetic_image(64, 48, seed=3))
+    assert not np.array_equal(synthetic_image(64, 48, seed=3), synthetic_image(64, 48, seed=4))
+    assert synthetic_image(64, 48).shape == (48, 64, 3)
+
+
+@pytest.mark.parametrize('faces', [0, 1, 5])
+def test_stub_detector_finds_synthetic_faces(faces):
+    image, boxes = synthetic_portrait(640, 480, faces)
+    assert len(boxes) == faces
+    assert all(0 <= x0 < x1 <= 640 and 0 <= y0 < y1 <= 480 for x0, y0, x1, y1 in boxes)
+    helper = StubFaceHelper(upscale_factor=2)
+    helper.read_image(image)
+    helper.get_face_landmarks_5()
+    assert len(helper.det_faces) == faces
+
+
+def test_corpus_names():
+    corpus = build_corpus([(64, 48), (96, 64)], [0, 2], include_bundled=False)
+    assert [name for name, _ in corpus] == [
+        'synthetic_64x48_0f', 'synthetic_64x48_2f', 'synthetic_96x64_0f', 'synthetic_96x64_2f']
+
+
+def test_latency_summary():
+    summary = latency_summary([2.0, 1.0, 1.0, 4.0], pixels=1_000_000)
+    assert summary['runs'] == 4 and summary['p50_s'] == 1.5 and summary['mean_s'] == 2.0
+    assert summary['images_per_s'] == 0.5 and summary['megapixels_per_s'] == 0.5
+
+
+def test_stub_suite_runs_offline(tmp_path):
+    output = tmp_path / "report.json"
+    report = main(['--resolutions', '160x120', '--faces', '0', '1', '--repeat', '1',
+                   '--warmup', '0', '--skip-utils', '--output', str(output)])
+    assert output.exists()
+    # Dos imágenes sintéticas más imagen1.jpg
+    assert len(report['pipeline']) == 3 * len(OPTION_COMBOS)
+    faces = {row['image']: row['faces'] for row in report['pipeline']}
+    assert faces['synthetic_160x120_0f'] == 0 and faces['synthetic_160x120_1f'] == 1
@@ -0,0 +1,82 @@
+import numpy as np
+
+from conftest import textured_image
+from src.cache import ResultCache, options_key, result_key
+
+
+def test_result_key_depends_on_pixels_and_options():
+    image = textured_image(64, 64)
+    other = image.copy()
+    other[0, 0, 0] ^= 1
+    assert result_key(image) == result_key(image.copy())
+    assert result_key(image) != result_key(other)
+    assert result_key(image) != result_key(image, repair_scratches=True)
+    assert result_key(image) != result_key(image, enhance_background=True)
+    assert result_key(image) != result_key(image, extra={'adaptive': [32, 32]})
+
+
+def test_result_key_depends_on_model_config(config):
+    image = textured_image(64, 64)
+    before = result_key(image)
+    config['upscale'] = config['upscale'] + 1
+    assert result_key(image) != before
+
+
+def test_cpu_fast_mode_invalidates_keys(config):
+    image = textured_image(64, 64)
+    config['cpu_fast_mode'] = False
+    fp32 = result_key(image), options_key()
+
+    config['cpu_fast_mode'] = True
+    config['cpu_quantize_linear'], config['cpu_bf16'] = True, False
+    int8 = result_key(image), options_key()
+    config['cpu_bf16'] = True
+    bf16 = result_key(image), options_key()
+
+    assert len({fp32, int8, bf16}) == 3
+
+
+def test_fast_mode_flags_ignored_without_fast_mode(config):
+    image = textured_image(64, 64)
+    config['cpu_fast_mode'] = False
+    config['cpu_quantize_linear'] = True
+    before = result_key(image)
+    config['cpu_quantize_linear'] = False
+    assert result_key(image) == before
+
+
+def test_cache_roundtrip_and_stats(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    image = textured_image(32, 48)
+    assert cache.get('missing') is None
+    cache.put('k', image)
+    np.testing.assert_array_equal(cache.get('k'), image)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    image = textured_image(64, 64)
+    entry_bytes = image.nbytes + 128
+    cache = ResultCache(str(tmp_path), max_bytes=int(entry_bytes * 2.5))
+    cache.put('a', image)
+    cache.put('b', image)
+    cache.get('a')
+    cache.put('c', image)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_survives_restart(tmp_path):
+    image = textured_image(16, 16)
+    ResultCache(str(tmp_path)).put('k', image)
+    np.testing.assert_array_equal(ResultCache(str(tmp_path)).get('k'), image)
+
+
+def test_missing_file_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put('k', textured_image(16, 16))
+    (tmp_path / 'k.npy').unlink()
+    assert cache.get('k') is None
+    assert cache.stats()['entries'] == 0
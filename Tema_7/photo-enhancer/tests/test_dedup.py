@@ -0,0 +1,75 @@
+import cv2
+
+from conftest import textured_image
+from src.dedup import DedupIndex, dhash, hamming, phash, reuse_result
+
+
+def _index(tmp_path):
+    return DedupIndex(str(tmp_path / "dedup.sqlite"))
+
+
+def test_resized_copy_has_close_hashes():
+    image = textured_image(400, 600)
+    small = cv2.resize(image, (300, 200), interpolation=cv2.INTER_AREA)
+    assert hamming(phash(image), phash(small)) <= 6
+    assert hamming(dhash(image), dhash(small)) <= 10
+
+
+def test_find_matches_same_photo_and_respects_options(tmp_path):
+    index = _index(tmp_path)
+    image = textured_image(400, 600)
+    index.add(image, 'opts', 'key-1')
+    smaller = cv2.resize(image, (300, 200), interpolation=cv2.INTER_AREA)
+
+    match = index.find(smaller, 'opts')
+    assert match['result_key'] == 'key-1'
+    assert match['size'] == (600, 400)
+    assert index.find(smaller, 'other-options') is None
+
+
+def test_find_rejects_smaller_stored_input(tmp_path):
+    # Regresión: la miniatura procesada antes no debe servir para la foto grande
+    index = _index(tmp_path)
+    image = textured_image(500, 500)
+    thumbnail = cv2.resize(image, (125, 125), interpolation=cv2.INTER_AREA)
+    index.add(thumbnail, 'opts', 'thumb')
+
+    assert index.find(image, 'opts') is None
+    assert index.find(thumbnail, 'opts')['result_key'] == 'thumb'
+
+
+def test_find_rejects_crops(tmp_path):
+    index = _index(tmp_path)
+    image = textured_image(400, 600)
+    index.add(image, 'opts', 'key-1')
+    assert index.find(image[:, :400], 'opts') is None
+
+
+def test_forget_removes_entry(tmp_path):
+    index = _index(tmp_path)
+    image = textured_image(200, 200)
+    index.add(image, 'opts', 'key-1')
+    index.forget('key-1')
+    assert index.find(image, 'opts') is None
+    assert index.stats()['entries'] == 0
+
+
+def test_reuse_result_downscales_and_registers():
+    image = textured_image(400, 400)
+    result = cv2.resize(image, (1600, 1600), interpolation=cv2.INTER_CUBIC)
+    smaller = cv2.resize(image, (200, 200), interpolation=cv2.INTER_AREA)
+
+    reused, info = reuse_result(result, smaller, upscale=2)
+    assert reused.shape == (400, 400, 3)
+    assert info['scale'] == 0.25
+    assert info['response'] >= 0.2
+
+
+def test_reuse_result_never_upscales():
+    image = textured_image(500, 500)
+    thumbnail_result = cv2.resize(image, (250, 250), interpolation=cv2.INTER_AREA)
+
+    reused, info = reuse_result(thumbnail_result, image, upscale=2)
+    assert reused is None
+    assert info['scale'] == 4.0
+    assert info['rejected'] == 'upscale'
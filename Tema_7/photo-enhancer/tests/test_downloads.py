@@ -0,0 +1,65 @@
+"""Codificación de descargas en segundo plano (src/downloads.py)."""
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.downloads import DownloadEncoder, encode_image
+from tests.conftest import textured_image
+
+
+@pytest.fixture
+def encoder():
+    encoder = DownloadEncoder(workers=2, max_entries=3)
+    yield encoder
+    encoder.close()
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize('fmt', ['png', 'webp'])
+def test_lossless_formats_roundtrip(fmt):
+    image = textured_image(24, 32)
+    np.testing.assert_array_equal(decode(encode_image(image, fmt)), image)
+
+
+def test_pil_images_are_encoded_as_rgb():
+    image = textured_image(24, 32)
+    pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    np.testing.assert_array_equal(decode(encode_image(pil, 'png')), image)
+    assert encode_image(image, 'jpeg')[:2] == b'\xff\xd8'
+
+
+def test_unknown_format():
+    with pytest.raises(KeyError):
+        encode_image(textured_image(8, 8), 'bmp')
+
+
+def test_each_result_is_encoded_once(encoder):
+    image = textured_image(16, 16)
+    first = encoder.submit('r1', image, 'png')
+    assert encoder.submit('r1', image, 'png') is first
+    assert encoder.get('r1', 'png') is first
+    assert encoder.submit('r1', image, 'jpeg') is not first
+    np.testing.assert_array_equal(decode(first.result(5)), image)
+
+
+def test_oldest_encodings_are_dropped(encoder):
+    image = textured_image(16, 16)
+    for result_id in ('a', 'b', 'c'):
+        encoder.submit(result_id, image, 'png')
+    encoder.submit('a', image, 'png')  # 'a' pasa a ser el más reciente
+    encoder.submit('d', image, 'png')
+    assert encoder.get('b', 'png') is None
+    assert encoder.get('a', 'png') is not None
+
+
+def test_prefetch_and_forget(encoder):
+    image = textured_image(16, 16)
+    encoder.prefetch('r1', image, formats=('png', 'webp'))
+    assert encoder.get('r1', 'webp') is not None
+    encoder.forget('r1')
+    assert encoder.get('r1', 'png') is None and encoder.get('r1', 'webp') is None
@@ -0,0 +1,98 @@
+"""Lectura de las subidas (src/ingest.py): orientación EXIF y límite de píxeles."""
+
+import io
+import struct
+import warnings
+import zlib
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.ingest import (IngestError, PixelLimitError, apply_orientation, decode_bgr,
+                        decode_pil, probe, reduction)
+from tests.conftest import textured_image
+
+
+def encode(image_bgr, fmt, orientation=1, **params):
+    image = Image.fromarray(np.ascontiguousarray(image_bgr[..., ::-1]))
+    exif = image.getexif()
+    if orientation != 1:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, exif=exif, **params)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """PNG con cabecera de width x height y sin datos (no se decodifica)."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IEND', b''))
+
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test_orientation_matches_pil(orientation):
+    source = textured_image(24, 40, seed=orientation)
+    data = encode(source, 'PNG', orientation)
+    image_bgr, info = decode_bgr(data)
+    assert info.orientation == orientation
+    assert image_bgr.shape[1::-1] == info.oriented_size
+    pil_rgb = np.asarray(decode_pil(data)[0])
+    np.testing.assert_array_equal(image_bgr, pil_rgb[..., ::-1])
+
+
+def test_apply_orientation_six_rotates_clockwise():
+    image = np.arange(6, dtype=np.uint8).reshape(2, 3)
+    np.testing.assert_array_equal(apply_orientation(image, 6), np.rot90(image, -1))
+
+
+def test_reduced_jpeg_decode(config):
+    data = encode(textured_image(400, 800), 'JPEG', quality=90)
+    image_bgr, info = decode_bgr(data, max_side=200)
+    assert reduction(info, 200) == 4
+    assert image_bgr.shape == (100, 200, 3)
+    assert decode_pil(data, max_side=200)[0].size == (200, 100)
+
+
+def test_limit_below_pil_default_has_no_warning(config):
+    # 95 MP: por encima del límite por defecto de PIL (~89 MP), dentro del nuestro
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        info = probe(png_header(10_000, 9_500))
+    assert info.pixels == 95_000_000
+
+
+def test_pil_global_limit_is_left_alone():
+    import src.ingest  # noqa: F401
+
+    assert Image.MAX_IMAGE_PIXELS == int(1024 * 1024 * 1024 // 4 // 3)
+
+
+@pytest.mark.parametrize('megapixels', [150, 250])
+def test_too_many_pixels_is_a_pixel_limit_error(config, megapixels):
+    with pytest.raises(PixelLimitError):
+        probe(png_header(10_000, megapixels * 100))
+
+
+def test_explicit_limit(config):
+    with pytest.raises(PixelLimitError, match="el máximo es"):
+        decode_bgr(encode(textured_image(100, 100), 'PNG'), max_pixels=5_000)
+
+
+def test_not_an_image():
+    with pytest.raises(IngestError) as error:
+        decode_bgr(b"esto no es una imagen")
+    assert not isinstance(error.value, PixelLimitError)
+
+
+def test_service_answers_413_for_huge_images():
+    from src.service import ServiceError, decode_image
+
+    with pytest.raises(ServiceError) as error:
+        decode_image(png_header(20_000, 20_000))
+    assert error.value.status == 413
@@ -0,0 +1,104 @@
+"""Cola de trabajos (src/jobs.py) con un enhancer sustituto."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.jobs import CANCELLED, DONE, FAILED, JobQueue, QueueFullError
+
+
+class FakeEnhancer:
+    """Devuelve la imagen invertida; gate bloquea los trabajos."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def enhance(self, image_bgr, progress=None, trace=None, **options):
+        self.gate.wait(5)
+        progress('fake', 1.0)
+        if options.get('fail'):
+            raise ValueError("fallo de prueba")
+        return 255 - image_bgr
+
+
+def wait(queue, job):
+    for _ in range(500):
+        if job.finished:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError("El trabajo no termina")
+
+
+@pytest.fixture
+def enhancer():
+    return FakeEnhancer()
+
+
+def test_job_runs_and_reports_progress(enhancer):
+    queue = JobQueue(enhancer, workers=1)
+    try:
+        job = wait(queue, queue.submit(np.zeros((4, 4, 3), np.uint8)))
+        assert job.status == DONE
+        assert (job.result == 255).all()
+        assert [stage for stage, _ in job.stages] == ['fake']
+        assert job.args is None and job.kwargs is None
+    finally:
+        queue.close()
+
+
+def test_failure_is_recorded(enhancer):
+    queue = JobQueue(enhancer, workers=1)
+    try:
+        job = wait(queue, queue.submit(np.zeros((4, 4, 3), np.uint8), fail=True))
+        assert job.status == FAILED and "fallo de prueba" in job.error
+    finally:
+        queue.close()
+
+
+def test_backpressure_and_cancel(enhancer):
+    enhancer.gate.clear()
+    queue = JobQueue(enhancer, workers=1, max_pending=1)
+    try:
+        running = queue.submit(np.zeros((4, 4, 3), np.uint8))
+        while running.status != 'running':
+            threading.Event().wait(0.01)
+        waiting = queue.submit(np.zeros((4, 4, 3), np.uint8))
+        assert queue.position(waiting.id) == 1
+        with pytest.raises(QueueFullError):
+            queue.submit(np.zeros((4, 4, 3), np.uint8))
+        assert queue.cancel(waiting.id)
+        assert waiting.status == CANCELLED
+        # El hueco liberado admite otro trabajo
+        queue.submit(np.zeros((4, 4, 3), np.uint8))
+    finally:
+        enhancer.gate.set()
+        queue.close()
+
+
+def test_old_finished_jobs_are_evicted(enhancer):
+    evicted = []
+    queue = JobQueue(enhancer, workers=1, max_finished=2, on_evict=evicted.append)
+    try:
+        jobs = [wait(queue, queue.submit(np.zeros((4, 4, 3), np.uint8))) for _ in range(3)]
+        assert evicted == [jobs[0]]
+        assert queue.get(jobs[0].id) is None and queue.get(jobs[2].id) is jobs[2]
+    finally:
+        queue.close()
+
+
+def test_forget_releases_job_and_its_slot(enhancer):
+    evicted = []
+    queue = JobQueue(enhancer, workers=1, max_finished=2, on_evict=evicted.append)
+    try:
+        job = wait(queue, queue.submit(np.zeros((4, 4, 3), np.uint8)))
+        queue.forget(job.id)
+        assert evicted == [job] and queue.get(job.id) is None
+        assert job.id not in queue._finished_order
+        # Olvidado a mano, no cuenta para max_finished
+        others = [wait(queue, queue.submit(np.zeros((4, 4, 3), np.uint8))) for _ in range(2)]
+        assert evicted == [job]
+        assert all(queue.get(other.id) is other for other in others)
+    finally:
+        queue.close()
@@ -0,0 +1,131 @@
+"""Imágenes grandes por franjas (src/large_image.py) con un enhancer sustituto."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import src.large_image as large_image
+from src.large_image import (LargeImageProcessor, next_strip_end, plan_strips,
+                             spill_to_memmap)
+from tests.conftest import textured_image
+
+
+class PixelEnhancer:
+    """Escala x2 repitiendo píxeles: el resultado no depende del contexto."""
+
+    def __init__(self):
+        self.strips = []
+
+    def enhance(self, image_bgr, **options):
+        self.strips.append(image_bgr.shape[0])
+        return np.repeat(np.repeat(image_bgr, 2, axis=0), 2, axis=1)
+
+
+@pytest.fixture
+def no_face_seams(config, monkeypatch):
+    """Sin detección de caras y sin medir la memoria real del proceso."""
+    config['large_face_seams'] = False
+    config['large_bytes_per_pixel'] = 400
+    monkeypatch.setattr(large_image, 'peak_rss_bytes', lambda: None)
+    return config
+
+
+def test_plan_covers_image_with_overlap(config):
+    config['large_bytes_per_pixel'] = 100
+    strips = plan_strips(100, 1000, 100 * 100 * 100, overlap=8)
+    assert strips[0][0] == 0 and strips[-1][1] == 1000
+    assert all(end - start <= 100 for start, end in strips)
+    assert all(prev[1] - nxt[0] == 8 for prev, nxt in zip(strips, strips[1:]))
+
+
+def test_plan_rejects_ceiling_too_small(config):
+    config['large_bytes_per_pixel'] = 100
+    with pytest.raises(ValueError):
+        plan_strips(1000, 1000, 1000 * 20 * 100, overlap=8)
+
+
+def test_seams_avoid_faces():
+    # Sin caras la franja acabaría en 100 y la banda de solape sería 92..100
+    assert next_strip_end(0, 1000, 100, 8) == (100, False)
+    end, cut = next_strip_end(0, 1000, 100, 8, faces=[(70, 130)])
+    assert not cut and end == 70
+    strips = plan_strips(10, 1000, 10 * 100 * 400, overlap=8, faces=[(70, 130)],
+                         bytes_per_pixel=400)
+    # La cara queda entera dentro de una franja
+    assert any(start <= 70 and end >= 130 for start, end in strips)
+
+
+def test_face_taller_than_strip_is_reported():
+    assert next_strip_end(0, 1000, 100, 8, faces=[(20, 400)]) == (100, True)
+
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test_spill_applies_orientation(tmp_path, orientation):
+    rgb = textured_image(30, 50, seed=orientation)[..., ::-1]
+    image = Image.fromarray(np.ascontiguousarray(rgb))
+    spilled = spill_to_memmap(image, str(tmp_path / "in.npy"), orientation, rows_per_chunk=7)
+    expected = image.transpose(large_image._TRANSPOSES[orientation]) if orientation > 1 else image
+    np.testing.assert_array_equal(spilled, np.asarray(expected)[..., ::-1])
+
+
+def test_strips_match_whole_image(tmp_path, no_face_seams):
+    source = textured_image(300, 40, seed=3)
+    path = str(tmp_path / "big.png")
+    Image.fromarray(source[..., ::-1]).save(path)
+    enhancer = PixelEnhancer()
+    report = LargeImageProcessor(enhancer, max_peak_mb=0.5, overlap=8).process(
+        path, str(tmp_path / "out.npy"))
+    assert report['strips'] > 1 and report['scale'] == 2
+    output = np.load(str(tmp_path / "out.npy"))
+    np.testing.assert_array_equal(output, PixelEnhancer().enhance(source))
+
+
+def test_exif_orientation_is_applied(tmp_path, no_face_seams):
+    source = textured_image(40, 60, seed=4)
+    image = Image.fromarray(source[..., ::-1])
+    exif = image.getexif()
+    exif[0x0112] = 6
+    path = str(tmp_path / "rotated.png")
+    image.save(path, exif=exif)
+    report = LargeImageProcessor(PixelEnhancer(), max_peak_mb=0.5, overlap=8).process(
+        path, str(tmp_path / "out.npy"))
+    assert report['orientation'] == 6
+    assert np.load(str(tmp_path / "out.npy")).shape == (120, 80, 3)
+
+
+def test_measured_cost_shrinks_strips(tmp_path, no_face_seams, monkeypatch):
+    memory = {'rss': 0, 'peak': 0}
+
+    class HungryEnhancer(PixelEnhancer):
+        """Cada píxel cuesta 800 bytes, el doble de la estimación."""
+
+        def enhance(self, image_bgr, **options):
+            memory['peak'] = memory['rss'] + image_bgr.shape[0] * image_bgr.shape[1] * 800
+            memory['rss'] += 1
+            return super().enhance(image_bgr, **options)
+
+    monkeypatch.setattr(large_image, 'current_rss_bytes', lambda: memory['rss'])
+    monkeypatch.setattr(large_image, 'peak_rss_bytes', lambda: memory['peak'])
+    path = str(tmp_path / "big.png")
+    Image.fromarray(textured_image(300, 32, seed=5)).save(path)
+    enhancer = HungryEnhancer()
+    report = LargeImageProcessor(enhancer, max_peak_mb=0.5, overlap=4).process(
+        path, str(tmp_path / "out.npy"))
+    # 0.5 MB / (32 px * 400 B) = 40 filas; medido a 800 B/px, 20
+    assert enhancer.strips[:2] == [40, 40]
+    assert max(enhancer.strips[2:]) <= 20
+    assert report['bytes_per_pixel'] == 800
+    assert report['strips_over_ceiling'] == 1
+
+
+def test_face_rows_drive_the_seams(tmp_path, no_face_seams, monkeypatch):
+    no_face_seams['large_face_seams'] = True
+    monkeypatch.setattr(LargeImageProcessor, 'face_rows', lambda self, image: [(30, 45)])
+    path = str(tmp_path / "big.png")
+    Image.fromarray(textured_image(300, 40, seed=6)).save(path)
+    enhancer = PixelEnhancer()
+    report = LargeImageProcessor(enhancer, max_peak_mb=0.5, overlap=8).process(
+        path, str(tmp_path / "out.npy"))
+    # La primera franja (32 filas) partiría la cara: acaba justo encima
+    assert enhancer.strips[0] == 30
+    assert report['faces'] == 1 and report['cut_faces'] == 0
@@ -0,0 +1,81 @@
+"""Trazas por etapa, histogramas y sinks (src/metrics.py)."""
+
+import json
+
+import numpy as np
+import pytest
+
+from src.metrics import (Histogram, HistogramRegistry, JsonLinesSink, MetricsRecorder, Trace,
+                         percentile)
+
+
+def test_stage_records_shape_and_times():
+    trace = Trace(request_id='r1', mode='faces')
+    with trace.stage('decode', image=np.zeros((20, 30, 3), np.uint8)) as record:
+        record['faces'] = 2
+    trace.finish()
+    stage = trace.stages[0]
+    assert (stage['stage'], stage['height'], stage['width'], stage['faces']) == ('decode', 20, 30, 2)
+    assert stage['wall_s'] >= 0 and stage['cpu_s'] >= 0
+    assert 'peak_rss_bytes' not in stage
+    data = trace.to_dict()
+    assert data['request_id'] == 'r1' and data['attributes'] == {'mode': 'faces'}
+    assert data['total_s'] is not None
+    assert data['process_peak_rss_bytes'] == trace.process_peak_rss_bytes
+
+
+def test_stage_is_recorded_when_it_raises():
+    trace = Trace()
+    with pytest.raises(ValueError):
+        with trace.stage('restore'):
+            raise ValueError
+    assert [stage['stage'] for stage in trace.stages] == ['restore']
+
+
+def test_copies_accumulate():
+    trace = Trace()
+    trace.count_copy('rgb', 100)
+    trace.count_copy('rgb', 50)
+    assert trace.to_dict()['frame_copies'] == {'rgb': {'count': 2, 'bytes': 150}}
+
+
+def test_percentile_and_histogram_quantiles():
+    assert percentile([], 50) == 0.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    histogram = Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 0.5, 1.5, 4, 10):
+        histogram.observe(value)
+    assert histogram.quantile(0.4) == 1
+    assert histogram.quantile(0.6) == 2
+    assert histogram.quantile(1.0) == float('inf')
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_registry_summarizes_stages():
+    registry = HistogramRegistry(buckets=(1, 10))
+    for _ in range(3):
+        trace = Trace()
+        with trace.stage('restore'):
+            pass
+        trace.finish()
+        registry.emit(trace)
+    summary = registry.summary()
+    assert set(summary) == {'restore.wall_s', 'restore.cpu_s', 'total.wall_s'}
+    assert summary['restore.wall_s']['count'] == 3
+    assert summary['restore.wall_s']['p95'] == 1
+
+
+def test_json_lines_sink_and_broken_sinks(tmp_path):
+    path = tmp_path / "sub" / "traces.jsonl"
+
+    class Broken:
+        def emit(self, trace):
+            raise RuntimeError
+
+    recorder = MetricsRecorder([Broken(), JsonLinesSink(str(path))])
+    for request_id in ('a', 'b'):
+        trace = Trace(request_id=request_id)
+        trace.finish()
+        recorder.emit(trace)
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['request_id'] for line in lines] == ['a', 'b']
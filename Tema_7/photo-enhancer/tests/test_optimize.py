@@ -0,0 +1,60 @@
+"""Modo rápido para CPU (src/optimize.py)."""
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from src.optimize import configure_threads, optimize_module  # noqa: E402
+
+
+class TinyNet(torch.nn.Module):
+    """Convolución seguida de una modulación lineal, como en GFPGAN."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv2d(3, 8, 3, padding=1)
+        self.style = torch.nn.Linear(8, 8)
+
+    def forward(self, x):
+        features = self.conv(x)
+        scale = self.style(features.mean(dim=(2, 3)))
+        return features * scale[:, :, None, None]
+
+
+@pytest.fixture
+def net_and_input():
+    return TinyNet().eval(), torch.rand(1, 3, 16, 16, generator=torch.Generator().manual_seed(1))
+
+
+def test_fast_module_stays_close_to_fp32(net_and_input):
+    net, x = net_and_input
+    with torch.no_grad():
+        expected = net(x)
+        fast = optimize_module(TinyNet(), quantize_linear=True, channels_last=True, bf16=False)
+        output = fast(x)
+    assert output.dtype == torch.float32 and output.shape == expected.shape
+    assert torch.allclose(output, expected, atol=0.05)
+
+
+def test_optimizations_are_applied():
+    fast = optimize_module(TinyNet(), quantize_linear=True, channels_last=True, bf16=False)
+    assert not isinstance(fast.module.style, torch.nn.Linear)
+    assert fast.module.conv.weight.is_contiguous(memory_format=torch.channels_last)
+    plain = optimize_module(TinyNet(), quantize_linear=False, channels_last=False, bf16=False)
+    assert isinstance(plain.module.style, torch.nn.Linear)
+
+
+def test_bf16_returns_fp32(net_and_input):
+    _, x = net_and_input
+    fast = optimize_module(TinyNet(), quantize_linear=False, channels_last=False, bf16=True)
+    with torch.no_grad():
+        assert fast(x).dtype == torch.float32
+
+
+def test_configure_threads():
+    before = torch.get_num_threads()
+    try:
+        assert configure_threads(intra_op=1)['intra_op'] == 1
+    finally:
+        torch.set_num_threads(before)
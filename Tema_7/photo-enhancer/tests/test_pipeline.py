@@ -0,0 +1,51 @@
+"""Restauración de caras por micro-lotes (src/pipeline.py), sin GFPGAN."""
+
+import pytest
+
+from src.metrics import Trace
+from src.pipeline import run_in_batches
+
+
+class FakeNetwork:
+    """Suma 100 a cada "cara"; falla con lotes grandes o con caras malas."""
+
+    def __init__(self, max_batch=None, bad=()):
+        self.max_batch = max_batch
+        self.bad = set(bad)
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(list(batch))
+        if self.max_batch and len(batch) > self.max_batch:
+            raise RuntimeError("CUDA out of memory")
+        if self.bad & set(batch):
+            raise RuntimeError("entrada no válida")
+        return [crop + 100 for crop in batch]
+
+
+def test_faces_are_restored_in_batches():
+    network = FakeNetwork()
+    trace = Trace()
+    assert run_in_batches(list(range(5)), 2, network, trace) == [100, 101, 102, 103, 104]
+    assert network.batches == [[0, 1], [2, 3], [4]]
+    assert 'face_failures' not in trace.attributes
+
+
+def test_failed_batch_is_retried_face_by_face():
+    network = FakeNetwork(max_batch=1)
+    trace = Trace()
+    assert run_in_batches(list(range(4)), 4, network, trace) == [100, 101, 102, 103]
+    assert 'face_failures' not in trace.attributes
+
+
+def test_only_the_bad_face_is_left_unrestored():
+    trace = Trace()
+    result = run_in_batches(list(range(4)), 4, FakeNetwork(bad={2}), trace)
+    assert result == [100, 101, 2, 103]
+    assert trace.attributes['face_failures'] == {
+        'indices': [2], 'error': "RuntimeError: entrada no válida"}
+
+
+def test_without_trace_the_error_is_raised():
+    with pytest.raises(RuntimeError, match="no válida"):
+        run_in_batches(list(range(4)), 2, FakeNetwork(bad={3}))
@@ -0,0 +1,43 @@
+"""Comparador a resolución de pantalla (src/preview.py)."""
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.baselines import compose_split
+from src.preview import build_preview_pyramid, compose_preview
+from tests.conftest import textured_image
+
+
+def pil(image_bgr):
+    return Image.fromarray(np.ascontiguousarray(image_bgr[..., ::-1]))
+
+
+def test_pyramid_levels_fit_screen():
+    original = pil(textured_image(300, 1000))
+    restored = pil(textured_image(600, 2000, seed=1))
+    pyramid = build_preview_pyramid(original, restored, max_width=800, levels=3)
+    assert [o.shape[1] for o, _ in pyramid.levels] == [800, 400, 200]
+    assert all(o.shape == r.shape for o, r in pyramid.levels)
+    assert pyramid.level(350)[0].shape[1] == 400
+    assert pyramid.level(5000)[0].shape[1] == 800
+
+
+def test_small_images_are_not_upscaled():
+    original = pil(textured_image(60, 100))
+    pyramid = build_preview_pyramid(original, original, max_width=800, levels=3)
+    assert len(pyramid.levels) == 1 and pyramid.width == 100
+
+
+def test_compose_preview_matches_full_resolution_split():
+    original = pil(textured_image(90, 200))
+    restored = pil(textured_image(90, 200, seed=2))
+    pyramid = build_preview_pyramid(original, restored, max_width=200, levels=1)
+    for slider in (0, 37, 100):
+        preview = compose_preview(pyramid, slider)
+        split = compose_split(original, restored, slider)
+        # Igual salvo en los bordes de la línea divisoria (cv2.line la dibuja
+        # con otro redondeo)
+        split_pos = int(200 * slider / 100)
+        away = np.abs(np.arange(200) - split_pos) > 2
+        np.testing.assert_array_equal(preview[:, away], split[:, away])
+        assert (preview[:, split_pos - 1 if split_pos else 0] == 255).all()
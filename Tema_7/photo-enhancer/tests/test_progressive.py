@@ -0,0 +1,97 @@
+"""Vista previa progresiva en la cola y en el servicio (src/jobs.py, src/service.py)."""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.client import EnhanceClient, ServiceRequestError
+from src.jobs import JobQueue
+from src.service import EnhanceService, create_server, serve_in_background
+from tests.conftest import textured_image
+
+
+class TwoPassEnhancer:
+    """Publica la vista previa (la entrada reducida) y espera a background."""
+
+    def __init__(self):
+        self.background = threading.Event()
+        self.on_preview_seen = []
+
+    def enhance(self, image_bgr, progress=None, trace=None, on_preview=None, **options):
+        self.on_preview_seen.append(on_preview is not None)
+        if on_preview is not None:
+            on_preview(cv2.resize(image_bgr, None, fx=0.5, fy=0.5))
+        self.background.wait(5)
+        return cv2.resize(image_bgr, None, fx=2, fy=2)
+
+
+def wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("La condición no se cumple")
+
+
+@pytest.fixture
+def enhancer():
+    enhancer = TwoPassEnhancer()
+    yield enhancer
+    enhancer.background.set()
+
+
+def test_preview_is_published_before_the_result(enhancer):
+    queue = JobQueue(enhancer, workers=1)
+    try:
+        image = textured_image(32, 48)
+        job = queue.submit(image, progressive=True)
+        wait_until(lambda: job.preview is not None)
+        assert not job.finished and job.to_dict()['preview_ready']
+        assert job.preview.shape == (16, 24, 3)
+        enhancer.background.set()
+        wait_until(lambda: job.finished)
+        assert job.result.shape == (64, 96, 3)
+    finally:
+        queue.close()
+
+
+def test_no_preview_unless_requested(enhancer):
+    enhancer.background.set()
+    queue = JobQueue(enhancer, workers=1)
+    try:
+        job = queue.submit(textured_image(16, 16))
+        wait_until(lambda: job.finished)
+        assert job.preview is None and enhancer.on_preview_seen == [False]
+    finally:
+        queue.close()
+
+
+def test_preview_endpoint(config, enhancer):
+    config['service_poll_interval'] = 0.01
+    service = EnhanceService(enhancer, workers=2, require_warm=False)
+    server = create_server(service, host='127.0.0.1', port=0)
+    serve_in_background(server)
+    client = EnhanceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        data = cv2.imencode('.png', textured_image(32, 48))[1].tobytes()
+        plain = client.submit_image(data)['id']
+        progressive = client.submit_image(data, progressive=True)['id']
+        assert plain != progressive
+        wait_until(lambda: client.status(progressive).preview_ready)
+        preview = cv2.imdecode(np.frombuffer(client.preview(progressive, 'png'), np.uint8),
+                               cv2.IMREAD_COLOR)
+        assert preview.shape == (16, 24, 3)
+        with pytest.raises(ServiceRequestError) as error:
+            client.preview(plain)
+        assert error.value.status == 409
+        with pytest.raises(ServiceRequestError) as error:
+            client.preview(progressive, 'gif')
+        assert error.value.status == 400
+    finally:
+        enhancer.background.set()
+        server.shutdown()
+        server.server_close()
+        service.close()
@@ -0,0 +1,101 @@
+"""Registro de modelos (src/registry.py) con modelos de tamaño conocido."""
+
+import threading
+
+import pytest
+
+import src.registry as registry
+from src.registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, size):
+        self.size = size
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def sizes(monkeypatch):
+    # Sin torch: el tamaño lo declara el propio modelo
+    monkeypatch.setattr(registry, 'model_memory_bytes', lambda model: model.size)
+
+
+def counting_loaders(**sizes):
+    calls = {name: 0 for name in sizes}
+
+    def loader(name):
+        def load():
+            calls[name] += 1
+            return FakeModel(sizes[name])
+        return load
+
+    return {name: loader(name) for name in sizes}, calls
+
+
+def test_models_load_once_and_are_shared():
+    loaders, calls = counting_loaders(gfpgan=10)
+    models = ModelRegistry(loaders, budget_bytes=100)
+    assert not models.is_loaded('gfpgan')
+    assert models.get('gfpgan') is models.get('gfpgan')
+    assert calls['gfpgan'] == 1 and models.is_loaded('gfpgan')
+    assert models.stats()['resident_bytes'] == 10
+
+
+def test_unknown_model():
+    with pytest.raises(KeyError):
+        ModelRegistry({}, budget_bytes=100).get('nada')
+
+
+def test_least_recently_used_is_evicted_over_budget():
+    loaders, calls = counting_loaders(a=40, b=40, c=40)
+    models = ModelRegistry(loaders, budget_bytes=100)
+    models.get('a')
+    evicted = models.get('b')
+    models.get('a')
+    models.get('c')
+    assert models.is_loaded('a') and models.is_loaded('c') and not models.is_loaded('b')
+    assert evicted.closed and not models.get('a').closed
+    assert models.stats()['evictions'] == 1
+    models.get('b')
+    assert calls['b'] == 2
+
+
+def test_model_over_budget_is_kept():
+    loaders, _ = counting_loaders(small=10, huge=500)
+    models = ModelRegistry(loaders, budget_bytes=100)
+    models.get('small')
+    models.get('huge')
+    assert models.stats()['models'] == {'huge': 500}
+
+
+def test_concurrent_gets_load_once():
+    gate = threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        gate.wait(5)
+        return FakeModel(1)
+
+    models = ModelRegistry({'slow': slow_load}, budget_bytes=100)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(models.get('slow')))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1 and len(results) == 4
+    assert all(result is results[0] for result in results)
+
+
+def test_unload_closes_the_model():
+    loaders, _ = counting_loaders(a=10)
+    models = ModelRegistry(loaders, budget_bytes=100)
+    model = models.get('a')
+    models.unload('a')
+    assert model.closed and not models.is_loaded('a')
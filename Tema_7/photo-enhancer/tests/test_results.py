@@ -0,0 +1,106 @@
+"""Almacén compacto de resultados de las sesiones (src/results.py)."""
+
+import cv2
+import numpy as np
+import pytest
+
+from src.downloads import DownloadEncoder
+from src.results import ResultStore
+from tests.conftest import textured_image
+
+
+def png(image):
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+@pytest.fixture
+def image():
+    return textured_image(40, 60)
+
+
+def test_result_is_stored_encoded_and_decoded_on_demand(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    entry = store.put('s1', 'job1', png(image), png(image))
+    assert entry.nbytes < image.nbytes * 2
+    np.testing.assert_array_equal(store.restored_bgr('job1'), image)
+    assert store.restored_bgr('otro') is None
+
+
+def test_sessions_share_a_result_until_the_last_leaves(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    store.put('s1', 'job1', png(image), png(image))
+    store.put('s2', 'job1', png(image), png(image))
+    store.release('s1')
+    assert store.get('job1') is not None
+    store.release('s2')
+    assert store.get('job1') is None
+
+
+def test_new_result_replaces_the_session_one(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    store.put('s1', 'job1', png(image), png(image))
+    store.put('s1', 'job2', png(image), png(image))
+    assert store.get('job1') is None and store.get('job2') is not None
+    assert store.stats()['sessions'] == 1
+
+
+def test_least_recent_results_are_evicted_over_the_cap(image):
+    size = len(png(image)) * 2
+    store = ResultStore(max_bytes=int(size * 2.5), idle_s=60)
+    for index in range(3):
+        store.put(f's{index}', f'job{index}', png(image), png(image))
+        if index == 1:
+            store.get('job0')
+    assert store.get('job1') is None
+    assert store.get('job0') is not None and store.get('job2') is not None
+    assert store.stats()['evictions'] == 1
+
+
+def test_newest_result_is_kept_even_over_the_cap(image):
+    store = ResultStore(max_bytes=1, idle_s=60)
+    store.put('s1', 'job1', png(image), png(image))
+    assert store.get('job1') is not None
+
+
+def test_idle_results_are_evicted(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=30)
+    store.put('s1', 'job1', png(image), png(image))
+    store.get('job1').last_access -= 60
+    stats = store.stats()
+    assert stats['entries'] == 0 and stats['idle_evictions'] == 1
+
+
+def test_preview_is_built_once_and_counted(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    upscaled = cv2.resize(image, None, fx=2, fy=2)
+    store.put('s1', 'job1', png(image), png(upscaled))
+    before = store.stats()['bytes']
+    preview = store.preview('job1')
+    assert store.preview('job1') is preview
+    assert store.stats()['preview_bytes'] == preview.nbytes() > 0
+    assert store.stats()['bytes'] == before + preview.nbytes()
+
+
+def test_downloads(image):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    restored = png(image)
+    store.put('s1', 'job1', png(image), restored)
+    assert store.download('job1', 'png').result() is restored
+    encoder = DownloadEncoder(workers=1)
+    try:
+        webp = store.download('job1', 'webp', encoder)
+        assert store.download('job1', 'webp', encoder) is webp
+        decoded = cv2.imdecode(np.frombuffer(webp.result(5), np.uint8), cv2.IMREAD_COLOR)
+        np.testing.assert_array_equal(decoded, image)
+    finally:
+        encoder.close()
+    assert store.download('otro', 'png') is None
+
+
+def test_eviction_during_decode_is_a_miss(image, monkeypatch):
+    store = ResultStore(max_bytes=10 * 2**20, idle_s=60)
+    store.put('s1', 'job1', png(image), png(image))
+    # Otra sesión expulsa el resultado entre get() y la decodificación
+    monkeypatch.setattr(store, 'restored_bgr', lambda result_id: None)
+    assert store.preview('job1') is None
+    assert store.download('job1', 'webp') is None
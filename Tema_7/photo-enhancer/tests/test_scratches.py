@@ -0,0 +1,116 @@
+import cv2
+import numpy as np
+
+from conftest import textured_image
+from src import scratches
+from src.cache import options_key, result_key
+
+
+class FakeEraser:
+    """Sustituto de EraseScratches: invierte la imagen (PIL RGB)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def erase(self, image):
+        array = np.asarray(image)
+        self.calls.append(array.shape[:2])
+        return 255 - array
+
+
+def scratched_image():
+    image = np.full((512, 512, 3), 128, np.uint8)
+    cv2.line(image, (40, 60), (220, 70), (250, 250, 250), 2)
+    return image
+
+
+def test_damage_mask_finds_thin_lines_only():
+    image = scratched_image()
+    cv2.circle(image, (400, 400), 40, (10, 10, 10), -1)  # mancha, no grieta
+    mask = scratches.damage_mask(image)
+    assert mask[65, 130] == 255
+    assert mask[400, 400] == 0
+
+
+def test_masked_repair_touches_only_damaged_regions():
+    image = scratched_image()
+    eraser = FakeEraser()
+    mask = scratches.damage_mask(image)
+    output, info = scratches.repair_masked(eraser, image, mask)
+    assert info['mode'] == 'masked'
+    assert all(h < 512 or w < 512 for h, w in eraser.calls)
+    np.testing.assert_array_equal(output[400:, 400:], image[400:, 400:])
+    assert not np.array_equal(output[55:75, 100:200], image[55:75, 100:200])
+
+
+def test_empty_mask_falls_back_to_full_repair():
+    image = textured_image(256, 256)
+    eraser = FakeEraser()
+    output, info = scratches.repair_masked(eraser, image, np.zeros((256, 256), np.uint8))
+    assert info['mode'] == 'full'
+    assert info['reason'] == 'empty_mask'
+    assert eraser.calls == [(256, 256)]
+    np.testing.assert_array_equal(output, 255 - image)
+
+
+def test_heavy_damage_is_repaired_whole():
+    image = textured_image(256, 256)
+    eraser = FakeEraser()
+    _, info = scratches.repair_masked(eraser, image, np.full((256, 256), 255, np.uint8))
+    assert info['mode'] == 'full'
+    assert info['reason'] == 'damage_ratio'
+
+
+def test_mask_cache_reuses_masks():
+    cache = scratches.MaskCache(max_entries=1)
+    image = scratched_image()
+    assert cache.get(image) is cache.get(image.copy())
+
+
+def test_scratch_config_is_part_of_the_cache_key(config):
+    image = textured_image(64, 64)
+    config['scratch_mode'] = 'masked'
+    masked = result_key(image, repair_scratches=True), options_key(repair_scratches=True)
+    config['scratch_mode'] = 'full'
+    full = result_key(image, repair_scratches=True), options_key(repair_scratches=True)
+    assert masked != full
+
+    # Sin reparar grietas, la configuración de grietas no cuenta
+    before = result_key(image)
+    config['scratch_threshold'] += 5
+    assert result_key(image) == before
+    assert result_key(image, repair_scratches=True) != full[0]
+
+
+def test_damage_preview_is_display_sized():
+    image = np.full((1000, 2000, 3), 128, np.uint8)
+    cv2.line(image, (100, 100), (900, 120), (255, 255, 255), 3)
+    mask = scratches.damage_mask(image)
+    overlay, damaged = scratches.damage_preview(image, mask, 400)
+    assert overlay.shape == (200, 400, 3)
+    assert damaged == np.count_nonzero(mask) / mask.size
+
+
+def test_mask_cache_key_follows_detector_settings(config):
+    cache = scratches.MaskCache()
+    image = scratched_image()
+    before = cache.get(image)
+    config['scratch_kernel'] = config['scratch_kernel'] + 6
+    assert cache.get(image) is not before
+
+
+def test_mask_cache_respects_byte_budget():
+    image = scratched_image()
+    cache = scratches.MaskCache(max_entries=16, max_bytes=int(image.shape[0] * image.shape[1] * 1.5))
+    first = cache.get(image)
+    cache.get(255 - image)
+    assert cache._bytes <= cache.max_bytes and len(cache._entries) == 1
+    assert cache.get(image) is not first
+    tiny = scratches.MaskCache(max_bytes=10)
+    tiny.get(image)
+    assert len(tiny._entries) == 0
+
+
+def test_whole_image_repair_is_the_default():
+    from config import CONFIG
+    assert CONFIG['scratch_mode'] == 'full'
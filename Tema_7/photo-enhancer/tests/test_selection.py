@@ -0,0 +1,111 @@
+"""Mejora selectiva de caras y zonas de interés (src/selection.py)."""
+
+import cv2
+import numpy as np
+import pytest
+
+from src.selection import (SelectionError, merge_boxes, normalize_selection, parse_selection,
+                           regions_of_interest, select_faces, selection_params,
+                           upsample_regions)
+from tests.conftest import textured_image
+
+
+def test_normalize_selection(config):
+    config['selection_margin'] = 0.25
+    assert normalize_selection(None) is None
+    assert normalize_selection({'faces': [], 'largest': 0}) is None
+    assert normalize_selection({'faces': [2, '0', 2], 'boxes': [[1.4, 2, 10, 20.6]]}) == {
+        'faces': [0, 2], 'boxes': [[1, 2, 10, 21]], 'largest': 0, 'margin': 0.25}
+
+
+@pytest.mark.parametrize('selection', [
+    {'caras': [0]},
+    {'faces': [-1]},
+    {'largest': 'dos'},
+    {'boxes': [[10, 0, 5, 20]]},
+    {'boxes': [[0, 0, 5]]},
+    {'faces': [0], 'margin': -1},
+])
+def test_invalid_selections(selection):
+    with pytest.raises(SelectionError):
+        normalize_selection(selection)
+
+
+def test_parse_and_params_roundtrip():
+    selection = parse_selection(faces="2,0", boxes="0,0,10,10;20,20,30,40", largest="1",
+                                margin="0.5")
+    assert selection == {'faces': [0, 2], 'boxes': [[0, 0, 10, 10], [20, 20, 30, 40]],
+                         'largest': 1, 'margin': 0.5}
+    params = {k: str(v) for k, v in selection_params(selection).items()}
+    assert parse_selection(**params) == selection
+    assert selection_params(None) == {}
+    with pytest.raises(SelectionError):
+        parse_selection(boxes="0,0,x,10")
+
+
+def test_select_faces_combines_criteria():
+    faces = [[0, 0, 10, 10], [50, 50, 90, 90], [100, 0, 120, 30], [200, 200, 205, 205]]
+    selection = normalize_selection({'faces': [3, 9], 'boxes': [[95, 0, 130, 40]],
+                                     'largest': 1})
+    # 3 por índice (9 no existe), 2 por caja, 1 por tamaño
+    assert select_faces(faces, selection) == [1, 2, 3]
+
+
+def test_merge_boxes_until_disjoint():
+    merged = merge_boxes([[0, 0, 10, 10], [20, 0, 30, 10], [5, 5, 25, 8], [50, 50, 60, 60]])
+    assert sorted(merged) == [[0, 0, 30, 10], [50, 50, 60, 60]]
+    # Tocarse no es solaparse
+    assert len(merge_boxes([[0, 0, 10, 10], [10, 0, 20, 10]])) == 2
+
+
+def test_regions_of_interest_expand_and_clip():
+    selection = normalize_selection({'boxes': [[90, 90, 100, 100]], 'margin': 0.5})
+    regions = regions_of_interest([[10, 10, 30, 30]], selection, width=100, height=100)
+    assert sorted(regions) == [[0, 0, 40, 40], [85, 85, 100, 100]]
+
+
+class NearestUpsampler:
+    """Escalado por repetición de píxeles, como sustituto de RealESRGANer."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def enhance(self, img, outscale=None):
+        self.shapes.append(img.shape[:2])
+        factor = int(outscale)
+        return img.repeat(factor, axis=0).repeat(factor, axis=1), 'RGB'
+
+
+def test_upsample_regions_only_runs_the_model_on_regions():
+    image = textured_image(60, 80)
+    upsampler = NearestUpsampler()
+    output = upsample_regions(upsampler, image, 2, [[10, 10, 30, 20]], context=4)
+    assert upsampler.shapes == [(18, 28)]
+    expected = cv2.resize(image, (160, 120), interpolation=cv2.INTER_LINEAR)
+    nearest = image.repeat(2, axis=0).repeat(2, axis=1)
+    np.testing.assert_array_equal(output[20:40, 20:60], nearest[20:40, 20:60])
+    np.testing.assert_array_equal(output[50:, :], expected[50:, :])
+
+
+def test_context_band_fades_into_interpolation():
+    image = textured_image(60, 80)
+    output = upsample_regions(NearestUpsampler(), image, 2, [[30, 20, 50, 40]], context=8)
+    interpolated = cv2.resize(image, (160, 120), interpolation=cv2.INTER_LINEAR).astype(int)
+    nearest = image.repeat(2, axis=0).repeat(2, axis=1).astype(int)
+    row = output[60].astype(int)
+    # Fuera del contexto, interpolación; en la franja, una mezcla que va
+    # de la interpolación a la salida del upsampler
+    np.testing.assert_array_equal(row[:44], interpolated[60, :44])
+    np.testing.assert_array_equal(row[60:100], nearest[60, 60:100])
+    low = np.minimum(interpolated[60, 44:60], nearest[60, 44:60]) - 1
+    high = np.maximum(interpolated[60, 44:60], nearest[60, 44:60]) + 1
+    assert ((row[44:60] >= low) & (row[44:60] <= high)).all()
+    first = np.abs(row[44] - interpolated[60, 44]).max()
+    assert first <= np.abs(nearest[60, 44] - interpolated[60, 44]).max() / 8 + 1
+
+
+def test_upsample_regions_at_the_border():
+    image = textured_image(60, 80)
+    output = upsample_regions(NearestUpsampler(), image, 2, [[60, 40, 80, 60]], context=8)
+    nearest = image.repeat(2, axis=0).repeat(2, axis=1)
+    np.testing.assert_array_equal(output[80:, 120:], nearest[80:, 120:])
@@ -0,0 +1,228 @@
+"""Servicio HTTP de mejora (src/service.py) con un enhancer sustituto."""
+
+import http.client
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import src.video
+from src.client import EnhanceClient, ServiceRequestError
+from src.jobs import QueueFullError
+from src.service import EnhanceService, create_server, serve_in_background
+from tests.conftest import textured_image
+
+
+class FakeEnhancer:
+    """Duplica el tamaño con interpolación; release bloquea los trabajos."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def enhance(self, image_bgr, progress=None, trace=None, **options):
+        self.calls += 1
+        self.release.wait(5)
+        if progress is not None:
+            progress('fake', 1.0)
+        height, width = image_bgr.shape[:2]
+        return cv2.resize(image_bgr, (width * 2, height * 2), interpolation=cv2.INTER_LINEAR)
+
+
+class FakeVideoEnhancer:
+    """Copia el vídeo de entrada en el de salida."""
+
+    def __init__(self, enhancer):
+        self.enhancer = enhancer
+
+    def process(self, source, output_path, progress=None, **options):
+        with open(source, 'rb') as src_file, open(output_path, 'wb') as out_file:
+            out_file.write(src_file.read())
+        return {'frames': 1}
+
+
+def png_bytes(seed=0, size=32):
+    return cv2.imencode('.png', textured_image(size, size, seed))[1].tobytes()
+
+
+@pytest.fixture
+def served(config, monkeypatch):
+    config['service_poll_interval'] = 0.01
+    monkeypatch.setattr(src.video, 'VideoEnhancer', FakeVideoEnhancer)
+    enhancer = FakeEnhancer()
+    service = EnhanceService(enhancer, workers=1, max_pending=1, require_warm=False)
+    server = create_server(service, host='127.0.0.1', port=0)
+    serve_in_background(server)
+    client = EnhanceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    yield service, client, enhancer
+    enhancer.release.set()
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def wait_finished(client, job_id):
+    for _ in range(500):
+        status = client.status(job_id)
+        if status.finished:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"El trabajo {job_id} no termina")
+
+
+def test_image_roundtrip(served):
+    service, client, _ = served
+    job_id = client.submit_image(png_bytes())['id']
+    assert wait_finished(client, job_id).status == 'done'
+    assert client.result_image(job_id).shape == (64, 64, 3)
+    decoded = cv2.imdecode(np.frombuffer(client.result(job_id), np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (64, 64, 3)
+
+
+def test_identical_requests_coalesce(served):
+    service, client, enhancer = served
+    enhancer.release.clear()
+    first = client.submit_image(png_bytes())
+    second = client.submit_image(png_bytes())
+    assert second == {'id': first['id'], 'coalesced': True}
+    enhancer.release.set()
+    wait_finished(client, first['id'])
+    assert enhancer.calls == 1
+
+
+def test_full_queue_answers_429(served):
+    service, client, enhancer = served
+    enhancer.release.clear()
+    running = client.submit_image(png_bytes(0))['id']
+    for _ in range(100):
+        if client.status(running).status == 'running':
+            break
+        time.sleep(0.01)
+    client.submit_image(png_bytes(1))  # ocupa el único hueco de espera
+    with pytest.raises(QueueFullError):
+        client.submit_image(png_bytes(2))
+
+
+def test_bad_requests(served):
+    service, client, _ = served
+    with pytest.raises(ServiceRequestError) as error:
+        client.submit_image(b"no es una imagen")
+    assert error.value.status == 400
+    with pytest.raises(ServiceRequestError) as error:
+        client.status("no-existe")
+    assert error.value.status == 404
+
+
+def test_release_forgets_finished_job(served):
+    service, client, _ = served
+    job_id = client.submit_image(png_bytes())['id']
+    wait_finished(client, job_id)
+    client.result(job_id)
+    client.release(job_id)
+    assert service.queue.get(job_id) is None
+    assert job_id not in service._waiters
+    with pytest.raises(ServiceRequestError) as error:
+        client.status(job_id)
+    assert error.value.status == 404
+
+
+def test_release_waits_for_every_client(served):
+    service, client, enhancer = served
+    enhancer.release.clear()
+    job_id = client.submit_image(png_bytes())['id']
+    client.submit_image(png_bytes())
+    enhancer.release.set()
+    wait_finished(client, job_id)
+    client.release(job_id)
+    assert client.status(job_id).status == 'done'
+    client.release(job_id)
+    assert service.queue.get(job_id) is None
+
+
+def test_enhance_releases_its_job(served):
+    service, client, _ = served
+    data = client.enhance(png_bytes(), fmt='png')
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape == (64, 64, 3)
+    assert service._waiters == {}
+    assert len(service.queue._jobs) == 0
+
+
+def test_released_video_removes_work_dir(served):
+    service, client, _ = served
+    job_id = client.submit_video(b"fotogramas", name="clip.mp4")['id']
+    status = wait_finished(client, job_id)
+    assert status.kind == 'video' and status.report == {'frames': 1}
+    work_dir = service._videos[job_id][0]
+    assert client.result(job_id) == b"fotogramas"
+    client.release(job_id)
+    assert not os.path.exists(work_dir)
+    assert job_id not in service._videos and job_id not in service._waiters
+
+
+def test_evicted_video_removes_work_dir(config, monkeypatch):
+    monkeypatch.setattr(src.video, 'VideoEnhancer', FakeVideoEnhancer)
+    service = EnhanceService(FakeEnhancer(), workers=1, require_warm=False)
+    service.queue.max_finished = 1
+    try:
+        first, _ = service.submit_video(b"uno")
+        service.wait(first.id, timeout=5)
+        work_dir = service._videos[first.id][0]
+        second, _ = service.submit_video(b"dos")
+        service.wait(second.id, timeout=5)
+        assert service.queue.get(first.id) is None
+        assert not os.path.exists(work_dir)
+        assert first.id not in service._videos and first.id not in service._waiters
+    finally:
+        service.close()
+
+
+def test_coalesced_video_keeps_one_copy(config, monkeypatch, tmp_path):
+    monkeypatch.setattr(src.video, 'VideoEnhancer', FakeVideoEnhancer)
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    enhancer = FakeEnhancer()
+    enhancer.release.clear()
+    service = EnhanceService(enhancer, workers=1, require_warm=False)
+    try:
+        service.queue.submit(textured_image(8, 8))  # ocupa el hilo
+        first, _ = service.submit_video(b"igual")
+        second, coalesced = service.submit_video(b"igual")
+        assert coalesced and second is first
+        assert os.listdir(tmp_path) == [os.path.basename(service._videos[first.id][0])]
+    finally:
+        enhancer.release.set()
+        service.close()
+
+
+def test_enhance_timeout_releases_its_job(served, config):
+    service, client, enhancer = served
+    config['service_request_timeout_s'] = 0.2
+    enhancer.release.clear()
+    with pytest.raises(ServiceRequestError) as error:
+        client.enhance(png_bytes(), timeout=5)
+    assert error.value.status == 504
+    assert service._waiters == {}
+    job = next(iter(service.queue._jobs.values()))
+    enhancer.release.set()
+    for _ in range(500):
+        if job.finished:
+            break
+        time.sleep(0.01)
+    assert job.status == 'cancelled'
+
+
+@pytest.mark.parametrize('length', ['abc', '-1'])
+def test_bad_content_length_is_400(served, length):
+    service, client, _ = served
+    host, port = client.base_url.split('//')[1].split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=5)
+    try:
+        connection.putrequest('POST', '/jobs')
+        connection.putheader('Content-Length', length)
+        connection.endheaders()
+        assert connection.getresponse().status == 400
+    finally:
+        connection.close()
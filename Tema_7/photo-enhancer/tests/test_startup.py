@@ -0,0 +1,78 @@
+"""Arranque diferido y precalentamiento (src/startup.py)."""
+
+import subprocess
+import sys
+from http import HTTPStatus
+
+import cv2
+import numpy as np
+import pytest
+
+from src import startup
+from src.registry import ModelRegistry
+from src.service import EnhanceService, ServiceError
+from src.startup import StartupReport, import_ml_modules, start_background_warmup
+
+
+class IdleEnhancer:
+    registry = ModelRegistry({})
+
+
+@pytest.fixture
+def report(monkeypatch):
+    fresh = StartupReport()
+    monkeypatch.setattr(startup, 'report', fresh)
+    return fresh
+
+
+def test_ml_libraries_are_not_imported_at_startup():
+    code = ("import sys; import app, src.models, src.service; "
+            "print(','.join(m for m in ('torch', 'gfpgan', 'basicsr', 'facexlib', 'realesrgan') "
+            "if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == ""
+
+
+def test_import_timings_skip_missing_modules(report):
+    timings = import_ml_modules(('cv2', 'modulo_que_no_existe'))
+    assert set(timings) == {'cv2'}
+    assert report.to_dict()['imports_s'] == timings
+
+
+def test_marks_are_recorded_once(report):
+    report.mark_ready()
+    report.mark_first_result()
+    first = report.to_dict()
+    report.mark_ready()
+    report.mark_first_result()
+    assert report.to_dict()['ready_s'] == first['ready_s']
+    assert report.to_dict()['time_to_first_result_s'] == first['time_to_first_result_s']
+
+
+def test_background_warmup_states(report, monkeypatch):
+    monkeypatch.setattr(startup, 'warm_up', lambda registry, modes=None: {})
+    start_background_warmup(registry=None).join(5)
+    assert report.warmup_state == 'done'
+
+    def broken(registry, modes=None):
+        raise RuntimeError("sin pesos")
+    monkeypatch.setattr(startup, 'warm_up', broken)
+    start_background_warmup(registry=None).join(5)
+    assert report.warmup_state == 'failed'
+    assert report.warmup_error == "RuntimeError: sin pesos"
+
+
+def test_service_answers_503_while_warming(report):
+    service = EnhanceService(IdleEnhancer(), workers=1, require_warm=True)
+    try:
+        report.warmup_state = 'running'
+        with pytest.raises(ServiceError) as error:
+            service.submit_image(cv2.imencode('.png', np.zeros((8, 8, 3), np.uint8))[1].tobytes())
+        assert error.value.status == HTTPStatus.SERVICE_UNAVAILABLE
+        assert error.value.retry_after is not None
+        assert not service.health()['ready']
+        report.warmup_state = 'done'
+        assert service.health()['ready']
+    finally:
+        service.close()
@@ -0,0 +1,79 @@
+"""Teselas en paralelo (src/tiling.py) con una red sustituta por píxel."""
+
+import numpy as np
+import pytest
+
+from src.tiling import ParallelTileUpsampler, tile_bounds
+from tests.conftest import textured_image
+
+
+class FakeRealESRGANer:
+    scale = 2
+
+    def enhance(self, img, outscale=None, alpha_upsampler='realesrgan'):
+        return 'delegado', None
+
+
+class NearestTiles(ParallelTileUpsampler):
+    """La "red" repite cada píxel: el resultado no depende de las teselas."""
+
+    def _run_tile(self, img_bgr, box):
+        y0, y1, x0, x1 = box
+        patch = img_bgr[y0:y1, x0:x1, ::-1].astype(np.float32) / 255
+        return patch.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+
+
+def test_tile_bounds_cover_length_with_even_cuts():
+    bounds = tile_bounds(202, 64)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 202
+    assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+    assert all(start % 2 == 0 for start, _ in bounds)
+    assert max(end - start for start, end in bounds) <= 64
+    assert tile_bounds(40, 64) == [(0, 40)]
+
+
+@pytest.mark.parametrize('shape', [(96, 128), (75, 101)])
+def test_tiled_output_matches_whole_image(shape):
+    image = textured_image(*shape)
+    expected = image.repeat(2, axis=0).repeat(2, axis=1)
+    sequential = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=6, workers=1)
+    parallel = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=6, workers=4)
+    try:
+        out_seq, mode = sequential.enhance(image)
+        out_par, _ = parallel.enhance(image)
+    finally:
+        parallel.close()
+    assert mode == 'RGB'
+    np.testing.assert_array_equal(out_seq, expected)
+    np.testing.assert_array_equal(out_par, out_seq)
+
+
+def test_outscale_resizes_result():
+    upsampler = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=4, workers=1)
+    output, _ = upsampler.enhance(textured_image(40, 60), outscale=1.5)
+    assert output.shape == (60, 90, 3)
+
+
+def test_pad_is_clamped_to_tile():
+    upsampler = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=40, workers=1)
+    assert upsampler.tile_pad == 8
+
+
+def test_non_bgr8_images_are_delegated():
+    upsampler = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=4, workers=1)
+    gray = np.zeros((10, 10), np.uint8)
+    assert upsampler.enhance(gray) == ('delegado', None)
+    assert upsampler.enhance(np.zeros((10, 10, 3), np.uint16))[0] == 'delegado'
+
+
+def test_close_waits_for_running_enhance():
+    upsampler = NearestTiles(FakeRealESRGANer(), tile=32, tile_pad=4, workers=2)
+    executor = upsampler._acquire_executor()
+    upsampler.close()
+    # Una mejora en curso sigue teniendo su pool
+    assert executor.submit(lambda: 1).result() == 1
+    upsampler._release_executor()
+    assert upsampler._executor is None
+    # Cerrado, cada llamada abre y cierra su propio pool
+    upsampler.enhance(textured_image(40, 60))
+    assert upsampler._executor is None
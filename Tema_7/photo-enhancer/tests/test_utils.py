@@ -0,0 +1,45 @@
+"""Conversiones BGR <-> PIL con una sola copia (src/utils.py)."""
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.metrics import Trace
+from src.utils import bgr_to_pil, pil_to_bgr, rgb_to_bgr_inplace
+from tests.conftest import textured_image
+
+
+def test_pil_to_bgr_reorders_channels_and_counts_the_copy():
+    image = textured_image(12, 20)
+    pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    trace = Trace()
+    bgr = pil_to_bgr(pil, trace=trace)
+    np.testing.assert_array_equal(bgr, image)
+    assert bgr.flags.writeable
+    cv2.GaussianBlur(bgr, (3, 3), 0, dst=bgr)
+    assert trace.copies == {'pil_to_bgr': {'count': 1, 'bytes': image.nbytes}}
+
+
+def test_pil_to_bgr_converts_other_modes():
+    gray = Image.fromarray(np.full((6, 8), 90, np.uint8))
+    assert pil_to_bgr(gray).shape == (6, 8, 3)
+    rgba = Image.new('RGBA', (8, 6), (10, 20, 30, 40))
+    assert tuple(pil_to_bgr(rgba)[0, 0]) == (30, 20, 10)
+
+
+def test_bgr_to_pil_roundtrip_with_views():
+    image = textured_image(12, 20)
+    view = image[:, ::-1]  # no contigua
+    trace = Trace()
+    pil = bgr_to_pil(view, trace=trace)
+    assert pil.mode == 'RGB' and pil.size == (20, 12)
+    np.testing.assert_array_equal(pil_to_bgr(pil), view)
+    assert trace.copies['bgr_to_pil']['count'] == 1
+
+
+def test_rgb_to_bgr_inplace_reuses_buffer():
+    image = textured_image(12, 20)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    out = rgb_to_bgr_inplace(rgb)
+    assert out is rgb or np.shares_memory(out, rgb)
+    np.testing.assert_array_equal(out, image)
@@ -0,0 +1,108 @@
+"""Lectura y seguimiento de caras en vídeo (src/video.py) sin detector real."""
+
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from src.video import FaceTracker, FrameReader
+
+
+# "Cara" con esquinas marcadas para el flujo óptico
+FACE = np.kron(np.random.default_rng(0).integers(0, 255, (6, 6)), np.ones((8, 8))).astype(np.uint8)
+FACE = np.repeat(FACE[..., None], 3, axis=2)
+# Puntos de referencia relativos a la esquina de la cara (esquinas de bloques)
+POINTS = np.array([[16, 16], [32, 16], [24, 24], [16, 32], [32, 32]], np.float32)
+
+
+def frame_with_face(x, y, height=120, width=160):
+    frame = np.full((height, width, 3), 110, np.uint8)
+    frame[y:y + FACE.shape[0], x:x + FACE.shape[1]] = FACE
+    return frame
+
+
+class TemplateFaceHelper:
+    """Sustituto del FaceRestoreHelper que busca FACE por plantilla."""
+
+    def clean_all(self):
+        self.all_landmarks_5, self.det_faces, self.input_img = [], [], None
+
+    def read_image(self, img):
+        self.input_img = img
+
+    def get_face_landmarks_5(self, only_center_face=False, eye_dist_threshold=None):
+        scores = cv2.matchTemplate(self.input_img, FACE, cv2.TM_SQDIFF)
+        score, _, (x, y), _ = cv2.minMaxLoc(scores)
+        if score == 0:
+            self.all_landmarks_5.append(POINTS + (x, y))
+            self.det_faces.append(np.array([x, y, x + 48, y + 48, 1.0], np.float32))
+
+
+class FakeRestorer:
+    def __init__(self):
+        self.face_helper = TemplateFaceHelper()
+
+
+def test_tracker_follows_faces_between_keyframes():
+    tracker = FaceTracker(FakeRestorer(), keyframe_interval=4, max_fb_error=1.0, scene_cut=30)
+    detected = []
+    for index in range(8):
+        x, y = 40 + 2 * index, 30 + index
+        landmarks, boxes, redetect = tracker.update(frame_with_face(x, y))
+        detected.append(redetect)
+        assert len(landmarks) == 1
+        np.testing.assert_allclose(landmarks[0], POINTS + (x, y), atol=0.5)
+        np.testing.assert_allclose(boxes[0][:2], (x, y), atol=0.5)
+    assert detected == [True, False, False, False, True, False, False, False]
+    assert (tracker.keyframes, tracker.tracked) == (2, 6)
+
+
+def test_scene_cut_forces_detection():
+    tracker = FaceTracker(FakeRestorer(), keyframe_interval=100, scene_cut=30)
+    tracker.update(frame_with_face(40, 30))
+    cut = frame_with_face(80, 50)
+    cut[cut == 110] = 230
+    _, _, redetect = tracker.update(cut)
+    assert redetect
+
+
+def test_face_entering_an_empty_shot_is_detected_at_once():
+    tracker = FaceTracker(FakeRestorer(), keyframe_interval=30, scene_cut=30)
+    empty = np.full((120, 160, 3), 110, np.uint8)
+    for _ in range(3):
+        landmarks, _, redetect = tracker.update(empty)
+        assert redetect and landmarks == []
+    landmarks, _, redetect = tracker.update(frame_with_face(40, 30))
+    assert redetect and len(landmarks) == 1
+
+
+@pytest.fixture
+def sequence(tmp_path):
+    for index in range(6):
+        frame = np.full((16, 24, 3), index * 40, np.uint8)
+        cv2.imwrite(str(tmp_path / f"f_{index:04d}.png"), frame)
+    return str(tmp_path / "f_%04d.png")
+
+
+def test_reader_yields_frames_in_order(sequence):
+    reader = FrameReader(sequence, max_buffered=2)
+    try:
+        values = [int(frame[0, 0, 0]) for frame in reader]
+    finally:
+        reader.close()
+    assert values == [0, 40, 80, 120, 160, 200]
+
+
+def test_reader_close_does_not_wait_for_consumer(sequence):
+    reader = FrameReader(sequence, max_buffered=1)
+    next(iter(reader))
+    closer = threading.Thread(target=reader.close)
+    closer.start()
+    closer.join(5)
+    assert not closer.is_alive()
+
+
+def test_reader_rejects_missing_source(tmp_path):
+    with pytest.raises(ValueError):
+        FrameReader(str(tmp_path / "no_existe.mp4"))
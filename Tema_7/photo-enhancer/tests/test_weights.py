@@ -0,0 +1,70 @@
+"""Almacén de pesos (src/weights.py), sin torch: el índice se escribe a mano."""
+
+import os
+
+import numpy as np
+import pytest
+
+from src.weights import (WEIGHT_SOURCES, WeightStore, WeightStoreError, read_safetensors_mmap,
+                         sha256_file, write_safetensors)
+
+
+def add_blob(store, name, source):
+    """Añade un .safetensors al almacén como lo haría add_checkpoint."""
+    path = os.path.join(store.blob_dir, "tmp.safetensors")
+    write_safetensors(path, {'w': np.arange(6, dtype=np.float32).reshape(2, 3)})
+    digest = sha256_file(path)
+    os.replace(path, os.path.join(store.blob_dir, digest + '.safetensors'))
+    store.index[name] = {'sha256': digest, 'source_sha256': digest, 'source': source}
+    store._write_index()
+    return digest
+
+
+def test_safetensors_roundtrip_is_aligned_and_read_only(tmp_path):
+    arrays = {
+        'a': np.arange(5, dtype=np.int8),
+        'b': np.linspace(0, 1, 12, dtype=np.float32).reshape(3, 4),
+        'c': np.arange(3, dtype=np.float64),
+    }
+    path = str(tmp_path / "w.safetensors")
+    write_safetensors(path, arrays, metadata={'name': 'prueba'})
+    loaded, metadata = read_safetensors_mmap(path)
+    assert metadata == {'name': 'prueba'}
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(loaded[name], array)
+        assert not loaded[name].flags.writeable
+        assert loaded[name].ctypes.data % array.dtype.itemsize == 0
+
+
+def test_index_survives_reopen(tmp_path):
+    store = WeightStore(str(tmp_path))
+    digest = add_blob(store, 'gfpgan', WEIGHT_SOURCES['gfpgan'])
+    reopened = WeightStore(str(tmp_path))
+    assert reopened.has('gfpgan')
+    assert reopened.path('gfpgan').endswith(digest + '.safetensors')
+    assert reopened.verify(['gfpgan']) == {'gfpgan': True}
+
+
+def test_changed_source_url_is_not_served(tmp_path, monkeypatch):
+    store = WeightStore(str(tmp_path))
+    add_blob(store, 'gfpgan', WEIGHT_SOURCES['gfpgan'])
+    monkeypatch.setitem(WEIGHT_SOURCES, 'gfpgan', "https://example.com/GFPGANv1.4.pth")
+    assert store.is_stale('gfpgan')
+    assert not store.has('gfpgan')
+    with pytest.raises(WeightStoreError, match="populate"):
+        store.path('gfpgan')
+
+
+def test_manually_added_weights_are_not_stale(tmp_path):
+    store = WeightStore(str(tmp_path))
+    add_blob(store, 'gfpgan', None)
+    assert not store.is_stale('gfpgan') and store.has('gfpgan')
+
+
+def test_verify_detects_corruption(tmp_path):
+    store = WeightStore(str(tmp_path))
+    add_blob(store, 'parsenet', WEIGHT_SOURCES['parsenet'])
+    with open(store.path('parsenet'), 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\xff')
+    assert store.verify(['parsenet']) == {'parsenet': False}
@@ -0,0 +1,58 @@
+"""
+Mejora de vídeos sin interfaz gráfica.
+
+Ejemplos:
+    python video.py --input boda_1994.avi --output boda_mejorada.mp4
+    python video.py --input fotogramas/f_%04d.png --output clip.mp4 --workers 4
+"""
+
+import argparse
+import json
+import sys
+
+from src.models import ImageEnhancer
+from src.video import VideoEnhancer
+
+
+def parse_args(argv=None):
+    """Define y parsea los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Mejora de vídeos con GFPGAN")
+    parser.add_argument("--input", required=True,
+                        help="Vídeo o patrón de secuencia de imágenes (p. ej. f_%%04d.png)")
+    parser.add_argument("--output", required=True, help="Vídeo de salida")
+    parser.add_argument("--workers", type=int, default=None, help="Hilos de restauración")
+    parser.add_argument("--keyframe-interval", type=int, default=None,
+                        help="Fotogramas entre detecciones de caras forzadas")
+    parser.add_argument("--background", action="store_true",
+                        help="Mejorar también el fondo con RealESRGAN")
+    parser.add_argument("--fourcc", default=None, help="Códec de salida (p. ej. mp4v, XVID)")
+    return parser.parse_args(argv)
+
+
+def print_progress(stage, fraction):
+    """Muestra el avance en una sola línea."""
+    print(f"\r🎞️ {fraction * 100:5.1f} %", end="", flush=True)
+
+
+def main(argv=None):
+    """Punto de entrada de la mejora de vídeo."""
+    args = parse_args(argv)
+    video = VideoEnhancer(
+        ImageEnhancer(headless=True),
+        workers=args.workers,
+        keyframe_interval=args.keyframe_interval
+    )
+    report = video.process(
+        args.input,
+        args.output,
+        enhance_background=args.background,
+        progress=print_progress,
+        fourcc=args.fourcc
+    )
+    print("\n📊 Resumen")
+    print(json.dumps(report, indent=2))
+    return 0 if report['frames'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())